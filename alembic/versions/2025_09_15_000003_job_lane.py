@@ -0,0 +1,23 @@
+"""add processing_jobs.lane
+
+Revision ID: 000003_job_lane
+Revises: 000002_credits_indexes
+Create Date: 2025-09-15
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '000003_job_lane'
+down_revision = '000002_credits_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('processing_jobs', sa.Column('lane', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('processing_jobs', 'lane')
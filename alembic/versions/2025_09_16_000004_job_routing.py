@@ -0,0 +1,29 @@
+"""add processing_jobs routing classification
+
+Revision ID: 000004_job_routing
+Revises: 000003_job_lane
+Create Date: 2025-09-16
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '000004_job_routing'
+down_revision = '000003_job_lane'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('processing_jobs', sa.Column('quality_mode', sa.String(), nullable=True))
+    op.add_column('processing_jobs', sa.Column('est_pages', sa.Integer(), nullable=True))
+    op.add_column('processing_jobs', sa.Column('cost_units', sa.Integer(), nullable=True))
+    op.add_column('processing_jobs', sa.Column('cost_class', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('processing_jobs', 'cost_class')
+    op.drop_column('processing_jobs', 'cost_units')
+    op.drop_column('processing_jobs', 'est_pages')
+    op.drop_column('processing_jobs', 'quality_mode')
@@ -0,0 +1,30 @@
+"""add processing_jobs lease/heartbeat columns
+
+Revision ID: 000005_job_lease
+Revises: 000004_job_routing
+Create Date: 2025-09-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '000005_job_lease'
+down_revision = '000004_job_routing'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('processing_jobs', sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('processing_jobs', sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+    op.add_column('processing_jobs', sa.Column('lease_expires_at', sa.DateTime(), nullable=True))
+    # Reaper scans running jobs by lease expiry
+    op.create_index('ix_processing_jobs_status_lease', 'processing_jobs', ['status', 'lease_expires_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_processing_jobs_status_lease', table_name='processing_jobs')
+    op.drop_column('processing_jobs', 'lease_expires_at')
+    op.drop_column('processing_jobs', 'heartbeat_at')
+    op.drop_column('processing_jobs', 'attempts')
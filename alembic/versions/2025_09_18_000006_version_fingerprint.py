@@ -0,0 +1,25 @@
+"""add document_versions.fingerprint for dedupe
+
+Revision ID: 000006_version_fingerprint
+Revises: 000005_job_lease
+Create Date: 2025-09-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '000006_version_fingerprint'
+down_revision = '000005_job_lease'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('document_versions', sa.Column('fingerprint', sa.String(), nullable=True))
+    op.create_index('ix_document_versions_fingerprint', 'document_versions', ['fingerprint'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_document_versions_fingerprint', table_name='document_versions')
+    op.drop_column('document_versions', 'fingerprint')
@@ -0,0 +1,25 @@
+"""add document_versions.stages and processing_jobs.options
+
+Revision ID: 000007_incremental_reprocess
+Revises: 000006_version_fingerprint
+Create Date: 2025-09-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '000007_incremental_reprocess'
+down_revision = '000006_version_fingerprint'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('document_versions', sa.Column('stages', sa.JSON(), nullable=True))
+    op.add_column('processing_jobs', sa.Column('options', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('processing_jobs', 'options')
+    op.drop_column('document_versions', 'stages')
@@ -0,0 +1,23 @@
+"""add processing_jobs.deadline_at
+
+Revision ID: 000008_job_deadline
+Revises: 000007_incremental_reprocess
+Create Date: 2025-09-20
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '000008_job_deadline'
+down_revision = '000007_incremental_reprocess'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('processing_jobs', sa.Column('deadline_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('processing_jobs', 'deadline_at')
@@ -0,0 +1,25 @@
+"""add processing_jobs progressive result columns
+
+Revision ID: 000009_job_progress
+Revises: 000008_job_deadline
+Create Date: 2025-09-21
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '000009_job_progress'
+down_revision = '000008_job_deadline'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('processing_jobs', sa.Column('pages_completed', sa.Integer(), nullable=True))
+    op.add_column('processing_jobs', sa.Column('partial_text_uri', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('processing_jobs', 'partial_text_uri')
+    op.drop_column('processing_jobs', 'pages_completed')
@@ -0,0 +1,23 @@
+"""add processing_jobs.features for duration prediction
+
+Revision ID: 000010_job_features
+Revises: 000009_job_progress
+Create Date: 2025-09-22
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '000010_job_features'
+down_revision = '000009_job_progress'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('processing_jobs', sa.Column('features', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('processing_jobs', 'features')
@@ -0,0 +1,23 @@
+"""add processing_jobs.metrics for run resource usage
+
+Revision ID: 000011_job_metrics
+Revises: 000010_job_features
+Create Date: 2025-09-23
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '000011_job_metrics'
+down_revision = '000010_job_features'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('processing_jobs', sa.Column('metrics', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('processing_jobs', 'metrics')
@@ -0,0 +1,45 @@
+"""add credit_balances (running ledger totals) and backfill from credits
+
+Revision ID: 000012_credit_balances
+Revises: 000011_job_metrics
+Create Date: 2025-09-24
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = '000012_credit_balances'
+down_revision = '000011_job_metrics'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'credit_balances',
+        sa.Column('tenant_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('tenants.id'), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), primary_key=True),
+        sa.Column('reason', sa.String(), primary_key=True),
+        sa.Column('delta_sum', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('entries', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('open_estimates', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('open_estimate_sum', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.execute(
+        """
+        INSERT INTO credit_balances (tenant_id, user_id, reason, delta_sum, entries, open_estimates, open_estimate_sum, updated_at)
+        SELECT tenant_id, user_id, reason, COALESCE(SUM(delta), 0), COUNT(*),
+               SUM(CASE WHEN is_estimate THEN 1 ELSE 0 END),
+               COALESCE(SUM(CASE WHEN is_estimate THEN delta ELSE 0 END), 0),
+               now()
+        FROM credits
+        GROUP BY tenant_id, user_id, reason
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('credit_balances')
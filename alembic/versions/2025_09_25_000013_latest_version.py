@@ -0,0 +1,42 @@
+"""add documents.latest_version_id and (document_id, version) / (tenant_id, created_at) indexes
+
+Revision ID: 000013_latest_version
+Revises: 000012_credit_balances
+Create Date: 2025-09-25
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '000013_latest_version'
+down_revision = '000012_credit_balances'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_document_versions_document_version', 'document_versions', ['document_id', 'version'])
+    op.create_index('ix_documents_tenant_created_at', 'documents', ['tenant_id', 'created_at'])
+    op.add_column('documents', sa.Column('latest_version_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'fk_documents_latest_version', 'documents', 'document_versions', ['latest_version_id'], ['id'],
+    )
+    op.execute(
+        """
+        UPDATE documents d SET latest_version_id = v.id
+        FROM (
+            SELECT DISTINCT ON (document_id) id, document_id
+            FROM document_versions
+            ORDER BY document_id, version DESC
+        ) v
+        WHERE v.document_id = d.id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('fk_documents_latest_version', 'documents', type_='foreignkey')
+    op.drop_column('documents', 'latest_version_id')
+    op.drop_index('ix_documents_tenant_created_at', table_name='documents')
+    op.drop_index('ix_document_versions_document_version', table_name='document_versions')
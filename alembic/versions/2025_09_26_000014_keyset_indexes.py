@@ -0,0 +1,28 @@
+"""widen documents/credits (tenant_id, created_at) indexes with id for keyset pagination
+
+Revision ID: 000014_keyset_indexes
+Revises: 000013_latest_version
+Create Date: 2025-09-26
+"""
+
+from alembic import op
+
+
+revision = '000014_keyset_indexes'
+down_revision = '000013_latest_version'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_documents_tenant_created_id', 'documents', ['tenant_id', 'created_at', 'id'])
+    op.drop_index('ix_documents_tenant_created_at', table_name='documents')
+    op.create_index('ix_credits_tenant_created_id', 'credits', ['tenant_id', 'created_at', 'id'])
+    op.drop_index('ix_credits_tenant_created_at', table_name='credits')
+
+
+def downgrade() -> None:
+    op.create_index('ix_credits_tenant_created_at', 'credits', ['tenant_id', 'created_at'])
+    op.drop_index('ix_credits_tenant_created_id', table_name='credits')
+    op.create_index('ix_documents_tenant_created_at', 'documents', ['tenant_id', 'created_at'])
+    op.drop_index('ix_documents_tenant_created_id', table_name='documents')
@@ -1,25 +1,38 @@
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, Body, Depends
 from fastapi.responses import JSONResponse, PlainTextResponse, Response, HTMLResponse
 from typing import List, Optional
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import os
 import uuid
+import hashlib
 import subprocess
 
 from shared.db.session import SessionLocal, get_db
-from sqlalchemy import text as _sql_text, func
+from sqlalchemy import text as _sql_text
 from shared.db import models
+from shared.db.latest import latest_version, with_latest_version
+from shared.db.pagination import InvalidCursor, keyset_page
 from shared.db.models import ProcessingStatus
-from shared.storage.s3 import Storage
+from shared.storage.s3 import HashingReader, get_storage, pool_stats
 from shared.content.filters import deny_reason_for
-from shared.quality.metrics import estimate_credits
-from apps.block0_worker.worker import enqueue_process_document
+from shared.quality import balances
+from shared.quality.estimates import estimate_credits
+from shared.queueing.client import enqueue_many, enqueue_process_document
+from shared.queueing.eta import job_eta, job_features, load_backlogs, redis_client as eta_redis
+from shared.queueing.lanes import LANES, choose_lane, is_valid_lane, queue_depths
+from shared.pipeline.versions import STAGE_VERSIONS, changed_stages
+from shared.queueing.routing import PdfPageCounter, classify, estimate_pages
+from shared.tracing.spans import span
 from structlog import get_logger
 from structlog.contextvars import bind_contextvars, clear_contextvars
 import time as _t
 import redis as redis_lib
 from starlette.middleware.base import BaseHTTPMiddleware
 import secrets
-from prometheus_client import Counter, Histogram, CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST
+import anyio
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST
 from pydantic import BaseModel, conint, constr
 from uuid import UUID
 from fastapi.templating import Jinja2Templates
@@ -33,7 +46,7 @@ async def _lifespan(app: FastAPI):
     # Skip external IO in test environments
     if not (os.getenv("FIRSTDRAFT_SKIP_STARTUP_CHECKS") or os.getenv("PYTEST_CURRENT_TEST")):
         try:
-            Storage().ensure_bucket()
+            get_storage().ensure_bucket()
             db = SessionLocal()
             db.close()
         except Exception as e:
@@ -72,6 +85,30 @@ UPLOAD_HANDLE_SECONDS = Histogram(
     "Latency for handling upload endpoint",
     registry=registry,
 )
+QUEUE_DEPTH = Gauge(
+    "queue_depth",
+    "Pending jobs per priority lane and cost class (sampled from the broker at scrape time)",
+    ["lane", "cost_class"],
+    registry=registry,
+)
+QUEUE_BACKLOG_SECONDS = Gauge(
+    "queue_backlog_seconds",
+    "Predicted seconds to drain queued and running jobs per lane at observed concurrency (published by the reaper)",
+    ["lane"],
+    registry=registry,
+)
+S3_POOL = Gauge(
+    "s3_pool",
+    "Process-wide MinIO connection pool: pools, opened (connections ever opened), idle (pooled now), requests (sampled at scrape time)",
+    ["stat"],
+    registry=registry,
+)
+JOBS_ROUTED_TOTAL = Counter(
+    "jobs_routed_total",
+    "Jobs enqueued per cost class",
+    ["cost_class"],
+    registry=registry,
+)
 
 
 def get_env_bool(name: str, default: bool = False) -> bool:
@@ -81,6 +118,67 @@ def get_env_bool(name: str, default: bool = False) -> bool:
     return val.lower() in {"1", "true", "yes", "on"}
 
 
+def _quality_mode(requested: Optional[str]) -> str:
+    return (requested or os.getenv("QUALITY_MODE", "recommended") or "recommended").strip().lower()
+
+
+def _latest_job(db, document_id):
+    return (
+        db.query(models.ProcessingJob)
+        .filter(models.ProcessingJob.document_id == document_id)
+        .order_by(models.ProcessingJob.created_at.desc())
+        .first()
+    )
+
+
+def _partial_text(job, max_chars: int = 4000) -> Optional[str]:
+    """First-pages text published by the worker while a job is still running."""
+    uri = getattr(job, "partial_text_uri", None)
+    if not uri or job.status in (ProcessingStatus.succeeded, ProcessingStatus.failed):
+        return None
+    try:
+        return get_storage().get_object_bytes(uri).decode("utf-8", errors="ignore")[:max_chars]
+    except Exception:
+        if _should_log("partial_text_error"):
+            log.error("partial_text_read_failed", job_id=str(job.id), key=uri)
+        return None
+
+
+def _tenant_balance(db, tenant_id) -> int:
+    """Tenant balance from credit_balances (O(1) in ledger size)."""
+    return balances.balance(db, tenant_id)[0]
+
+
+def _keyset(query, model, limit: int, cursor: Optional[str], key=None):
+    """Keyset page of `query` over (model.created_at, model.id), newest first:
+    (rows, next_cursor). A malformed cursor is a 400."""
+    try:
+        return keyset_page(query, model.created_at, model.id, limit, cursor, key=key)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+
+def _doc_key(row):
+    doc = row[0]
+    return doc.created_at, doc.id
+
+
+def _job_options(**opts) -> Optional[dict]:
+    """Job options for the worker, dropping unset ones (None/False)."""
+    opts = {k: v for k, v in opts.items() if v not in (None, False)}
+    return opts or None
+
+
+def _job_eta(db, job) -> Optional[dict]:
+    """Predicted completion for a queued/running job (None when finished or unavailable)."""
+    try:
+        return job_eta(db, job)
+    except Exception:
+        if _should_log("eta_error"):
+            log.error("job_eta_failed", job_id=str(job.id))
+        return None
+
+
 def _ui_ctx():
     return {
         "enabled": get_env_bool("UI_ENABLED", False),
@@ -96,10 +194,14 @@ class RequestIDMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
         rid = request.headers.get("X-Request-ID") or secrets.token_hex(8)
         try:
-            bind_contextvars(request_id=rid, path=str(request.url.path))
-            response = await call_next(request)
-            response.headers["X-Request-ID"] = rid
-            return response
+            # Continues an incoming W3C traceparent; jobs enqueued by the handler carry it on
+            with span("http.request", request.headers.get("traceparent"), method=request.method, path=str(request.url.path), request_id=rid) as sp:
+                bind_contextvars(request_id=rid, path=str(request.url.path), trace_id=sp.trace_id)
+                response = await call_next(request)
+                sp.set(status_code=response.status_code)
+                response.headers["X-Request-ID"] = rid
+                response.headers["traceparent"] = sp.traceparent
+                return response
         finally:
             clear_contextvars()
 
@@ -192,7 +294,7 @@ def healthz():
     # S3/MinIO check
     s3_ok = False
     try:
-        s = Storage()
+        s = get_storage()
         s3_ok = s.client.bucket_exists(s.bucket)
     except Exception as e:
         if _should_log("s3_error"):
@@ -208,6 +310,23 @@ def healthz():
 
 @app.get("/metrics")
 def metrics():
+    # Lane depths are read from the broker on scrape; failures leave the last values
+    try:
+        broker = redis_lib.from_url(os.getenv("CELERY_BROKER_URL") or os.getenv("REDIS_URL", "redis://redis:6379/0"))
+        for (lane, cost_class), depth in queue_depths(broker).items():
+            QUEUE_DEPTH.labels(lane=lane, cost_class=cost_class).set(depth)
+    except Exception as e:
+        if _should_log("queue_depth_error"):
+            log.error("metrics_queue_depth_error", error=str(e))
+    # Backlog in seconds, computed by the reaper (shared.queueing.eta.publish_backlogs)
+    try:
+        for lane, seconds in load_backlogs(eta_redis()).items():
+            QUEUE_BACKLOG_SECONDS.labels(lane=lane).set(seconds)
+    except Exception as e:
+        if _should_log("backlog_error"):
+            log.error("metrics_backlog_error", error=str(e))
+    for stat, value in pool_stats().items():
+        S3_POOL.labels(stat=stat).set(value)
     data = generate_latest(registry)
     return Response(content=data, media_type=CONTENT_TYPE_LATEST)
 
@@ -224,34 +343,27 @@ if get_env_bool("UI_ENABLED", False):
         return templates.TemplateResponse(request, "home.html", ctx)
 
     @ui.get("/docs", response_class=HTMLResponse)
-    def ui_docs(request: Request, db=Depends(get_db)):
+    def ui_docs(request: Request, cursor: Optional[str] = None, db=Depends(get_db)):
         ctx = _ui_ctx()
         try:
             tenant = db.get(models.Tenant, UUID(ctx["tenant_id"]))
         except Exception:
             tenant = None
         docs = []
+        next_cursor = None
         if tenant:
-            q = (
-                db.query(models.Document)
-                .filter(models.Document.tenant_id == tenant.id)
-                .order_by(models.Document.created_at.desc())
-                .limit(20)
+            rows, next_cursor = _keyset(
+                with_latest_version(db.query(models.Document)).filter(models.Document.tenant_id == tenant.id),
+                models.Document, 20, cursor, key=_doc_key,
             )
-            for doc in q.all():
-                latest = (
-                    db.query(models.DocumentVersion)
-                    .filter(models.DocumentVersion.document_id == doc.id)
-                    .order_by(models.DocumentVersion.version.desc())
-                    .first()
-                )
+            for doc, latest in rows:
                 docs.append({
                     "id": str(doc.id),
                     "filename": doc.orig_filename,
                     "mime": doc.mime,
                     "version": latest.version if latest else None,
                 })
-        return templates.TemplateResponse(request, "docs.html", {**ctx, "docs": docs})
+        return templates.TemplateResponse(request, "docs.html", {**ctx, "docs": docs, "next_cursor": next_cursor})
 
     @ui.get("/docs/{doc_id}", response_class=HTMLResponse)
     def ui_doc_detail(doc_id: str, request: Request, db=Depends(get_db)):
@@ -259,12 +371,7 @@ if get_env_bool("UI_ENABLED", False):
         doc = db.get(models.Document, UUID(doc_id))
         if not doc:
             raise HTTPException(status_code=404, detail="not found")
-        latest = (
-            db.query(models.DocumentVersion)
-            .filter(models.DocumentVersion.document_id == doc.id)
-            .order_by(models.DocumentVersion.version.desc())
-            .first()
-        )
+        latest = latest_version(db, doc)
         report_md = None
         download_url = None
         if latest:
@@ -277,11 +384,14 @@ if get_env_bool("UI_ENABLED", False):
             if latest.storage_uri:
                 from urllib.parse import quote
                 download_url = f"/v0/uploads/presign_download?key={quote(latest.storage_uri, safe='')}"
+        job = _latest_job(db, doc.id)
         return templates.TemplateResponse(request, "doc_detail.html", {
             **ctx,
             "doc": doc,
             "doc_id": str(doc.id),
             "version": latest.version if latest else None,
+            "job": job,
+            "partial_text": _partial_text(job) if job else None,
             "report_md": report_md,
             "download_url": download_url,
         })
@@ -292,22 +402,19 @@ if get_env_bool("UI_ENABLED", False):
         return templates.TemplateResponse(request, "upload.html", ctx)
 
     @ui.get("/credits", response_class=HTMLResponse)
-    def ui_credits(request: Request, db=Depends(get_db)):
+    def ui_credits(request: Request, cursor: Optional[str] = None, db=Depends(get_db)):
         ctx = _ui_ctx()
         bal = {"balance": 0, "count": 0}
         ledger = []
+        next_cursor = None
         try:
             tenant = db.get(models.Tenant, UUID(ctx["tenant_id"]))
             if tenant:
-                entries = (
-                    db.query(models.Credit)
-                    .filter(models.Credit.tenant_id == tenant.id)
-                    .order_by(models.Credit.created_at.desc())
-                    .limit(25)
-                    .all()
+                entries, next_cursor = _keyset(
+                    db.query(models.Credit).filter(models.Credit.tenant_id == tenant.id), models.Credit, 25, cursor,
                 )
-                bal["balance"] = sum(e.delta for e in entries)
-                bal["count"] = len(entries)
+                # Whole-ledger totals: a page is only a slice of it
+                bal["balance"], bal["count"] = balances.balance(db, tenant.id)
                 ledger = [
                     {
                         "id": e.id,
@@ -320,7 +427,9 @@ if get_env_bool("UI_ENABLED", False):
                 ]
         except Exception:
             pass
-        return templates.TemplateResponse(request, "credits.html", {**ctx, "bal": bal, "ledger": ledger})
+        return templates.TemplateResponse(
+            request, "credits.html", {**ctx, "bal": bal, "ledger": ledger, "next_cursor": next_cursor},
+        )
 
     app.include_router(ui, prefix="/ui", tags=["ui"])
 
@@ -344,32 +453,67 @@ class PresignRequest(BaseModel):
     user_id: conint(ge=1)
     filename: constr(min_length=1)
     mime: Optional[constr(min_length=1)] = None
+    # Hash-first negotiation: with the client's digest (and size) presign
+    # answers "already present" for content the tenant has, and no URL
+    sha256: Optional[constr(pattern=r"^[0-9a-fA-F]{64}$")] = None
+    size: Optional[conint(ge=0)] = None
+
+
+def _already_present(db, tenant_id: UUID, sha256: str, size: Optional[int]) -> Optional[dict]:
+    """The tenant's stored document with these bytes (document, version, latest job), if any."""
+    doc = (
+        db.query(models.Document)
+        .filter(models.Document.tenant_id == tenant_id, models.Document.bytes_sha256 == sha256)
+        .first()
+    )
+    if doc is None:
+        return None
+    ver = latest_version(db, doc)
+    if ver is None:
+        return None
+    job = _latest_job(db, doc.id)
+    known_size = ((getattr(job, "features", None) or {}).get("size_bytes")) if job is not None else None
+    if size is not None and known_size is not None and int(known_size) != size:
+        # Same digest, different size: a client bug, not a duplicate
+        return None
+    return {
+        "already_present": True,
+        "document_id": str(doc.id),
+        "version": ver.version,
+        "storage_uri": ver.storage_uri,
+        "job": {"id": str(job.id), "status": job.status.value} if job is not None else None,
+    }
 
 
 @app.post("/v0/uploads/presign")
-def presign_upload(payload: PresignRequest, request: Request):
+def presign_upload(payload: PresignRequest, request: Request, db=Depends(get_db)):
     """
     Create a presigned PUT URL for direct upload to S3/MinIO.
-    No DB writes here. Returns object_key and URL.
+    No DB writes here. Returns object_key and URL, or the existing document
+    (no URL) when `sha256` matches content the tenant already has.
     """
     tenant_id = str(payload.tenant_id)
     # user_id is accepted but unused here; model validation enforces shape
     filename = payload.filename
     mime = payload.mime or "application/octet-stream"
 
+    if payload.sha256:
+        present = _already_present(db, payload.tenant_id, payload.sha256.lower(), payload.size)
+        if present is not None:
+            log.info("presign_already_present", tenant_id=tenant_id, document_id=present["document_id"])
+            return JSONResponse({**present, "mime": mime})
+
     # Random sha-like path id and short suffix to avoid collisions
-    rand_sha = secrets.token_hex(32)  # 64 hex chars
-    suffix = secrets.token_hex(4)     # 8 hex chars
-    object_key = f"{tenant_id}/{rand_sha[:2]}/{rand_sha}/v1/orig/{filename}.{suffix}"
+    object_key = _staging_key(tenant_id, filename)
 
-    storage = Storage()
+    storage = get_storage()
     # Check X-Internal-Network header to decide presign method
     if request.headers.get("X-Internal-Network"):
         url = storage.presign_put_url_internal(object_key, expiry=3600)
     else:
         url = storage.presign_put_url(object_key, expiry=3600)
     log.info("presign_created", tenant_id=tenant_id, user_id=int(payload.user_id), object_key=object_key)
-    return JSONResponse({"object_key": object_key, "url": url, "expiry": 3600, "mime": mime})
+    return JSONResponse({"already_present": False, "object_key": object_key, "url": url, "expiry": 3600, "mime": mime})
 
 
 @app.get("/v0/uploads/presign_download")
@@ -379,140 +523,270 @@ def presign_download(key: str, expiry: int = 600):
     """
     if not key:
         raise HTTPException(status_code=400, detail="key is required")
-    storage = Storage()
+    storage = get_storage()
     expiry = max(1, min(expiry, 24 * 3600))
     url = storage.presign_get_url(key, expiry=expiry)
     log.info("presign_download", key=key, expiry=expiry)
     return {"url": url, "expiry": expiry}
 
+# Blocking I/O (MinIO, SQLAlchemy, the broker) from async handlers runs on
+# worker threads so one large upload does not stall the event loop.
+# API_IO_THREADS bounds those threads; UPLOAD_FILE_CONCURRENCY bounds how many
+# files of one multipart request are spooled/stored at once.
+_io_limiter = None
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name, str(default))))
+    except Exception:
+        return default
+
+
+async def _blocking(fn, *args, **kwargs):
+    global _io_limiter
+    if _io_limiter is None:
+        _io_limiter = anyio.CapacityLimiter(_env_int("API_IO_THREADS", 16))
+    return await anyio.to_thread.run_sync(functools.partial(fn, *args, **kwargs), limiter=_io_limiter)
+
+
+async def _bounded_gather(calls, limit: int) -> list:
+    """Await (fn, *args) calls on _blocking, at most `limit` at a time, in order.
+    Every call finishes before the first error (if any) is raised."""
+    sem = asyncio.Semaphore(limit)
+
+    async def one(call):
+        async with sem:
+            return await _blocking(*call)
+
+    results = await asyncio.gather(*(one(c) for c in calls), return_exceptions=True)
+    for r in results:
+        if isinstance(r, BaseException):
+            raise r
+    return results
+
+
+def _staging_key(tenant_id: str, filename: str) -> str:
+    """Random staging key for an upload whose digest is not known yet
+    (".../v1/orig/..." keys are swept by scripts/staging_gc.py)."""
+    rand_sha = secrets.token_hex(32)  # 64 hex chars
+    suffix = secrets.token_hex(4)     # 8 hex chars
+    return f"{tenant_id}/{rand_sha[:2]}/{rand_sha}/v1/orig/{filename}.{suffix}"
+
+
+def _stream_upload(storage, f: UploadFile, tenant_id: str, staging_keys: list) -> dict:
+    """Stream an uploaded file to a staging key (appended to staging_keys for
+    cleanup), hashing and counting PDF pages on the way."""
+    mime = f.content_type or "application/octet-stream"
+    is_pdf = mime.lower() == "application/pdf"
+    pages = PdfPageCounter()
+    key = _staging_key(tenant_id, f.filename)
+    staging_keys.append(key)
+    f.file.seek(0)
+    reader = HashingReader(f.file, on_chunk=pages.feed if is_pdf else None)
+    size = getattr(f, "size", None)
+    storage.put_stream(key, reader, length=size if size is not None else -1, content_type=mime)
+    return {
+        "staging_key": key,
+        "filename": f.filename,
+        "mime": mime,
+        "size_bytes": reader.size,
+        "sha256": reader.hexdigest(),
+        "pages": pages.finish() if is_pdf else None,
+    }
+
+
+def _remove_quietly(storage, key: str) -> None:
+    try:
+        storage.remove_object(key)
+    except Exception as e:
+        log.warning("staging_remove_failed", key=key, error=str(e))
+
+
+def _upload_account(db, tenant_id: str, user_id: int):
+    tenant = db.get(models.Tenant, uuid.UUID(tenant_id))
+    if tenant is None:
+        raise HTTPException(status_code=400, detail="Unknown tenant_id")
+    user = db.get(models.User, user_id)
+    if user is None or str(user.tenant_id) != tenant_id:
+        raise HTTPException(status_code=400, detail="Invalid user for tenant")
+    return tenant, user
+
+
+def _stored_shas(db, tenant, shas) -> set:
+    """Digests that already have a stored version for this tenant (nothing to upload)."""
+    found = set()
+    for sha256 in shas:
+        doc = (
+            db.query(models.Document)
+            .filter(models.Document.tenant_id == tenant.id, models.Document.bytes_sha256 == sha256)
+            .first()
+        )
+        if doc is not None and latest_version(db, doc) is not None:
+            found.add(sha256)
+    return found
+
+
+def _record_upload(db, tenant, user, case_ref, item: dict, orig_key: str, lane: str, mode: str, profile: bool) -> dict:
+    """Create (or reuse) the document/version, then the job and credit estimate; commit and enqueue."""
+    sha256, mime, size_bytes = item["sha256"], item["mime"], item["size_bytes"]
+    # Idempotency: same bytes for the same tenant reuse the existing
+    # document and version (the worker then dedupes by fingerprint)
+    doc = (
+        db.query(models.Document)
+        .filter(models.Document.tenant_id == tenant.id, models.Document.bytes_sha256 == sha256)
+        .first()
+    )
+    ver = None
+    if doc is not None:
+        ver = latest_version(db, doc)
+    else:
+        doc = models.Document(
+            id=uuid.uuid4(),
+            tenant_id=tenant.id,
+            user_id=user.id,
+            case_ref=case_ref,
+            orig_filename=item["filename"],
+            mime=mime,
+            bytes_sha256=sha256,
+        )
+        db.add(doc)
+        db.flush()
+
+    if ver is None:
+        # The original was stored before any row points at it
+        ver = models.DocumentVersion(
+            document_id=doc.id,
+            version=1,
+            storage_uri=orig_key,
+        )
+        db.add(ver)
+        db.flush()
+
+    # Create job, classified for heavy/light routing
+    est_pages = estimate_pages(mime, size_bytes, item["pages"])
+    cost_class, cost_units = classify(mime, size_bytes, est_pages, mode)
+    job = models.ProcessingJob(
+        id=uuid.uuid4(),
+        document_id=doc.id,
+        status=ProcessingStatus.queued,
+        lane=lane,
+        quality_mode=mode,
+        est_pages=est_pages,
+        cost_units=cost_units,
+        cost_class=cost_class,
+        features=job_features(mime, size_bytes, est_pages, mode),
+        options=_job_options(profile=profile),
+    )
+    db.add(job)
+    db.flush()  # ensure job row exists before FK references (credits)
+
+    # Credit estimate (stub) based on size
+    estimate = estimate_credits(mime, size_bytes)
+    credit = models.Credit(
+        tenant_id=tenant.id,
+        user_id=user.id,
+        delta=-estimate,
+        reason="estimate",
+        job_id=job.id,
+        is_estimate=True,
+    )
+    db.add(credit)
+    db.commit()
+
+    # Enqueue background processing
+    enqueue_process_document(str(job.id), lane=lane, tenant_id=str(tenant.id), cost_class=cost_class)
+    log.info(
+        "job_enqueued", job_id=str(job.id), document_id=str(doc.id), tenant_id=str(tenant.id),
+        user_id=user.id, lane=lane, cost_class=cost_class, est_pages=est_pages,
+    )
+    # Metrics
+    UPLOAD_FILES_TOTAL.labels(tenant_id=str(tenant.id), mime=doc.mime).inc()
+    JOBS_QUEUED_TOTAL.labels(tenant_id=str(tenant.id)).inc()
+    JOBS_ROUTED_TOTAL.labels(cost_class=cost_class).inc()
+
+    # Compute current tenant balance after estimate
+    bal = _tenant_balance(db, tenant.id)
+    return {
+        "document_id": str(doc.id),
+        "job_id": str(job.id),
+        "credit_estimate": estimate,
+        "tenant_balance": int(bal),
+    }
+
+
 @app.post("/v0/documents/upload")
-@UPLOAD_HANDLE_SECONDS.time()
 async def upload_documents(
     tenant_id: str = Form(...),
     user_id: int = Form(...),
     case_ref: Optional[str] = Form(None),
     quality_mode: Optional[str] = Form(None),
+    lane: Optional[str] = Form(None),
+    profile: bool = Form(False),
     files: List[UploadFile] = File(...),
     db=Depends(get_db),
 ):
     if quality_mode not in {None, "recommended", "budget"}:
         raise HTTPException(status_code=400, detail="Invalid quality_mode")
-
-    storage = Storage()
-    out = []
-    # Basic existence checks for tenant/user (best-effort for now)
+    if not is_valid_lane(lane):
+        raise HTTPException(status_code=400, detail=f"Invalid lane; expected one of {', '.join(LANES)}")
+    lane = choose_lane(lane, file_count=len(files))
+    mode = _quality_mode(quality_mode)
+
+    # Timed by hand: Histogram.time() as a decorator does not await coroutines
+    started = _t.perf_counter()
+    storage = get_storage()
+    concurrency = _env_int("UPLOAD_FILE_CONCURRENCY", 4)
+    staging_keys: list = []
     try:
-        tenant = db.get(models.Tenant, uuid.UUID(tenant_id))
-        if tenant is None:
-            raise HTTPException(status_code=400, detail="Unknown tenant_id")
-        user = db.get(models.User, user_id)
-        if user is None or str(user.tenant_id) != tenant_id:
-            raise HTTPException(status_code=400, detail="Invalid user for tenant")
-
-        total_bytes = 0
+        # Basic existence checks for tenant/user (best-effort for now)
+        tenant, user = await _blocking(_upload_account, db, tenant_id, user_id)
+        # Early denylist check to avoid storing obviously non-litigation artefacts
         for f in files:
-            # Stream to temp file and compute sha256 incrementally to avoid large memory usage
-            mime = f.content_type or "application/octet-stream"
-            # Early denylist check to avoid storing obviously non-litigation artefacts
-            denied, reason = deny_reason_for(f.filename or "", mime)
+            denied, reason = deny_reason_for(f.filename or "", f.content_type or "application/octet-stream")
             if denied:
                 raise HTTPException(status_code=400, detail=reason)
-            hasher = hashlib.sha256()
-            size_bytes = 0
-            with tempfile.NamedTemporaryFile(delete=False) as tf:
-                try:
-                    while True:
-                        chunk = await f.read(1024 * 1024)
-                        if not chunk:
-                            break
-                        size_bytes += len(chunk)
-                        hasher.update(chunk)
-                        tf.write(chunk)
-                    temp_path = tf.name
-                finally:
-                    tf.flush()
-            total_bytes += size_bytes
-            sha256 = hasher.hexdigest()
-            # Create document
-            doc = models.Document(
-                id=uuid.uuid4(),
-                tenant_id=tenant.id,
-                user_id=user.id,
-                case_ref=case_ref,
-                orig_filename=f.filename,
-                mime=mime,
-                bytes_sha256=sha256,
-            )
-            db.add(doc)
-            db.flush()
-
-            # Store original
-            orig_key = storage.object_key(tenant_id=str(tenant.id), sha256=sha256, version=1, filename=f.filename)
-            with open(temp_path, "rb") as rf:
-                storage.put_file(orig_key, rf, length=size_bytes, content_type=mime)
-
-            # Create version with placeholder paths
-            ver = models.DocumentVersion(
-                document_id=doc.id,
-                version=1,
-                storage_uri=orig_key,
-            )
-            db.add(ver)
-            db.flush()
 
-            # Create job
-            job = models.ProcessingJob(
-                id=uuid.uuid4(),
-                document_id=doc.id,
-                status=ProcessingStatus.queued,
-            )
-            db.add(job)
-
-            # Credit estimate (stub) based on size
-            estimate = estimate_credits(mime, size_bytes)
-            credit = models.Credit(
-                tenant_id=tenant.id,
-                user_id=user.id,
-                delta=-estimate,
-                reason="estimate",
-                job_id=job.id,
-                is_estimate=True,
-            )
-            db.add(credit)
-            db.commit()
-
-            # Enqueue background processing
-            enqueue_process_document(str(job.id))
-            log.info("job_enqueued", job_id=str(job.id), document_id=str(doc.id), tenant_id=str(tenant.id), user_id=user.id)
-            # Metrics
-            UPLOAD_FILES_TOTAL.labels(tenant_id=str(tenant.id), mime=doc.mime).inc()
-            JOBS_QUEUED_TOTAL.labels(tenant_id=str(tenant.id)).inc()
-
-            # Compute current tenant balance after estimate
-            bal = sum(e.delta for e in db.query(models.Credit).filter(models.Credit.tenant_id == tenant.id).all())
+        # Stream to staging keys while hashing, then copy each new digest to its
+        # content-addressed key server-side; files in parallel
+        spooled = await _bounded_gather(
+            [(_stream_upload, storage, f, str(tenant.id), staging_keys) for f in files], concurrency,
+        )
+        stored = await _blocking(_stored_shas, db, tenant, {item["sha256"] for item in spooled})
+        keys: dict = {}
+        for item in spooled:
+            if item["sha256"] not in keys:
+                keys[item["sha256"]] = storage.object_key(
+                    tenant_id=str(tenant.id), sha256=item["sha256"], version=1, filename=item["filename"],
+                )
+        uploads = {item["sha256"]: item for item in spooled if item["sha256"] not in stored}
+        await _bounded_gather(
+            [(storage.copy_object, item["staging_key"], keys[sha]) for sha, item in uploads.items()], concurrency,
+        )
 
-            out.append({
-                "document_id": str(doc.id),
-                "job_id": str(job.id),
-                "credit_estimate": estimate,
-                "tenant_balance": int(bal),
-            })
-            # Cleanup temp file
-            try:
-                os.unlink(temp_path)
-            except Exception:
-                pass
+        # Rows, commits and enqueues stay sequential on the request's session
+        out = []
+        for item in spooled:
+            out.append(await _blocking(
+                _record_upload, db, tenant, user, case_ref, item, keys[item["sha256"]], lane, mode, profile,
+            ))
+        total_bytes = sum(item["size_bytes"] for item in spooled)
         # Record bytes once per request
         UPLOAD_BYTES_TOTAL.labels(tenant_id=str(tenant.id)).inc(total_bytes)
         log.info("upload_completed", tenant_id=str(tenant.id), files=len(files), total_bytes=total_bytes)
         return JSONResponse({"documents": out})
     except HTTPException:
-        db.rollback()
+        await _blocking(db.rollback)
         raise
     except Exception as e:
-        db.rollback()
+        await _blocking(db.rollback)
         log.error("upload_documents_error", error=str(e))
         raise HTTPException(status_code=500, detail="internal error")
+    finally:
+        # Staging objects are never referenced by a version
+        if staging_keys:
+            await _bounded_gather([(_remove_quietly, storage, key) for key in staging_keys], concurrency)
+        UPLOAD_HANDLE_SECONDS.observe(_t.perf_counter() - started)
 
 
 @app.get("/v0/jobs/{job_id}")
@@ -524,33 +798,55 @@ def get_job(job_id: str, db=Depends(get_db)):
         "id": str(job.id),
         "document_id": str(job.document_id),
         "status": job.status.value,
+        "lane": getattr(job, "lane", None),
+        "cost_class": getattr(job, "cost_class", None),
+        "est_pages": getattr(job, "est_pages", None),
+        "attempts": getattr(job, "attempts", None),
+        "deadline_at": job.deadline_at.isoformat() if getattr(job, "deadline_at", None) else None,
+        # Progressive results: first pages are available before the job finishes
+        "pages_completed": getattr(job, "pages_completed", None),
+        "partial_text_uri": getattr(job, "partial_text_uri", None),
+        "partial_text": _partial_text(job),
+        "eta": _job_eta(db, job),
+        "heartbeat_at": job.heartbeat_at.isoformat() if getattr(job, "heartbeat_at", None) else None,
         "steps": job.steps,
+        "metrics": getattr(job, "metrics", None),
         "error": job.error,
         "started_at": job.started_at.isoformat() if job.started_at else None,
         "finished_at": job.finished_at.isoformat() if job.finished_at else None,
     }
 
 
+@app.get("/v0/jobs/{job_id}/profile")
+def get_job_profile(job_id: str, db=Depends(get_db)):
+    """Collapsed-stack profile of a profiled job (flamegraph.pl / speedscope input)."""
+    job = db.get(models.ProcessingJob, uuid.UUID(job_id))
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    uri = ((getattr(job, "metrics", None) or {}).get("profile") or {}).get("uri")
+    if not uri:
+        raise HTTPException(status_code=404, detail="no profile for this job")
+    try:
+        data = get_storage().get_object_bytes(uri)
+    except Exception:
+        raise HTTPException(status_code=404, detail="profile not found in storage")
+    return PlainTextResponse(data.decode("utf-8", errors="ignore"))
+
+
 @app.get("/v0/documents")
-def list_documents(tenant_id: str, limit: int = 20, db=Depends(get_db)):
-    """List recent documents for a tenant with their latest version."""
+def list_documents(tenant_id: str, limit: int = 20, cursor: Optional[str] = None, db=Depends(get_db)):
+    """List a tenant's documents with their latest version, newest first;
+    pass `next_cursor` back as `cursor` for the next page."""
     tenant = db.get(models.Tenant, uuid.UUID(tenant_id))
     if tenant is None:
         raise HTTPException(status_code=400, detail="Unknown tenant_id")
-    q = (
-        db.query(models.Document)
-        .filter(models.Document.tenant_id == tenant.id)
-        .order_by(models.Document.created_at.desc())
-        .limit(max(1, min(limit, 200)))
+    # One query: the latest version comes from the documents.latest_version_id join
+    rows, next_cursor = _keyset(
+        with_latest_version(db.query(models.Document)).filter(models.Document.tenant_id == tenant.id),
+        models.Document, max(1, min(limit, 200)), cursor, key=_doc_key,
     )
     items = []
-    for doc in q.all():
-        latest = (
-            db.query(models.DocumentVersion)
-            .filter(models.DocumentVersion.document_id == doc.id)
-            .order_by(models.DocumentVersion.version.desc())
-            .first()
-        )
+    for doc, latest in rows:
         items.append({
             "id": str(doc.id),
             "orig_filename": doc.orig_filename,
@@ -558,22 +854,42 @@ def list_documents(tenant_id: str, limit: int = 20, db=Depends(get_db)):
             "created_at": doc.created_at.isoformat(),
             "latest_version": latest.version if latest else None,
         })
-    return {"documents": items}
+    return {"documents": items, "next_cursor": next_cursor}
 
 
 @app.post("/v0/documents/{document_id}/reprocess")
-def reprocess_document(document_id: str, db=Depends(get_db)):
-    """Create a new version and job to reprocess the document using the latest pipeline."""
-    storage = Storage()
+def reprocess_document(
+    document_id: str,
+    lane: Optional[str] = None,
+    full: bool = False,
+    force_stages: Optional[str] = None,
+    profile: bool = False,
+    quality_mode: Optional[str] = None,
+    db=Depends(get_db),
+):
+    """Create a new version and job to reprocess the document using the latest pipeline.
+
+    Only stages whose version or settings changed re-run; the rest reuse the
+    previous artifacts. `force_stages` (comma-separated) or `full` re-run
+    stages regardless. `profile` records a stack profile of the run.
+    `quality_mode` defaults to the previous job's mode.
+    """
+    if quality_mode not in {None, "recommended", "budget"}:
+        raise HTTPException(status_code=400, detail="Invalid quality_mode")
+    if not is_valid_lane(lane):
+        raise HTTPException(status_code=400, detail=f"Invalid lane; expected one of {', '.join(LANES)}")
+    forced = [p.strip() for p in (force_stages or "").split(",") if p.strip()]
+    unknown = [p for p in forced if p not in STAGE_VERSIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown stage(s) {', '.join(unknown)}; expected {', '.join(STAGE_VERSIONS)}")
+    if full:
+        forced = list(STAGE_VERSIONS)
+    lane = choose_lane(lane, reprocess=True)
+    storage = get_storage()
     doc = db.get(models.Document, uuid.UUID(document_id))
     if doc is None:
         raise HTTPException(status_code=404, detail="document not found")
-    latest = (
-        db.query(models.DocumentVersion)
-        .filter(models.DocumentVersion.document_id == doc.id)
-        .order_by(models.DocumentVersion.version.desc())
-        .first()
-    )
+    latest = latest_version(db, doc)
     if latest is None:
         raise HTTPException(status_code=409, detail="no prior version; upload first")
     new_version = latest.version + 1
@@ -586,29 +902,47 @@ def reprocess_document(document_id: str, db=Depends(get_db)):
     db.add(new_ver)
     db.flush()
 
+    # The previous run measured the real page count; route on that
+    prev_pages = (getattr(latest, "metrics", None) or {}).get("page_count")
+    prev_job = _latest_job(db, doc.id)
+    mode = _quality_mode(quality_mode or getattr(prev_job, "quality_mode", None))
+    prev_size = ((getattr(prev_job, "features", None) or {}).get("size_bytes")) or 0
+    est_pages = estimate_pages(doc.mime, prev_size, prev_pages if isinstance(prev_pages, int) else None)
+    cost_class, cost_units = classify(doc.mime, prev_size, est_pages, mode)
     job = models.ProcessingJob(
         id=uuid.uuid4(),
         document_id=doc.id,
         status=ProcessingStatus.queued,
+        lane=lane,
+        quality_mode=mode,
+        est_pages=est_pages,
+        cost_units=cost_units,
+        cost_class=cost_class,
+        features=job_features(doc.mime, prev_size, est_pages, mode),
+        options=_job_options(force_stages=forced or None, full=bool(full) if forced else None, profile=profile),
     )
     db.add(job)
     db.flush()  # ensure job row exists before FK references (credits)
     db.commit()
 
-    enqueue_process_document(str(job.id))
-    return {"document_id": str(doc.id), "new_version": new_version, "job_id": str(job.id)}
+    enqueue_process_document(str(job.id), lane=lane, tenant_id=str(doc.tenant_id), cost_class=cost_class)
+    JOBS_ROUTED_TOTAL.labels(cost_class=cost_class).inc()
+    return {
+        "document_id": str(doc.id),
+        "new_version": new_version,
+        "job_id": str(job.id),
+        "lane": lane,
+        # Stage versions that moved since the previous run, plus forced ones
+        "stages_changed": changed_stages(getattr(latest, "stages", None)),
+        "force_stages": forced,
+    }
 
 @app.get("/v0/documents/{document_id}/report.json")
 def report_json(document_id: str, db=Depends(get_db)):
     doc = db.get(models.Document, uuid.UUID(document_id))
     if doc is None:
         raise HTTPException(status_code=404, detail="document not found")
-    latest = (
-        db.query(models.DocumentVersion)
-        .filter(models.DocumentVersion.document_id == doc.id)
-        .order_by(models.DocumentVersion.version.desc())
-        .first()
-    )
+    latest = latest_version(db, doc)
     return {
         "document_id": str(doc.id),
         "orig_filename": doc.orig_filename,
@@ -624,12 +958,7 @@ def report_md(document_id: str, db=Depends(get_db)):
     doc = db.get(models.Document, uuid.UUID(document_id))
     if doc is None:
         raise HTTPException(status_code=404, detail="document not found")
-    latest = (
-        db.query(models.DocumentVersion)
-        .filter(models.DocumentVersion.document_id == doc.id)
-        .order_by(models.DocumentVersion.version.desc())
-        .first()
-    )
+    latest = latest_version(db, doc)
     lines = [f"# Document Report", f"- Document ID: {doc.id}", f"- Filename: {doc.orig_filename}", f"- MIME: {doc.mime}"]
     if latest:
         lines.append(f"- Version: {latest.version}")
@@ -647,14 +976,19 @@ def processed_json(document_id: str, db=Depends(get_db)):
     doc = db.get(models.Document, uuid.UUID(document_id))
     if doc is None:
         raise HTTPException(status_code=404, detail="document not found")
-    latest = (
-        db.query(models.DocumentVersion)
-        .filter(models.DocumentVersion.document_id == doc.id)
-        .order_by(models.DocumentVersion.version.desc())
-        .first()
-    )
+    latest = latest_version(db, doc)
     if latest is None:
         raise HTTPException(status_code=404, detail="no versions for document")
+    job = _latest_job(db, doc.id)
+    progress = None
+    if job is not None and job.status in (ProcessingStatus.queued, ProcessingStatus.running):
+        progress = {
+            "job_id": str(job.id),
+            "status": job.status.value,
+            "pages_completed": getattr(job, "pages_completed", None),
+            "partial_text_uri": getattr(job, "partial_text_uri", None),
+            "partial_text": _partial_text(job),
+        }
     return {
         "schema_version": 1,
         "document_id": str(doc.id),
@@ -667,6 +1001,8 @@ def processed_json(document_id: str, db=Depends(get_db)):
         },
         "metrics": latest.metrics or {},
         "warnings": latest.warnings or [],
+        # Present while the latest job is still running
+        "progress": progress,
     }
 
 
@@ -685,40 +1021,25 @@ def credits_balance(tenant_id: str, user_id: Optional[int] = None, db=Depends(ge
     if tenant is None:
         raise HTTPException(status_code=404, detail="tenant not found")
 
-    # Prefer DB aggregation; fallback to in-Python sum if unavailable (e.g., unit tests with dummy DB)
-    try:
-        q = db.query(func.coalesce(func.sum(models.Credit.delta), 0), func.count(models.Credit.id)) \
-              .filter(models.Credit.tenant_id == tenant.id)
-        if user_id is not None:
-            q = q.filter(models.Credit.user_id == user_id)
-        total, count = q.one()
-        return {"tenant_id": str(tenant.id), "user_id": user_id, "balance": int(total or 0), "count": int(count or 0)}
-    except Exception:
-        q = db.query(models.Credit).filter(models.Credit.tenant_id == tenant.id)
-        if user_id is not None:
-            q = q.filter(models.Credit.user_id == user_id)
-        entries = q.all()
-        balance = sum(getattr(e, 'delta', 0) for e in entries)
-        return {"tenant_id": str(tenant.id), "user_id": user_id, "balance": int(balance), "count": len(entries)}
+    total, count = balances.balance(db, tenant.id, user_id)
+    return {"tenant_id": str(tenant.id), "user_id": user_id, "balance": total, "count": count}
 
 
 @app.get("/v0/credits/ledger")
-def credits_ledger(tenant_id: str, limit: int = 50, db=Depends(get_db)):
-    """Return recent credit ledger rows for a tenant (descending by created_at)."""
+def credits_ledger(tenant_id: str, limit: int = 50, cursor: Optional[str] = None, db=Depends(get_db)):
+    """Return credit ledger rows for a tenant (descending by created_at); pass
+    `next_cursor` back as `cursor` for the next page."""
     try:
         tenant = db.get(models.Tenant, uuid.UUID(tenant_id))
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid tenant_id")
     if tenant is None:
         raise HTTPException(status_code=404, detail="tenant not found")
-    q = (
-        db.query(models.Credit)
-        .filter(models.Credit.tenant_id == tenant.id)
-        .order_by(models.Credit.created_at.desc())
-        .limit(max(1, min(200, limit)))
+    entries, next_cursor = _keyset(
+        db.query(models.Credit).filter(models.Credit.tenant_id == tenant.id), models.Credit, max(1, min(200, limit)), cursor,
     )
     rows = []
-    for e in q.all():
+    for e in entries:
         rows.append({
             "id": e.id,
             "user_id": e.user_id,
@@ -728,7 +1049,7 @@ def credits_ledger(tenant_id: str, limit: int = 50, db=Depends(get_db)):
             "is_estimate": bool(e.is_estimate),
             "created_at": e.created_at.isoformat(),
         })
-    return {"tenant_id": str(tenant.id), "items": rows}
+    return {"tenant_id": str(tenant.id), "items": rows, "next_cursor": next_cursor}
 
 
 @app.get("/v0/credits/summary")
@@ -741,41 +1062,7 @@ def credits_summary(tenant_id: str, db=Depends(get_db)):
     if tenant is None:
         raise HTTPException(status_code=404, detail="tenant not found")
 
-    try:
-        # Total
-        total = db.query(func.coalesce(func.sum(models.Credit.delta), 0)) \
-                 .filter(models.Credit.tenant_id == tenant.id).scalar()
-        # By reason
-        rows = db.query(models.Credit.reason, func.coalesce(func.sum(models.Credit.delta), 0)) \
-                 .filter(models.Credit.tenant_id == tenant.id) \
-                 .group_by(models.Credit.reason).all()
-        by_reason = {r: int(v or 0) for r, v in rows}
-        # Pending estimates
-        pe_count, pe_sum = db.query(func.count(models.Credit.id), func.coalesce(func.sum(models.Credit.delta), 0)) \
-                             .filter(models.Credit.tenant_id == tenant.id, models.Credit.is_estimate == True).one()
-        return {
-            "tenant_id": str(tenant.id),
-            "total": int(total or 0),
-            "by_reason": by_reason,
-            "pending_estimates": {"count": int(pe_count or 0), "sum": int(pe_sum or 0)},
-        }
-    except Exception:
-        entries = db.query(models.Credit).filter(models.Credit.tenant_id == tenant.id).all()
-        total = sum(getattr(e, 'delta', 0) for e in entries)
-        by_reason = {}
-        pending_estimates = {"count": 0, "sum": 0}
-        for e in entries:
-            reason = getattr(e, 'reason', 'unknown')
-            by_reason[reason] = int(by_reason.get(reason, 0) + getattr(e, 'delta', 0))
-            if getattr(e, 'is_estimate', False):
-                pending_estimates["count"] += 1
-                pending_estimates["sum"] += getattr(e, 'delta', 0)
-        return {
-            "tenant_id": str(tenant.id),
-            "total": int(total),
-            "by_reason": by_reason,
-            "pending_estimates": {"count": int(pending_estimates["count"]), "sum": int(pending_estimates["sum"])},
-        }
+    return {"tenant_id": str(tenant.id), **balances.summary(db, tenant.id)}
 
 
 class FinalizeRequest(BaseModel):
@@ -784,6 +1071,55 @@ class FinalizeRequest(BaseModel):
     key: constr(min_length=1)
     filename: Optional[constr(min_length=1)] = None
     mime: Optional[constr(min_length=1)] = None
+    lane: Optional[str] = None
+    quality_mode: Optional[str] = None
+    profile: bool = False
+    # Client-computed digest of the uploaded bytes: finalize then only stats the
+    # object (checked against its S3 SHA-256 checksum when it has one; the
+    # worker re-checks when it reads the original) instead of hashing it here
+    sha256: Optional[constr(pattern=r"^[0-9a-fA-F]{64}$")] = None
+
+
+def _probe_staged(storage, key: str, mime: str, claimed_sha256: Optional[str] = None) -> dict:
+    """Verified digest, size and PDF page count of a staged object without loading it.
+
+    Size comes from the object's metadata. A client-supplied digest is taken
+    as-is only when the object's S3 SHA-256 checksum confirms it; otherwise
+    the object is stream-hashed in bounded chunks and a claim that does not
+    match is a 400. The digest is trusted from here on (document reuse,
+    content-addressed key, fingerprint dedupe), so it is never unverified."""
+    try:
+        stat = storage.stat(key)
+    except Exception as e:
+        log.error("finalize_fetch_error", key=key, error=str(e))
+        raise HTTPException(status_code=404, detail="Object not found at key")
+    is_pdf = mime.lower() == "application/pdf"
+    claimed = claimed_sha256.lower() if claimed_sha256 else None
+    if claimed and stat.get("sha256"):
+        if stat["sha256"] != claimed:
+            raise HTTPException(status_code=400, detail="sha256 does not match the uploaded object")
+        return {"sha256": claimed, "size_bytes": int(stat["size"] or 0), "pages": None}
+    pages = PdfPageCounter()
+    try:
+        sha256, size_bytes = storage.hash_object(key, on_chunk=pages.feed if is_pdf else None)
+    except Exception as e:
+        log.error("finalize_fetch_error", key=key, error=str(e))
+        raise HTTPException(status_code=404, detail="Object not found at key")
+    if claimed and sha256 != claimed:
+        log.warning("finalize_digest_mismatch", key=key, claimed=claimed, actual=sha256)
+        raise HTTPException(status_code=400, detail="sha256 does not match the uploaded object")
+    return {"sha256": sha256, "size_bytes": size_bytes, "pages": pages.finish() if is_pdf else None}
+
+
+def _final_filename(key: str, filename: Optional[str]) -> str:
+    if filename:
+        return filename
+    filename = os.path.basename(key)
+    # If a random 8-hex suffix exists at the end, strip it (e.g., file.pdf.ab12cd34)
+    parts = filename.split(".")
+    if len(parts) >= 3 and len(parts[-1]) == 8 and all(c in "0123456789abcdef" for c in parts[-1]):
+        filename = ".".join(parts[:-1])
+    return filename
 
 
 @app.post("/v0/uploads/finalize")
@@ -796,8 +1132,14 @@ def finalize_upload(payload: FinalizeRequest, db=Depends(get_db)):
     key = payload.key
     filename = payload.filename
     mime = payload.mime or "application/octet-stream"
+    if not is_valid_lane(payload.lane):
+        raise HTTPException(status_code=400, detail=f"Invalid lane; expected one of {', '.join(LANES)}")
+    lane = choose_lane(payload.lane)
+    if payload.quality_mode not in {None, "recommended", "budget"}:
+        raise HTTPException(status_code=400, detail="Invalid quality_mode")
+    mode = _quality_mode(payload.quality_mode)
 
-    storage = Storage()
+    storage = get_storage()
     # Validate tenant and user
     tenant = db.get(models.Tenant, uuid.UUID(tenant_id))
     if tenant is None:
@@ -806,25 +1148,9 @@ def finalize_upload(payload: FinalizeRequest, db=Depends(get_db)):
     if user is None or str(user.tenant_id) != tenant_id:
         raise HTTPException(status_code=400, detail="Invalid user for tenant")
 
-    # Fetch object bytes from staging location
-    try:
-        content = storage.get_object_bytes(key)
-    except Exception as e:
-        log.error("finalize_fetch_error", key=key, error=str(e))
-        raise HTTPException(status_code=404, detail="Object not found at key")
-
-    # Compute SHA256
-    sha256 = Storage.sha256_hex(content)
-
-    # Derive final storage key
-    if not filename:
-        import os as _os
-        filename = _os.path.basename(key)
-        # If a random 8-hex suffix exists at the end, strip it (e.g., file.pdf.ab12cd34)
-        parts = filename.split(".")
-        if len(parts) >= 3 and len(parts[-1]) == 8 and all(c in "0123456789abcdef" for c in parts[-1]):
-            filename = ".".join(parts[:-1])
-
+    staged = _probe_staged(storage, key, mime, payload.sha256)
+    sha256, size_bytes = staged["sha256"], staged["size_bytes"]
+    filename = _final_filename(key, filename)
     final_key = storage.object_key(tenant_id=str(tenant.id), sha256=sha256, version=1, filename=filename)
 
     # Idempotency guard: if a document with same SHA already exists for this tenant, reuse it
@@ -836,12 +1162,7 @@ def finalize_upload(payload: FinalizeRequest, db=Depends(get_db)):
     if existing_doc:
         doc = existing_doc
         # Prefer existing version's storage_uri if present; avoid duplicate copy
-        existing_ver = (
-            db.query(models.DocumentVersion)
-            .filter(models.DocumentVersion.document_id == doc.id)
-            .order_by(models.DocumentVersion.version.desc())
-            .first()
-        )
+        existing_ver = latest_version(db, doc)
         if not existing_ver:
             # Create an initial version pointing to final_key (copy if missing)
             if not storage.object_exists(final_key):
@@ -879,17 +1200,26 @@ def finalize_upload(payload: FinalizeRequest, db=Depends(get_db)):
         except Exception:
             log.error("staging_delete_failed", key=key)
 
-    # Create ProcessingJob
+    # Create ProcessingJob, classified for heavy/light routing
+    est_pages = estimate_pages(mime, size_bytes, staged["pages"])
+    cost_class, cost_units = classify(mime, size_bytes, est_pages, mode)
     job = models.ProcessingJob(
         id=uuid.uuid4(),
         document_id=doc.id,
         status=ProcessingStatus.queued,
+        lane=lane,
+        quality_mode=mode,
+        est_pages=est_pages,
+        cost_units=cost_units,
+        cost_class=cost_class,
+        features=job_features(mime, size_bytes, est_pages, mode),
+        options=_job_options(profile=payload.profile),
     )
     db.add(job)
     db.flush()  # ensure job id persisted before creating credit
 
     # Estimate credits
-    estimate = estimate_credits(mime, len(content))
+    estimate = estimate_credits(mime, size_bytes)
     credit = models.Credit(
         tenant_id=tenant.id,
         user_id=user.id,
@@ -902,11 +1232,15 @@ def finalize_upload(payload: FinalizeRequest, db=Depends(get_db)):
     db.commit()
 
     # Enqueue for processing
-    enqueue_process_document(str(job.id))
-    log.info("job_enqueued", job_id=str(job.id), document_id=str(doc.id), tenant_id=str(tenant.id), user_id=user.id)
+    enqueue_process_document(str(job.id), lane=lane, tenant_id=str(tenant.id), cost_class=cost_class)
+    JOBS_ROUTED_TOTAL.labels(cost_class=cost_class).inc()
+    log.info(
+        "job_enqueued", job_id=str(job.id), document_id=str(doc.id), tenant_id=str(tenant.id),
+        user_id=user.id, lane=lane, cost_class=cost_class, est_pages=est_pages,
+    )
 
     # Compute fresh balance including just-inserted estimate
-    bal = sum(e.delta for e in db.query(models.Credit).filter(models.Credit.tenant_id == tenant.id).all())
+    bal = _tenant_balance(db, tenant.id)
     log.info("finalize_ok", document_id=str(doc.id), job_id=str(job.id), version=1)
     return JSONResponse({
         "document_id": str(doc.id),
@@ -916,3 +1250,269 @@ def finalize_upload(payload: FinalizeRequest, db=Depends(get_db)):
         "credit_estimate": estimate,
         "tenant_balance": int(bal),
     })
+
+
+# -----------------
+# Batch presign / finalize
+# -----------------
+class PresignBatchItem(BaseModel):
+    filename: constr(min_length=1)
+    mime: Optional[constr(min_length=1)] = None
+    sha256: Optional[constr(pattern=r"^[0-9a-fA-F]{64}$")] = None
+    size: Optional[conint(ge=0)] = None
+
+
+class PresignBatchRequest(BaseModel):
+    tenant_id: UUID
+    user_id: conint(ge=1)
+    items: List[PresignBatchItem]
+
+
+class FinalizeBatchItem(BaseModel):
+    key: constr(min_length=1)
+    filename: Optional[constr(min_length=1)] = None
+    mime: Optional[constr(min_length=1)] = None
+    sha256: Optional[constr(pattern=r"^[0-9a-fA-F]{64}$")] = None
+    profile: bool = False
+
+
+class FinalizeBatchRequest(BaseModel):
+    tenant_id: UUID
+    user_id: conint(ge=1)
+    lane: Optional[str] = None
+    quality_mode: Optional[str] = None
+    items: List[FinalizeBatchItem]
+
+
+def _check_batch_size(items) -> None:
+    limit = _env_int("UPLOAD_BATCH_MAX", 500)
+    if not items:
+        raise HTTPException(status_code=400, detail="items must not be empty")
+    if len(items) > limit:
+        raise HTTPException(status_code=400, detail=f"At most {limit} items per batch")
+
+
+def _documents_by_sha(db, tenant_id, shas) -> dict:
+    """The tenant's documents for these digests with their latest version and
+    job, as {sha256: (doc, ver, job)}, in three queries."""
+    if not shas:
+        return {}
+    docs = (
+        db.query(models.Document)
+        .filter(models.Document.tenant_id == tenant_id, models.Document.bytes_sha256.in_(list(shas)))
+        .all()
+    )
+    ids = [d.id for d in docs]
+    if not ids:
+        return {}
+    versions: dict = {}
+    pointers = [d.latest_version_id for d in docs if getattr(d, "latest_version_id", None) is not None]
+    unpointed = [d.id for d in docs if getattr(d, "latest_version_id", None) is None]
+    if pointers:
+        for v in db.query(models.DocumentVersion).filter(models.DocumentVersion.id.in_(pointers)).all():
+            versions[v.document_id] = v
+    if unpointed:
+        for v in db.query(models.DocumentVersion).filter(models.DocumentVersion.document_id.in_(unpointed)).all():
+            if v.document_id not in versions or v.version > versions[v.document_id].version:
+                versions[v.document_id] = v
+    jobs: dict = {}
+    for j in (
+        db.query(models.ProcessingJob)
+        .filter(models.ProcessingJob.document_id.in_(ids))
+        .order_by(models.ProcessingJob.created_at.desc())
+        .all()
+    ):
+        jobs.setdefault(j.document_id, j)
+    return {d.bytes_sha256: (d, versions.get(d.id), jobs.get(d.id)) for d in docs}
+
+
+def _map_bounded(fn, args_list) -> list:
+    """Run fn over args_list on up to UPLOAD_FILE_CONCURRENCY threads; results
+    (or the raised exception) in order."""
+    def one(args):
+        try:
+            return fn(*args)
+        except Exception as e:
+            return e
+
+    if not args_list:
+        return []
+    with ThreadPoolExecutor(max_workers=min(len(args_list), _env_int("UPLOAD_FILE_CONCURRENCY", 4))) as pool:
+        return list(pool.map(one, args_list))
+
+
+def _item_error(index: int, e: Exception) -> dict:
+    if isinstance(e, HTTPException):
+        return {"index": index, "status_code": e.status_code, "error": e.detail}
+    return {"index": index, "status_code": 500, "error": "internal error"}
+
+
+@app.post("/v0/uploads/presign:batch")
+def presign_upload_batch(payload: PresignBatchRequest, request: Request, db=Depends(get_db)):
+    """
+    Presign many uploads at once. Items with a `sha256` the tenant already has
+    come back as `already_present` (no URL). Per-item results, in order.
+    """
+    _check_batch_size(payload.items)
+    tenant, user = _upload_account(db, str(payload.tenant_id), int(payload.user_id))
+    present = _documents_by_sha(db, tenant.id, {i.sha256.lower() for i in payload.items if i.sha256})
+    storage = get_storage()
+    internal = bool(request.headers.get("X-Internal-Network"))
+    out = []
+    for index, item in enumerate(payload.items):
+        mime = item.mime or "application/octet-stream"
+        doc, ver, job = present.get((item.sha256 or "").lower(), (None, None, None))
+        known_size = (getattr(job, "features", None) or {}).get("size_bytes") if job is not None else None
+        if doc is not None and ver is not None and not (
+            item.size is not None and known_size is not None and int(known_size) != item.size
+        ):
+            out.append({
+                "index": index,
+                "already_present": True,
+                "document_id": str(doc.id),
+                "version": ver.version,
+                "storage_uri": ver.storage_uri,
+                "job": {"id": str(job.id), "status": job.status.value} if job is not None else None,
+                "mime": mime,
+            })
+            continue
+        object_key = _staging_key(str(tenant.id), item.filename)
+        url = storage.presign_put_url_internal(object_key, expiry=3600) if internal else storage.presign_put_url(object_key, expiry=3600)
+        out.append({"index": index, "already_present": False, "object_key": object_key, "url": url, "expiry": 3600, "mime": mime})
+    log.info(
+        "presign_batch", tenant_id=str(tenant.id), user_id=user.id, items=len(out),
+        already_present=sum(1 for o in out if o["already_present"]),
+    )
+    return JSONResponse({"items": out})
+
+
+@app.post("/v0/uploads/finalize:batch")
+def finalize_upload_batch(payload: FinalizeBatchRequest, db=Depends(get_db)):
+    """
+    Finalize many presigned uploads in one request: tenant/user checked once,
+    staged objects probed and copied concurrently, all rows added in one
+    transaction (flushed as multi-row INSERTs) and jobs enqueued together.
+    Items that fail (missing object, digest mismatch) are reported per item.
+    """
+    _check_batch_size(payload.items)
+    if not is_valid_lane(payload.lane):
+        raise HTTPException(status_code=400, detail=f"Invalid lane; expected one of {', '.join(LANES)}")
+    lane = choose_lane(payload.lane, file_count=len(payload.items))
+    if payload.quality_mode not in {None, "recommended", "budget"}:
+        raise HTTPException(status_code=400, detail="Invalid quality_mode")
+    mode = _quality_mode(payload.quality_mode)
+    tenant, user = _upload_account(db, str(payload.tenant_id), int(payload.user_id))
+    storage = get_storage()
+
+    results: List[Optional[dict]] = [None] * len(payload.items)
+    probes = _map_bounded(_probe_staged, [
+        (storage, item.key, item.mime or "application/octet-stream", item.sha256) for item in payload.items
+    ])
+    ok = []
+    for index, (item, probe) in enumerate(zip(payload.items, probes)):
+        if isinstance(probe, Exception):
+            results[index] = _item_error(index, probe)
+        else:
+            ok.append((index, item, probe))
+
+    # One version per digest: reuse the tenant's, else copy the first staged object to it
+    existing = _documents_by_sha(db, tenant.id, {p["sha256"] for _, _, p in ok})
+    targets: dict = {}
+    for index, item, probe in ok:
+        sha256 = probe["sha256"]
+        doc, ver, _ = existing.get(sha256, (None, None, None))
+        if sha256 not in targets:
+            final_key = ver.storage_uri if ver is not None else storage.object_key(
+                tenant_id=str(tenant.id), sha256=sha256, version=1, filename=_final_filename(item.key, item.filename),
+            )
+            targets[sha256] = {"doc": doc, "ver": ver, "key": final_key, "src": item.key}
+    copies = [(sha, t) for sha, t in targets.items() if t["ver"] is None]
+
+    def _copy(src, dst):
+        if not storage.object_exists(dst):
+            storage.copy_object(src, dst)
+
+    for (sha256, target), err in zip(copies, _map_bounded(_copy, [(t["src"], t["key"]) for _, t in copies])):
+        if isinstance(err, Exception):
+            log.error("finalize_copy_error", key=target["src"], error=str(err))
+            target["error"] = err
+
+    rows, credits, enqueue = [], [], []
+    for index, item, probe in ok:
+        target = targets[probe["sha256"]]
+        if target.get("error") is not None:
+            results[index] = _item_error(index, target["error"])
+            continue
+        mime = item.mime or "application/octet-stream"
+        if target["doc"] is None:
+            target["doc"] = models.Document(
+                id=uuid.uuid4(),
+                tenant_id=tenant.id,
+                user_id=user.id,
+                case_ref=None,
+                orig_filename=_final_filename(item.key, item.filename),
+                mime=mime,
+                bytes_sha256=probe["sha256"],
+            )
+            rows.append(target["doc"])
+        if target["ver"] is None:
+            target["ver"] = models.DocumentVersion(document_id=target["doc"].id, version=1, storage_uri=target["key"])
+            rows.append(target["ver"])
+        est_pages = estimate_pages(mime, probe["size_bytes"], probe["pages"])
+        cost_class, cost_units = classify(mime, probe["size_bytes"], est_pages, mode)
+        job = models.ProcessingJob(
+            id=uuid.uuid4(),
+            document_id=target["doc"].id,
+            status=ProcessingStatus.queued,
+            lane=lane,
+            quality_mode=mode,
+            est_pages=est_pages,
+            cost_units=cost_units,
+            cost_class=cost_class,
+            features=job_features(mime, probe["size_bytes"], est_pages, mode),
+            options=_job_options(profile=item.profile),
+        )
+        estimate = estimate_credits(mime, probe["size_bytes"])
+        rows.append(job)
+        credits.append(models.Credit(
+            tenant_id=tenant.id,
+            user_id=user.id,
+            delta=-estimate,
+            reason="estimate",
+            job_id=job.id,
+            is_estimate=True,
+        ))
+        enqueue.append({"job_id": str(job.id), "lane": lane, "tenant_id": str(tenant.id), "cost_class": cost_class})
+        results[index] = {
+            "index": index,
+            "document_id": str(target["doc"].id),
+            "job_id": str(job.id),
+            "version": target["ver"].version,
+            "storage_uri": target["key"],
+            "credit_estimate": estimate,
+        }
+    try:
+        db.add_all(rows)
+        db.flush()  # jobs exist before the credits that reference them
+        db.add_all(credits)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        log.error("finalize_batch_error", error=str(e))
+        raise HTTPException(status_code=500, detail="internal error")
+
+    enqueue_many(enqueue)
+    for j in enqueue:
+        JOBS_ROUTED_TOTAL.labels(cost_class=j["cost_class"]).inc()
+
+    # Optional cleanup of staging objects
+    if os.getenv("DELETE_STAGING_ON_FINALIZE", "false").lower() in {"1", "true", "yes", "on"}:
+        for index, item, _ in ok:
+            try:
+                storage.remove_object(item.key)
+            except Exception:
+                log.error("staging_delete_failed", key=item.key)
+
+    bal = _tenant_balance(db, tenant.id)
+    log.info("finalize_batch_ok", tenant_id=str(tenant.id), items=len(results), jobs=len(enqueue))
+    return JSONResponse({"items": results, "tenant_balance": int(bal)})
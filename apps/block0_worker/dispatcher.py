@@ -0,0 +1,109 @@
+"""
+Fair-share dispatcher: drains per-tenant sub-queues into the Celery lanes.
+
+Run exactly one instance when FAIRSHARE_ENABLED=1:
+
+    python -m apps.block0_worker.dispatcher
+
+Each tick it tops every broker queue (`interactive`, `bulk.heavy`, ...) up
+to its own target depth, FAIRSHARE_TARGET_DEPTH pending messages unless
+FAIRSHARE_TARGET_DEPTHS overrides it, picking jobs by deficit round-robin (see
+shared.queueing.fairshare). A full heavy queue therefore never stops dispatch
+to the light and interactive ones. Keeping the broker queues shallow is what
+makes the ordering matter: work sits in the fair-share queues, not in Celery's
+FIFO lists.
+"""
+
+import os
+import time
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+from structlog import get_logger
+
+from shared.queueing.fairshare import DISPATCH_ORDER, parse_int_map, scheduler_from_env
+from shared.queueing.lanes import queue_depths, queue_name
+
+log = get_logger()
+
+FAIRSHARE_WAIT_SECONDS = Histogram(
+    "fairshare_queue_wait_seconds",
+    "Time a job spent in its tenant's fair-share queue before dispatch",
+    labelnames=["tenant_id"],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 7200),
+)
+FAIRSHARE_DISPATCHED_TOTAL = Counter(
+    "fairshare_dispatched_total",
+    "Jobs dispatched from fair-share queues to Celery",
+    labelnames=["tenant_id"],
+)
+FAIRSHARE_BACKLOG = Gauge(
+    "fairshare_backlog",
+    "Jobs waiting in each tenant's fair-share queue",
+    labelnames=["tenant_id", "queue"],
+)
+
+
+def target_depths() -> dict:
+    """Target pending messages per broker queue: FAIRSHARE_TARGET_DEPTH
+    (default 8), overridden per queue by FAIRSHARE_TARGET_DEPTHS
+    (e.g. `bulk.heavy:2,interactive:16`)."""
+    default = int(os.getenv("FAIRSHARE_TARGET_DEPTH", "8"))
+    overrides = parse_int_map(os.getenv("FAIRSHARE_TARGET_DEPTHS"))
+    return {queue: overrides.get(queue, default) for queue in DISPATCH_ORDER}
+
+
+def dispatch_once(scheduler, publish, capacities: dict, now: float | None = None) -> int:
+    """Move jobs from fair-share queues to Celery via `publish`, at most
+    `capacities[queue]` per broker queue."""
+    limit = sum(max(0, n) for n in capacities.values())
+    if limit <= 0:
+        return 0
+    now = now if now is not None else time.time()
+    sent = 0
+    for item in scheduler.next_batch(limit, capacities):
+        tenant = item.get("tenant_id") or "unknown"
+        try:
+            publish(item["job_id"], item.get("lane"), item.get("cost_class"), fair_share_tenant=tenant, **(item.get("trace") or {}))
+        except Exception:
+            # Give the slot back and requeue at the tail of the tenant's queue
+            scheduler.release(tenant, item["job_id"])
+            scheduler.requeue(item)
+            log.exception("fairshare_publish_failed", job_id=item.get("job_id"), tenant_id=tenant)
+            continue
+        FAIRSHARE_WAIT_SECONDS.labels(tenant_id=tenant).observe(max(0.0, now - float(item.get("submitted_at") or now)))
+        FAIRSHARE_DISPATCHED_TOTAL.labels(tenant_id=tenant).inc()
+        sent += 1
+    for queue in DISPATCH_ORDER:
+        for tenant in scheduler.store.tenants(queue):
+            FAIRSHARE_BACKLOG.labels(tenant_id=tenant, queue=queue).set(scheduler.store.backlog(queue, tenant))
+    return sent
+
+
+def main():
+    from shared.queueing.client import publish_process_document
+    import redis as redis_lib
+
+    port = os.getenv("DISPATCHER_METRICS_PORT")
+    if port:
+        start_http_server(int(port))
+    targets = target_depths()
+    interval = float(os.getenv("FAIRSHARE_TICK_SECONDS", "0.5"))
+    broker = redis_lib.from_url(os.getenv("CELERY_BROKER_URL") or os.getenv("REDIS_URL", "redis://redis:6379/0"))
+    scheduler = scheduler_from_env()
+    log.info("fairshare_dispatcher_started", target_depths=targets, tick_seconds=interval)
+    while True:
+        try:
+            capacities = {
+                queue_name(lane, cost_class): targets[queue_name(lane, cost_class)] - pending
+                for (lane, cost_class), pending in queue_depths(broker).items()
+            }
+            sent = dispatch_once(scheduler, publish_process_document, capacities)
+        except Exception:
+            log.exception("fairshare_tick_failed")
+            sent = 0
+        if not sent:
+            time.sleep(interval)
+
+
+if __name__ == "__main__":
+    main()
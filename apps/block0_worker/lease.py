@@ -0,0 +1,127 @@
+"""
+Job leases: while a worker processes a job it renews `lease_expires_at` on the
+job row from a heartbeat thread. If the process dies (OOM kill, node loss) the
+lease runs out and the reaper (apps.block0_worker.reaper) recovers the job.
+Before its final writes a run re-checks that it still owns the job
+(`hold_lease`), so a run that was reaped while merely stalled (GC pause, DB
+partition) cannot finalize or settle credits next to its retry.
+
+Knobs: JOB_LEASE_TTL_SECONDS (default 120) and JOB_HEARTBEAT_SECONDS (default
+TTL / 4). The TTL must comfortably exceed the heartbeat interval; the heartbeat
+runs in its own thread, so long OCR subprocesses do not block it.
+"""
+
+from datetime import datetime, timedelta
+from threading import Event, Thread
+import os
+
+from structlog import get_logger
+
+from shared.db import models
+from shared.db.models import ProcessingStatus
+
+log = get_logger()
+
+
+def lease_ttl_seconds() -> float:
+    try:
+        return max(5.0, float(os.getenv("JOB_LEASE_TTL_SECONDS", "120")))
+    except ValueError:
+        return 120.0
+
+
+def heartbeat_seconds() -> float:
+    try:
+        return max(1.0, float(os.getenv("JOB_HEARTBEAT_SECONDS", "0")) or lease_ttl_seconds() / 4)
+    except ValueError:
+        return lease_ttl_seconds() / 4
+
+
+def lease_deadline(now: datetime | None = None) -> datetime:
+    return (now or datetime.utcnow()) + timedelta(seconds=lease_ttl_seconds())
+
+
+class LeaseLost(RuntimeError):
+    """The job was taken back (reaped and requeued) while this run worked on it."""
+
+
+def hold_lease(db, job_id, attempt: int) -> None:
+    """Lock the job row for this run's final writes, or raise LeaseLost.
+
+    A conditional UPDATE on (status running, attempts == attempt): once the
+    reaper has requeued the job (status queued) or a retry has started
+    (attempts incremented) it matches nothing. The row lock it takes lasts
+    until the caller commits, so the reaper (SKIP LOCKED) and a concurrent
+    retry cannot take the job between the check and the commit; call it in
+    the same transaction as the results and the credit settlement. A lease
+    that expired but was not reaped yet is still this run's.
+    """
+    now = datetime.utcnow()
+    n = (
+        db.query(models.ProcessingJob)
+        .filter(
+            models.ProcessingJob.id == job_id,
+            models.ProcessingJob.status == ProcessingStatus.running,
+            models.ProcessingJob.attempts == attempt,
+        )
+        .update({"heartbeat_at": now}, synchronize_session=False)
+    )
+    if not n:
+        db.rollback()
+        raise LeaseLost(f"job {job_id} is no longer held by attempt {attempt}")
+
+
+class JobLease:
+    """Heartbeat thread renewing one job's lease.
+
+    Renewal is conditional on the job still running under the same attempt; if
+    the reaper already took the job back, `lost` is set and renewal stops.
+    """
+
+    def __init__(self, session_factory, job_id, attempt: int, interval: float | None = None):
+        self.session_factory = session_factory
+        self.job_id = job_id
+        self.attempt = attempt
+        self.interval = interval if interval is not None else heartbeat_seconds()
+        self.lost = False
+        self._stop = Event()
+        self._thread: Thread | None = None
+
+    def renew(self) -> bool:
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            n = (
+                db.query(models.ProcessingJob)
+                .filter(
+                    models.ProcessingJob.id == self.job_id,
+                    models.ProcessingJob.status == ProcessingStatus.running,
+                    models.ProcessingJob.attempts == self.attempt,
+                )
+                .update({"heartbeat_at": now, "lease_expires_at": lease_deadline(now)}, synchronize_session=False)
+            )
+            db.commit()
+            return bool(n)
+        finally:
+            db.close()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if not self.renew():
+                    self.lost = True
+                    log.warning("job_lease_lost", job_id=str(self.job_id), attempt=self.attempt)
+                    return
+            except Exception:
+                # Transient DB trouble: keep trying until the lease would lapse anyway
+                log.exception("job_heartbeat_failed", job_id=str(self.job_id))
+
+    def start(self) -> "JobLease":
+        self._thread = Thread(target=self._run, name=f"lease-{self.job_id}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
@@ -0,0 +1,106 @@
+"""
+Per-job memory accounting and the RSS recycling ceiling.
+
+`JobMemory` measures one job: the Python heap peak via tracemalloc (disable
+with JOB_TRACEMALLOC=false; it adds some allocation overhead) and resident set
+size for native allocations (OpenCV, PIL, pypdf), sampled at every stage
+boundary and bounded by the process high-water mark. The result is stored on
+`processing_jobs.metrics["memory"]`.
+
+WORKER_MAX_RSS_MB sets Celery's `worker_max_memory_per_child`: after a task
+finishes, a prefork child whose RSS high-water mark is above the ceiling is
+replaced by a fresh one (the task itself always completes). Heap fragmentation
+only grows a child's footprint, so this recycles exactly the children that
+would otherwise creep towards an OOM kill.
+"""
+
+from typing import Any, Dict, Optional
+import os
+import resource
+import sys
+import tracemalloc
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, "true" if default else "false").lower() in {"1", "true", "yes", "on"}
+
+
+def rss_bytes() -> int:
+    """Current resident set size (0 when unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return 0
+
+
+def peak_rss_bytes() -> int:
+    """Process RSS high-water mark (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    try:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except Exception:
+        return 0
+    return int(peak) if sys.platform == "darwin" else int(peak) * 1024
+
+
+def max_rss_bytes() -> Optional[int]:
+    """WORKER_MAX_RSS_MB as bytes; None when unset or 0 (no recycling)."""
+    try:
+        mb = float(os.getenv("WORKER_MAX_RSS_MB", "0"))
+    except ValueError:
+        return None
+    return int(mb * 1024 * 1024) if mb > 0 else None
+
+
+def over_ceiling() -> bool:
+    ceiling = max_rss_bytes()
+    return ceiling is not None and peak_rss_bytes() > ceiling
+
+
+class JobMemory:
+    """Tracks one job's memory; call `sample()` at checkpoints and `stop()` at the end (repeat calls return the first result)."""
+
+    def __init__(self, tracemalloc_enabled: Optional[bool] = None):
+        self.tracemalloc_enabled = _env_bool("JOB_TRACEMALLOC", True) if tracemalloc_enabled is None else tracemalloc_enabled
+        self._started_tracing = False
+        self.rss_start = 0
+        self.rss_peak = 0
+        self._hiwater_start = 0
+        self._usage: Optional[Dict[str, Any]] = None
+
+    def start(self) -> "JobMemory":
+        if self.tracemalloc_enabled:
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+                self._started_tracing = True
+        self.rss_start = self.rss_peak = rss_bytes()
+        self._hiwater_start = peak_rss_bytes()
+        return self
+
+    def sample(self) -> None:
+        self.rss_peak = max(self.rss_peak, rss_bytes())
+
+    def stop(self) -> Dict[str, Any]:
+        if self._usage is not None:
+            return self._usage
+        self.sample()
+        rss_end = rss_bytes()
+        hiwater = peak_rss_bytes()
+        # A new process high-water mark was set during this job
+        if hiwater > self._hiwater_start:
+            self.rss_peak = max(self.rss_peak, hiwater)
+        usage: Dict[str, Any] = {
+            "rss_start_bytes": self.rss_start,
+            "rss_end_bytes": rss_end,
+            "rss_peak_bytes": self.rss_peak,
+            "rss_delta_bytes": max(0, self.rss_peak - self.rss_start),
+            "py_peak_bytes": None,
+        }
+        if self.tracemalloc_enabled and tracemalloc.is_tracing():
+            usage["py_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+            if self._started_tracing:
+                tracemalloc.stop()
+        self._usage = usage
+        return usage
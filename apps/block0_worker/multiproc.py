@@ -0,0 +1,54 @@
+"""
+Prometheus multi-process mode for the Celery prefork worker.
+
+Jobs run in forked children, so metrics recorded there never reach the
+registry of the parent that serves /metrics. With PROMETHEUS_MULTIPROC_DIR
+set (worker services only, see RUNBOOK "Worker Metrics"), prometheus_client
+writes each process's samples to files in that directory; the parent merges
+them at scrape time and live gauges of exited children are dropped.
+
+Imported by the worker before any metric is created: `prepare_dir()` must
+run before the first sample is written.
+"""
+
+import glob
+import os
+
+
+def multiproc_dir():
+    return os.getenv("PROMETHEUS_MULTIPROC_DIR") or None
+
+
+def prepare_dir() -> None:
+    """Create the directory and drop files left by a previous run of the worker."""
+    path = multiproc_dir()
+    if not path:
+        return
+    os.makedirs(path, exist_ok=True)
+    for f in glob.glob(os.path.join(path, "*.db")):
+        try:
+            os.remove(f)
+        except OSError:
+            pass
+
+
+def mark_process_dead(pid: int) -> None:
+    """Forget an exited child's live gauges (its counters/histograms are kept)."""
+    if not multiproc_dir():
+        return
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(pid)
+
+
+def metrics_app():
+    """WSGI app serving the merged samples of every process (or just this one)."""
+    from prometheus_client import make_wsgi_app
+
+    if not multiproc_dir():
+        return make_wsgi_app()
+    from prometheus_client import CollectorRegistry, multiprocess
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return make_wsgi_app(registry)
@@ -0,0 +1,262 @@
+"""
+Stage-graph pipeline engine.
+
+A pipeline is an ordered list of stages. Each stage declares the named values
+it consumes (`inputs`) and produces (`outputs`), a `version`, and the settings
+that change its result (`config`). Before running a stage the engine derives a
+cache key:
+
+    sha256(stage name + version + config + digests of its inputs)
+
+and looks for a manifest under `<tenant>/artifacts/<key[:2]>/<key>/` in
+storage. On a hit the stage is skipped and its outputs (and warnings) are taken
+from the manifest; on a miss it runs and each output is written as an artifact
+next to the manifest. Values are loaded from storage lazily, so a fully cached
+run never downloads the original document.
+
+`ctx.force` names stages to re-run regardless of the cache; downstream stages
+still hit the cache if the forced stage reproduces the same output digests.
+
+Outputs are `bytes`, `text` or `json`. A stage may return one of its input
+Artifacts unchanged (pass-through); it is then referenced, not copied.
+
+Each stage runs in a `stage.<name>` trace span (shared.tracing.spans) and
+storage downloads in `storage.download` spans.
+
+Stays free of OCR/Celery imports; block0's stages live in
+apps.block0_worker.stages.
+"""
+
+from dataclasses import dataclass, field
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set
+import hashlib
+import json
+import time
+
+from shared.pipeline.deadline import Deadline
+from shared.tracing.spans import span
+
+
+KINDS = ("bytes", "text", "json")
+
+
+def _encode(kind: str, value: Any) -> bytes:
+    if kind == "bytes":
+        return bytes(value or b"")
+    if kind == "text":
+        return (value or "").encode("utf-8")
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def _decode(kind: str, data: bytes) -> Any:
+    if kind == "bytes":
+        return data
+    if kind == "text":
+        return data.decode("utf-8", errors="ignore")
+    return json.loads(data.decode("utf-8")) if data else None
+
+
+def _sha(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+@dataclass
+class Artifact:
+    """A named value identified by the digest of its serialized bytes."""
+
+    kind: str
+    digest: str
+    uri: Optional[str] = None
+    _value: Any = field(default=None, repr=False)
+    _loaded: bool = field(default=False, repr=False)
+
+    @classmethod
+    def from_value(cls, kind: str, value: Any) -> "Artifact":
+        return cls(kind=kind, digest=_sha(_encode(kind, value)), _value=value, _loaded=True)
+
+    def value(self, storage) -> Any:
+        if not self._loaded:
+            with span("storage.download", key=self.uri, kind=self.kind):
+                self._value = _decode(self.kind, storage.get_object_bytes(self.uri))
+            self._loaded = True
+        return self._value
+
+
+@dataclass
+class StageResult:
+    outputs: Dict[str, Any]
+    warnings: List[str] = field(default_factory=list)
+    # False for degraded results (e.g. OCR error) that must not be reused
+    cache: bool = True
+
+
+class _LazyInputs(Mapping):
+    """Stage inputs, decoded (and downloaded) only when a stage reads them."""
+
+    def __init__(self, ctx: "PipelineContext", names: Sequence[str]):
+        self._ctx = ctx
+        self._names = list(names)
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self._names:
+            raise KeyError(name)
+        return self._ctx.value(name)
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+class Stage:
+    """Base class for pipeline stages. Subclasses set the class attributes and
+    implement `run(ctx, inputs) -> StageResult`; `inputs` maps input names to
+    decoded values, loaded on first access."""
+
+    name: str = ""
+    version: str = "1"
+    inputs: Sequence[str] = ()
+    outputs: Dict[str, str] = {}  # output name -> kind
+
+    def config(self, ctx: "PipelineContext") -> Dict[str, Any]:
+        return {}
+
+    def enabled(self, ctx: "PipelineContext") -> bool:
+        return True
+
+    def run(self, ctx: "PipelineContext", inputs: Mapping) -> StageResult:
+        raise NotImplementedError
+
+
+@dataclass
+class PipelineContext:
+    storage: Any
+    tenant_id: str
+    mime: str
+    quality_mode: str
+    settings: Dict[str, Any] = field(default_factory=dict)
+    values: Dict[str, Artifact] = field(default_factory=dict)
+    warnings: List[str] = field(default_factory=list)
+    steps: List[Dict[str, Any]] = field(default_factory=list)
+    clean: bool = True  # every stage result is reusable
+    # Stages to re-run even when cached (reprocess `force_stages` / `full`)
+    force: Set[str] = field(default_factory=set)
+    # Outputs carried over from an earlier version without a manifest (legacy
+    # runs), used instead of running the stage on a cache miss:
+    # {stage name: {output: Artifact}}
+    preset: Dict[str, Dict[str, Artifact]] = field(default_factory=dict)
+    # Job deadline; stages adapt to the remaining budget (see shared.pipeline.deadline)
+    deadline: Deadline = field(default_factory=lambda: Deadline(None))
+
+    def value(self, name: str) -> Any:
+        return self.values[name].value(self.storage)
+
+
+def stage_key(stage: Stage, ctx: PipelineContext) -> str:
+    blob = json.dumps(
+        {
+            "stage": stage.name,
+            "version": stage.version,
+            "config": stage.config(ctx),
+            "inputs": {n: ctx.values[n].digest for n in stage.inputs},
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return _sha(blob.encode("utf-8"))
+
+
+def artifact_prefix(tenant_id: str, key: str) -> str:
+    return f"{tenant_id}/artifacts/{key[:2]}/{key}"
+
+
+def _load_manifest(storage, prefix: str) -> Optional[dict]:
+    try:
+        if not storage.object_exists(f"{prefix}/manifest.json"):
+            return None
+        return json.loads(storage.get_object_bytes(f"{prefix}/manifest.json").decode("utf-8"))
+    except Exception:
+        return None
+
+
+class Pipeline:
+    def __init__(self, stages: Sequence[Stage], on_step: Optional[Callable[[dict], None]] = None):
+        self.stages = list(stages)
+        self.on_step = on_step
+
+    def graph(self) -> List[Dict[str, Any]]:
+        """Static description of the stage graph (for job.steps before a run)."""
+        return [
+            {"name": s.name, "version": s.version, "inputs": list(s.inputs), "outputs": list(s.outputs), "status": "pending"}
+            for s in self.stages
+        ]
+
+    def signature(self, ctx: PipelineContext) -> Dict[str, Any]:
+        """Every stage's version and config: what a run's output depends on
+        besides the input bytes (used for the dedupe fingerprint)."""
+        return {s.name: {"version": s.version, "config": s.config(ctx)} for s in self.stages}
+
+    def run(self, ctx: PipelineContext) -> PipelineContext:
+        for stage in self.stages:
+            step = {"name": stage.name, "version": stage.version, "inputs": list(stage.inputs), "outputs": list(stage.outputs)}
+            if not stage.enabled(ctx) or any(n not in ctx.values for n in stage.inputs):
+                step["status"] = "skipped"
+                self._record(ctx, step)
+                continue
+            with span(f"stage.{stage.name}", stage=stage.name, version=stage.version) as sp:
+                self._run_stage(ctx, stage, step)
+                sp.set(status=step["status"], key=step["key"])
+            self._record(ctx, step)
+        return ctx
+
+    def _run_stage(self, ctx: PipelineContext, stage: Stage, step: Dict[str, Any]) -> None:
+        """Cache lookup, then adopt/replay/run the stage; fills `step`."""
+        key = stage_key(stage, ctx)
+        prefix = artifact_prefix(ctx.tenant_id, key)
+        step["key"] = key
+        t0 = time.perf_counter()
+        manifest = None if stage.name in ctx.force else _load_manifest(ctx.storage, prefix)
+        if manifest is None and stage.name in ctx.preset and stage.name not in ctx.force:
+            # Adopt the carried-over outputs under this key so later runs hit the cache
+            self._store(ctx, stage, prefix, ctx.preset[stage.name], [])
+            ctx.values.update(ctx.preset[stage.name])
+            step["status"] = "reused"
+        elif manifest is not None:
+            for name, meta in manifest.get("outputs", {}).items():
+                ctx.values[name] = Artifact(kind=meta["kind"], digest=meta["digest"], uri=meta["uri"])
+            ctx.warnings.extend(manifest.get("warnings") or [])
+            step["status"] = "cached"
+        else:
+            result = stage.run(ctx, _LazyInputs(ctx, stage.inputs))
+            produced: Dict[str, Artifact] = {}
+            for name, kind in stage.outputs.items():
+                val = result.outputs.get(name)
+                produced[name] = val if isinstance(val, Artifact) else Artifact.from_value(kind, val)
+            if result.cache:
+                self._store(ctx, stage, prefix, produced, result.warnings)
+            else:
+                ctx.clean = False
+            ctx.values.update(produced)
+            ctx.warnings.extend(result.warnings)
+            step["status"] = "ran"
+        step["duration_ms"] = int((time.perf_counter() - t0) * 1000)
+
+    def _store(self, ctx: PipelineContext, stage: Stage, prefix: str, produced: Dict[str, Artifact], warnings: List[str]):
+        outputs = {}
+        for name, art in produced.items():
+            if art.uri is None:
+                art.uri = f"{prefix}/{name}"
+                ctype = "application/json" if art.kind == "json" else ("text/plain; charset=utf-8" if art.kind == "text" else "application/octet-stream")
+                ctx.storage.put_object(art.uri, _encode(art.kind, art._value), content_type=ctype)
+            outputs[name] = {"kind": art.kind, "digest": art.digest, "uri": art.uri}
+        manifest = {"stage": stage.name, "version": stage.version, "outputs": outputs, "warnings": list(warnings)}
+        # Manifest last: its presence means every output is in place
+        ctx.storage.put_object(f"{prefix}/manifest.json", _encode("json", manifest), content_type="application/json")
+
+    def _record(self, ctx: PipelineContext, step: dict):
+        ctx.steps.append(step)
+        if self.on_step:
+            self.on_step(step)
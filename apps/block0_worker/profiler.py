@@ -0,0 +1,101 @@
+"""
+Opt-in sampling profiler for single jobs.
+
+A job is profiled when it was submitted with `profile=true` (upload, finalize
+or reprocess; stored as `job.options["profile"]`) or is picked by
+PROFILE_SAMPLE_RATE (fraction of jobs, default 0). A daemon thread samples the
+job thread's Python stack every PROFILE_INTERVAL_MS (default 10 ms) via
+`sys._current_frames()`; nothing is traced between samples, so the overhead is
+roughly one stack walk per interval. Time spent waiting on OCR subprocesses
+shows up under `subprocess.run`.
+
+The result is written in collapsed-stack format (`frame;frame;frame count`
+per line, root first), readable by flamegraph.pl, speedscope or inferno, and
+served by GET /v0/jobs/{id}/profile.
+"""
+
+from collections import Counter
+from threading import Event, Thread
+import os
+import random
+import sys
+import threading
+import time
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def should_profile(options) -> bool:
+    if (options or {}).get("profile"):
+        return True
+    rate = _env_float("PROFILE_SAMPLE_RATE", 0.0)
+    return rate > 0 and random.random() < rate
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class StackSampler:
+    """Samples one thread's stack (the caller's by default) until `stop()`."""
+
+    def __init__(self, interval: float | None = None, thread_id: int | None = None, max_depth: int = 128):
+        self.interval = interval if interval is not None else max(0.001, _env_float("PROFILE_INTERVAL_MS", 10) / 1000.0)
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.max_depth = max_depth
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started = 0.0
+        self.elapsed = 0.0
+        self._stop = Event()
+        self._thread: Thread | None = None
+
+    def _sample(self) -> None:
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        labels = []
+        while frame is not None and len(labels) < self.max_depth:
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+        self.stacks[";".join(reversed(labels))] += 1
+        self.samples += 1
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self._sample()
+            except Exception:
+                # Profiling must never disturb the job
+                pass
+
+    def start(self) -> "StackSampler":
+        self.started = time.perf_counter()
+        self._thread = Thread(target=self._loop, name="job-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "StackSampler":
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+            self.elapsed = time.perf_counter() - self.started
+        return self
+
+    def collapsed(self) -> str:
+        """Collapsed stacks, heaviest first."""
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+    def summary(self) -> dict:
+        return {
+            "samples": self.samples,
+            "interval_ms": round(self.interval * 1000, 3),
+            "elapsed_seconds": round(self.elapsed, 3),
+        }
@@ -0,0 +1,212 @@
+"""
+Stuck-job reaper: recovers jobs whose worker died mid-run.
+
+A running job whose lease (see apps.block0_worker.lease) has expired is
+requeued while `attempts < JOB_MAX_ATTEMPTS` (default 3); after that it is
+marked failed and its estimate credit refunded. Run one or more instances
+(rows are claimed with SKIP LOCKED):
+
+    python -m apps.block0_worker.reaper
+
+The same loop refits the job duration model (shared.queueing.eta) every
+ETA_REFIT_SECONDS (default 3600; 0 disables), publishes the lane backlogs
+behind the API's queue_backlog_seconds every ETA_BACKLOG_SECONDS (default 30;
+0 disables) and, with fair-share on, drops
+fair-share slots no live job holds every FAIRSHARE_RECONCILE_SECONDS (60).
+"""
+
+from datetime import datetime
+import os
+import time
+import uuid
+
+from prometheus_client import Counter, start_http_server
+from structlog import get_logger
+
+from shared.db import models
+from shared.db.models import ProcessingStatus
+from shared.queueing import eta
+from shared.queueing.fairshare import fairshare_enabled
+from shared.quality import balances
+from shared.quality.credits import refund_estimate
+
+log = get_logger()
+
+REAPER_REQUEUED_TOTAL = Counter(
+    "reaper_jobs_requeued_total",
+    "Jobs with an expired lease that were requeued",
+    labelnames=["lane"],
+)
+REAPER_FAILED_TOTAL = Counter(
+    "reaper_jobs_failed_total",
+    "Jobs with an expired lease that exhausted their attempts and were failed (estimate refunded)",
+    labelnames=["lane"],
+)
+CREDIT_BALANCE_DRIFT_TOTAL = Counter(
+    "reaper_credit_balance_drift_total",
+    "credit_balances rows found out of step with the credits ledger (and rewritten)",
+)
+
+FAIRSHARE_SLOTS_RECLAIMED_TOTAL = Counter(
+    "reaper_fairshare_slots_reclaimed_total",
+    "Fair-share slots released because no running or recently dispatched job held them",
+)
+
+
+def max_attempts() -> int:
+    try:
+        return max(1, int(os.getenv("JOB_MAX_ATTEMPTS", "3")))
+    except ValueError:
+        return 3
+
+
+def reap_expired(db, requeue, now: datetime | None = None, attempts_limit: int | None = None, release=None, limit: int = 100) -> dict:
+    """Recover running jobs whose lease expired before `now`.
+
+    `requeue(job, tenant_id)` republishes a job; `release(tenant_id, job_id)`
+    frees the fair-share slot held by a job we fail (None when fair-share is off).
+    Returns {"requeued": n, "failed": n}.
+    """
+    now = now or datetime.utcnow()
+    attempts_limit = attempts_limit or max_attempts()
+    jobs = (
+        db.query(models.ProcessingJob)
+        .filter(
+            models.ProcessingJob.status == ProcessingStatus.running,
+            models.ProcessingJob.lease_expires_at != None,  # noqa: E711
+            models.ProcessingJob.lease_expires_at < now,
+        )
+        .order_by(models.ProcessingJob.lease_expires_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    out = {"requeued": 0, "failed": 0}
+
+    def _fail(job, lane, tenant_id, error):
+        job.status = ProcessingStatus.failed
+        job.error = error
+        job.finished_at = now
+        refund_estimate(db, job.id, "refund_lease_expired")
+        db.commit()
+        if release and tenant_id:
+            release(tenant_id, str(job.id))
+        REAPER_FAILED_TOTAL.labels(lane=lane).inc()
+        out["failed"] += 1
+        log.error("job_lease_expired_failed", job_id=str(job.id), attempts=job.attempts)
+
+    for job in jobs:
+        lane = job.lane or "unknown"
+        doc = db.get(models.Document, job.document_id)
+        tenant_id = str(doc.tenant_id) if doc else None
+        job.lease_expires_at = None
+        if (job.attempts or 0) >= attempts_limit:
+            _fail(job, lane, tenant_id, f"lease expired after {job.attempts} attempts")
+            continue
+        job.status = ProcessingStatus.queued
+        job.error = f"lease expired on attempt {job.attempts or 0}; requeued"
+        db.commit()
+        try:
+            requeue(job, tenant_id)
+        except Exception:
+            # Fail rather than leave it queued but never published
+            log.exception("reaper_requeue_failed", job_id=str(job.id))
+            _fail(job, lane, tenant_id, "lease expired; requeue failed")
+            continue
+        REAPER_REQUEUED_TOTAL.labels(lane=lane).inc()
+        out["requeued"] += 1
+        log.warning("job_lease_expired_requeued", job_id=str(job.id), attempts=job.attempts)
+    return out
+
+
+def job_states(db, job_ids) -> dict:
+    """{job_id: status value} for the jobs that exist."""
+    ids = []
+    for j in job_ids:
+        try:
+            ids.append(uuid.UUID(str(j)))
+        except ValueError:
+            continue
+    if not ids:
+        return {}
+    J = models.ProcessingJob
+    return {str(i): getattr(st, "value", st) for i, st in db.query(J.id, J.status).filter(J.id.in_(ids)).all()}
+
+
+def main():
+    from shared.queueing.client import fairshare, publish_process_document
+    from shared.db.session import SessionLocal
+
+    port = os.getenv("REAPER_METRICS_PORT")
+    if port:
+        start_http_server(int(port))
+    interval = float(os.getenv("REAPER_INTERVAL_SECONDS", "30"))
+    fair = fairshare_enabled()
+
+    def requeue(job, tenant_id):
+        # The fair-share slot taken by the dead run is still held; hand it to
+        # the retry, which releases it when it finishes.
+        kwargs = {"fair_share_tenant": tenant_id} if fair and tenant_id else {}
+        publish_process_document(str(job.id), job.lane, job.cost_class, **kwargs)
+
+    release = (lambda tenant_id, job_id: fairshare().release(tenant_id, job_id)) if fair else None
+    refit_every = float(os.getenv("ETA_REFIT_SECONDS", "3600"))
+    next_refit = time.monotonic()
+    backlog_every = float(os.getenv("ETA_BACKLOG_SECONDS", "30"))
+    next_backlog = time.monotonic()
+    reconcile_every = float(os.getenv("CREDIT_RECONCILE_SECONDS", "86400"))
+    next_reconcile = time.monotonic()
+    slots_every = float(os.getenv("FAIRSHARE_RECONCILE_SECONDS", "60"))
+    next_slots = time.monotonic()
+    log.info("reaper_started", interval_seconds=interval, max_attempts=max_attempts())
+    while True:
+        db = SessionLocal()
+        try:
+            n = reap_expired(db, requeue, release=release)
+            if n["requeued"] or n["failed"]:
+                log.info("reaper_tick", **n)
+        except Exception:
+            db.rollback()
+            log.exception("reaper_tick_failed")
+        if refit_every > 0 and time.monotonic() >= next_refit:
+            next_refit = time.monotonic() + refit_every
+            try:
+                model = eta.refit(db, eta.redis_client())
+                if model is not None:
+                    log.info("eta_model_refit", samples=model.samples, rmse=model.rmse)
+            except Exception:
+                db.rollback()
+                log.exception("eta_refit_failed")
+        if backlog_every > 0 and time.monotonic() >= next_backlog:
+            next_backlog = time.monotonic() + backlog_every
+            try:
+                # Outlives a few missed rounds; the reaper sleeps `interval` between them
+                eta.publish_backlogs(db, eta.redis_client(), ttl=4 * max(backlog_every, interval))
+            except Exception:
+                db.rollback()
+                log.exception("eta_backlog_failed")
+        if reconcile_every > 0 and time.monotonic() >= next_reconcile:
+            next_reconcile = time.monotonic() + reconcile_every
+            try:
+                drift = balances.reconcile(db)
+                CREDIT_BALANCE_DRIFT_TOTAL.inc(len(drift))
+                log.info("credit_balances_reconciled", drifted=len(drift))
+            except Exception:
+                db.rollback()
+                log.exception("credit_reconcile_failed")
+        if fair and slots_every > 0 and time.monotonic() >= next_slots:
+            next_slots = time.monotonic() + slots_every
+            try:
+                freed = fairshare().reconcile(lambda job_ids: job_states(db, job_ids))
+                if freed:
+                    FAIRSHARE_SLOTS_RECLAIMED_TOTAL.inc(freed)
+                    log.warning("fairshare_slots_reclaimed", released=freed)
+            except Exception:
+                db.rollback()
+                log.exception("fairshare_reconcile_failed")
+        db.close()
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    main()
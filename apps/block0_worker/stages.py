@@ -0,0 +1,289 @@
+"""
+Block 0 processing stages: normalize -> preview -> ocr -> quality.
+
+Each stage's `config()` lists the settings that change its output, so editing
+e.g. OCR_LANG invalidates the cached OCR artifacts but not normalize. Bump a
+stage's version in shared.pipeline.versions when its code changes what it
+produces.
+
+OpenCV/numpy, pypdf and langdetect are imported by the stage that uses them,
+so importing this module (or the worker) stays cheap; the worker parent
+preloads them before forking (apps.block0_worker.warmup).
+"""
+
+from typing import Any, Dict, List, Tuple
+import io
+import math
+import os
+
+from prometheus_client import Counter
+
+try:
+    from shared.config.settings import settings as _settings
+except Exception:
+    _settings = None
+
+from shared.ocr.adapters.base import OCRResult
+from shared.ocr.adapters.ocrmypdf import OCRmyPDFAdapter
+from shared.ocr.adapters.tesseract import TesseractAdapter
+from shared.pipeline.deadline import DEGRADED_WARNING
+from shared.pipeline.versions import STAGE_VERSIONS
+
+from apps.block0_worker.pipeline import Pipeline, PipelineContext, Stage, StageResult
+
+
+DEADLINE_DEGRADED_TOTAL = Counter(
+    "worker_deadline_degraded_total",
+    "Stages that cut work short to stay within the job deadline",
+    labelnames=["stage"],
+)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+# Prefix of the warning an OCR failure leaves; the worker does not bill such runs
+OCR_ERROR_WARNING = "OCR error"
+
+
+def _degraded(stage: str, detail: str) -> str:
+    DEADLINE_DEGRADED_TOTAL.labels(stage=stage).inc()
+    return f"{DEGRADED_WARNING}: {detail}"
+
+
+def _is_image(ctx: PipelineContext) -> bool:
+    return (ctx.mime or "").lower().startswith("image/")
+
+
+def _provider() -> str:
+    return (os.getenv("OCR_PROVIDER", "tesseract") or "tesseract").strip().lower()
+
+
+def _split_args(value) -> List[str]:
+    return [p for p in str(value).split(" ") if p] if value else []
+
+
+def ocr_settings(ctx: PipelineContext, quality_mode: str | None = None) -> Dict[str, Any]:
+    """Resolve OCR settings for a job (env first, then settings, then mode defaults)."""
+    quality_mode = quality_mode or ctx.quality_mode
+    budget = quality_mode == "budget"
+    lang_cfg = getattr(_settings, "ocr_lang", None) or os.getenv("OCR_LANG", "eng")
+    # Accept comma or plus separated lists
+    languages = [p.strip() for p in lang_cfg.replace("+", ",").split(",") if p.strip()]
+    # Budget mode: restrict to first language for speed
+    if budget and languages:
+        languages = [languages[0]]
+    oem_env = os.getenv("OCR_OEM")
+    psm_env = os.getenv("OCR_PSM")
+    oem = int(oem_env) if oem_env and oem_env.isdigit() else getattr(_settings, "ocr_oem", None)
+    psm = int(psm_env) if psm_env and psm_env.isdigit() else getattr(_settings, "ocr_psm", None)
+    # If budget mode and no explicit values, choose lighter defaults
+    if budget:
+        oem = oem if oem is not None else 1  # LSTM only
+        psm = psm if psm is not None else 6  # Assume a single uniform block of text
+    extra_pdf = _split_args(os.getenv("OCR_OCRMYPDF_EXTRA") or getattr(_settings, "ocr_ocrmypdf_extra", None))
+    # Add recommended-only extras if not in budget mode
+    if not budget:
+        extra_pdf += _split_args(os.getenv("OCR_OCRMYPDF_RECOMMENDED") or getattr(_settings, "ocr_ocrmypdf_recommended", None))
+    return {
+        "provider": _provider(),
+        "mime": (ctx.mime or "").lower(),
+        "quality_mode": quality_mode,
+        "languages": languages,
+        "oem": oem,
+        "psm": psm,
+        "tesseract_extra": os.getenv("OCR_TESSERACT_EXTRA") or getattr(_settings, "ocr_tesseract_extra", None),
+        "ocrmypdf_extra": extra_pdf,
+    }
+
+
+class NormalizeStage(Stage):
+    """Deskew images in recommended mode; pass everything else through."""
+
+    name = "normalize"
+    version = STAGE_VERSIONS["normalize"]
+    inputs = ("original",)
+    outputs = {"normalized": "bytes"}
+
+    def config(self, ctx):
+        return {"deskew": self._deskew(ctx)}
+
+    def _deskew(self, ctx) -> bool:
+        return _is_image(ctx) and ctx.quality_mode != "budget" and _provider() != "stub"
+
+    def run(self, ctx, inputs):
+        # Deskew is optional: skip it when the budget left only covers OCR
+        if self._deskew(ctx) and ctx.deadline.remaining() < _env_float("JOB_DEADLINE_OCR_RESERVE_SECONDS", 30):
+            return StageResult(
+                outputs={"normalized": ctx.values["original"]},
+                warnings=[_degraded(self.name, "deskew skipped")],
+                cache=False,
+            )
+        if self._deskew(ctx):
+            from shared.quality.normalize import deskew_image_bytes
+
+            rotated_bytes, applied_deg = deskew_image_bytes(inputs["original"])
+            if abs(applied_deg) > 0.0:
+                return StageResult(
+                    outputs={"normalized": rotated_bytes},
+                    warnings=[f"Auto-deskew applied (~{applied_deg:.1f}°)"],
+                )
+        # Unchanged: reference the original instead of storing a copy
+        return StageResult(outputs={"normalized": ctx.values["original"]})
+
+
+def _first_pages(content: bytes, n: int) -> Tuple[Any, bytes, int]:
+    """Return (PdfReader, PDF of the first `n` pages, total page count)."""
+    from pypdf import PdfReader, PdfWriter
+
+    reader = PdfReader(io.BytesIO(content))
+    writer = PdfWriter()
+    for page in reader.pages[:n]:
+        writer.add_page(page)
+    buf = io.BytesIO()
+    writer.write(buf)
+    return reader, buf.getvalue(), len(reader.pages)
+
+
+class PreviewStage(Stage):
+    """Fast path for long PDFs: text of the first PROGRESSIVE_PAGES pages.
+
+    The worker publishes it on the job (partial_text_uri, pages_completed)
+    while the full OCR runs. Uses the PDF text layer when present, else a
+    short budget-mode OCR of just those pages.
+    """
+
+    name = "preview"
+    version = STAGE_VERSIONS["preview"]
+    inputs = ("normalized",)
+    outputs = {"preview_text": "text", "preview_info": "json"}
+
+    def _pages(self) -> int:
+        return max(1, int(_env_float("PROGRESSIVE_PAGES", 1)))
+
+    def config(self, ctx):
+        return {"pages": self._pages(), "ocr": ocr_settings(ctx, quality_mode="budget")}
+
+    def enabled(self, ctx):
+        if os.getenv("PROGRESSIVE_ENABLED", "true").lower() not in {"1", "true", "yes", "on"}:
+            return False
+        # Optional work: only when there is time for it and for the full OCR
+        return (
+            (ctx.mime or "").lower() == "application/pdf"
+            and _provider() != "stub"
+            and ctx.deadline.remaining() >= 2 * _env_float("JOB_DEADLINE_OCR_RESERVE_SECONDS", 30)
+        )
+
+    def run(self, ctx, inputs):
+        n = self._pages()
+        try:
+            reader, head, total = _first_pages(inputs["normalized"], n)
+        except Exception:
+            return StageResult(outputs={"preview_text": "", "preview_info": {"pages": 0, "total_pages": 0}}, cache=False)
+        pages = min(n, total)
+        if total <= n:
+            # Short document: the full OCR is the fast path
+            return StageResult(outputs={"preview_text": "", "preview_info": {"pages": 0, "total_pages": total}})
+        text = ""
+        try:
+            text = "\n".join((p.extract_text() or "") for p in reader.pages[:pages])
+        except Exception:
+            text = ""
+        if len(text.strip()) < 20:
+            cfg = ocr_settings(ctx, quality_mode="budget")
+            p = OCRmyPDFAdapter(
+                timeout_seconds=30,
+                fast_mode=True,
+                tesseract_timeout=20,
+                extra_args=cfg["ocrmypdf_extra"],
+                max_total_seconds=30,
+            )
+            text = p.process(head, "application/pdf", languages=cfg["languages"]).combined_text
+        # An empty preview (e.g. OCR hiccup) is not worth keeping
+        return StageResult(
+            outputs={"preview_text": text, "preview_info": {"pages": pages, "total_pages": total}},
+            cache=bool(text.strip()),
+        )
+
+
+class OcrStage(Stage):
+    name = "ocr"
+    version = STAGE_VERSIONS["ocr"]
+    inputs = ("normalized",)
+    outputs = {"ocr_text": "text"}
+
+    def config(self, ctx):
+        return ocr_settings(ctx)
+
+    def run(self, ctx, inputs):
+        cfg = ocr_settings(ctx)
+        if cfg["provider"] == "stub":
+            return StageResult(outputs={"ocr_text": ""}, warnings=["OCR disabled (stub provider)"])
+        warnings: List[str] = []
+        budget = ctx.quality_mode == "budget"
+        # Time left for OCR after keeping a reserve for quality + finalize
+        full = 90 if budget else 180
+        avail = ctx.deadline.clamp(full, reserve=_env_float("JOB_DEADLINE_FINALIZE_RESERVE_SECONDS", 10))
+        if not budget and avail < full:
+            # Not enough time for recommended settings: fall back to budget
+            budget = True
+            cfg = ocr_settings(ctx, quality_mode="budget")
+            warnings.append(_degraded(self.name, f"budget OCR settings ({int(avail)}s left)"))
+        # OCR is not optional: with (almost) nothing left it still gets a
+        # minimum timeout on budget settings rather than returning no text
+        floor = min(full, _env_float("JOB_DEADLINE_OCR_MIN_SECONDS", 30))
+        if avail < floor:
+            avail = floor
+            warnings.append(_degraded(self.name, f"minimum OCR timeout ({int(floor)}s)"))
+        bounded = math.isfinite(ctx.deadline.remaining())
+        try:
+            if _is_image(ctx):
+                t = TesseractAdapter(
+                    oem=cfg["oem"], psm=cfg["psm"], extra_config=cfg["tesseract_extra"],
+                    timeout=(avail if bounded else None),
+                )
+                res: OCRResult = t.process(inputs["normalized"], ctx.mime or "image/unknown", languages=cfg["languages"])
+            elif cfg["mime"] == "application/pdf":
+                p = OCRmyPDFAdapter(
+                    timeout_seconds=min(90 if budget else 180, int(avail)),
+                    fast_mode=budget,
+                    tesseract_timeout=(60 if budget else None),
+                    extra_args=cfg["ocrmypdf_extra"],
+                    max_total_seconds=(avail if bounded else None),
+                )
+                res = p.process(inputs["normalized"], "application/pdf", languages=cfg["languages"])
+            else:
+                return StageResult(outputs={"ocr_text": ""}, warnings=[f"Unsupported MIME for OCR at this stage: {ctx.mime}"])
+        except Exception as e:
+            # Keep going with empty text, but never cache a failed OCR
+            return StageResult(outputs={"ocr_text": ""}, warnings=warnings + [f"{OCR_ERROR_WARNING}: {e}"], cache=False)
+        # Degraded output must not be reused as if it were a full-quality run
+        return StageResult(outputs={"ocr_text": res.combined_text}, warnings=warnings, cache=not warnings)
+
+
+class QualityStage(Stage):
+    """Metrics and warnings (blur/skew, language, density, page count)."""
+
+    name = "quality"
+    version = STAGE_VERSIONS["quality"]
+    inputs = ("normalized", "ocr_text")
+    outputs = {"metrics": "json"}
+
+    def run(self, ctx, inputs):
+        from shared.quality.metrics import compute_metrics_and_warnings
+
+        metrics: Dict[str, Any] = {}
+        # For images, set page_count=1 if not present
+        if _is_image(ctx):
+            metrics["page_count"] = 1
+        m2, w2 = compute_metrics_and_warnings(ctx.mime, inputs["normalized"], inputs["ocr_text"])
+        metrics.update(m2 or {})
+        return StageResult(outputs={"metrics": metrics}, warnings=list(w2 or []))
+
+
+def build_pipeline(on_step=None) -> Pipeline:
+    return Pipeline([NormalizeStage(), PreviewStage(), OcrStage(), QualityStage()], on_step=on_step)
@@ -0,0 +1,88 @@
+"""
+Pre-fork warm-up for the Celery worker parent.
+
+The worker module no longer imports OpenCV/numpy, PIL, pytesseract, pypdf or
+langdetect itself (scripts that only enqueue stay light). A worker process
+loads them once in the parent from the `worker_init` signal, before the pool
+forks, so every child inherits the loaded modules and langdetect profiles
+copy-on-write instead of paying for them on its first job. Disable with
+WORKER_WARMUP=false.
+"""
+
+from typing import Dict, List
+import os
+import time
+
+from structlog import get_logger
+
+log = get_logger()
+
+
+def warmup_enabled() -> bool:
+    return os.getenv("WORKER_WARMUP", "true").lower() in {"1", "true", "yes", "on"}
+
+
+def _imports() -> None:
+    import numpy  # noqa: F401
+    import cv2  # noqa: F401
+    import pypdf  # noqa: F401
+    from PIL import Image  # noqa: F401
+    import pytesseract  # noqa: F401
+
+    import shared.quality.metrics  # noqa: F401
+    import shared.quality.normalize  # noqa: F401
+
+
+def _langdetect() -> None:
+    # Loads every language profile (the bulk of detect_langs' first call)
+    from langdetect.detector_factory import init_factory
+
+    init_factory()
+
+
+def _opencv() -> None:
+    import cv2
+    import numpy as np
+
+    cv2.Laplacian(np.zeros((8, 8), dtype=np.uint8), cv2.CV_64F)
+
+
+def _tesseract() -> None:
+    """Check the binary and that the configured languages' tessdata exist."""
+    if (os.getenv("OCR_PROVIDER", "tesseract") or "").strip().lower() == "stub":
+        return
+    import pytesseract
+
+    version = pytesseract.get_tesseract_version()
+    wanted: List[str] = [p.strip() for p in (os.getenv("OCR_LANG", "eng") or "eng").replace("+", ",").split(",") if p.strip()]
+    missing = sorted(set(wanted) - set(pytesseract.get_languages(config="")))
+    if missing:
+        log.warning("worker_tessdata_missing", languages=missing, tesseract_version=str(version))
+
+
+STEPS = (("imports", _imports), ("langdetect", _langdetect), ("opencv", _opencv), ("tesseract", _tesseract))
+
+
+def warm_up() -> Dict[str, float]:
+    """Run every warm-up step; returns seconds per step. Failures are logged, not raised."""
+    timings: Dict[str, float] = {}
+    for name, step in STEPS:
+        t0 = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            log.warning("worker_warmup_step_failed", step=name, error=str(e))
+        timings[name] = round(time.perf_counter() - t0, 3)
+    return timings
+
+
+def process_uptime() -> float | None:
+    """Seconds since this process started (Linux /proc), else None."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except Exception:
+        return None
@@ -1,11 +1,21 @@
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
 import os
 import uuid
 from datetime import datetime
-import time
+from apps.block0_worker import multiproc
+
+# Before any metric exists: prefork children write samples to PROMETHEUS_MULTIPROC_DIR
+multiproc.prepare_dir()
+
 from celery import Celery
+from celery.signals import task_postrun, worker_init, worker_process_shutdown, worker_ready
+from kombu import Queue
 from structlog import get_logger
 from structlog.contextvars import bind_contextvars, clear_contextvars
-from prometheus_client import Counter, Histogram, make_wsgi_app
+from prometheus_client import Counter, Gauge, Histogram
 from wsgiref.simple_server import make_server
 from threading import Thread
 try:
@@ -15,96 +25,70 @@ except Exception:
 
 from shared.db.session import SessionLocal
 from shared.db import models
+from shared.db.latest import latest_version
 from shared.db.models import ProcessingStatus
-from shared.quality.metrics import compute_metrics_and_warnings, estimate_actual_credits
-from shared.storage.s3 import Storage
-from PIL import Image
-import io
-import pytesseract
-import tempfile
-import subprocess
-from pytesseract import Output
-from shared.quality.normalize import deskew_image_bytes
-from shared.ocr.adapters.tesseract import TesseractAdapter
-from shared.ocr.adapters.ocrmypdf import OCRmyPDFAdapter
-from shared.ocr.adapters.base import OCRResult
-
-
-def _ocr_image_bytes(original_bytes: bytes, lang: str):
-    warnings: list[str] = []
-    metrics: dict = {}
-    used_bytes = original_bytes
-    rotated_bytes, applied_deg = deskew_image_bytes(original_bytes)
-    if abs(applied_deg) > 0.0:
-        warnings.append(f"Auto-deskew applied (~{applied_deg:.1f}°)")
-        used_bytes = rotated_bytes
-    pil_img = Image.open(io.BytesIO(used_bytes))
-    text = pytesseract.image_to_string(pil_img, lang=lang) or ""
-    # Confidence (average over valid words)
-    try:
-        data = pytesseract.image_to_data(pil_img, lang=lang, output_type=Output.DICT)
-        confs = [int(c) for c in data.get('conf', []) if c not in ("-1", "-")]
-        conf_vals = [c for c in confs if c >= 0]
-        if conf_vals:
-            avg_conf = sum(conf_vals) / len(conf_vals)
-            metrics["ocr_confidence_avg"] = round(float(avg_conf) / 100.0, 3)
-    except Exception:
-        pass
-    return text, used_bytes, metrics, warnings
-
-
-def _ocr_pdf_bytes(original_bytes: bytes, lang: str):
-    warnings: list[str] = []
-    text = ""
-    with tempfile.TemporaryDirectory() as td:
-        in_pdf = f"{td}/in.pdf"
-        out_pdf = f"{td}/out.pdf"
-        sidecar = f"{td}/out.txt"
-        with open(in_pdf, "wb") as f:
-            f.write(original_bytes)
-        cmd = [
-            "ocrmypdf",
-            "--language", lang,
-            "--sidecar", sidecar,
-            "--skip-text",
-            in_pdf,
-            out_pdf,
-        ]
-        try:
-            subprocess.run(cmd, check=True, capture_output=True, timeout=180)
-            try:
-                with open(sidecar, "r", encoding="utf-8", errors="ignore") as sf:
-                    text = sf.read()
-            except FileNotFoundError:
-                warnings.append("PDF OCR produced no sidecar text")
-        except subprocess.CalledProcessError as e:
-            warnings.append("PDF OCR failed; see logs")
-            # Throttle noisy logs
-            if _should_log("ocrmypdf_failed"):
-                try:
-                    err = e.stderr.decode(errors="ignore") if e.stderr else ""
-                except Exception:
-                    err = ""
-                log.error("ocrmypdf_failed", returncode=e.returncode, stderr=err)
-        except subprocess.TimeoutExpired:
-            warnings.append("PDF OCR timed out")
-            if _should_log("ocrmypdf_timeout"):
-                log.error("ocrmypdf_timeout")
-    return text, warnings
+from shared.storage.s3 import get_storage, pool_stats
+from shared.queueing.lanes import DEFAULT_LANE, worker_queues
+# Producer side lives in the thin client; re-exported for existing callers
+from shared.queueing.client import (  # noqa: F401
+    PROCESS_DOCUMENT_TASK, enqueue_process_document, fairshare as _fairshare, publish_process_document,
+)
+from shared.quality.credits import refund_estimate, settle_estimate
+from shared.quality.estimates import estimate_actual_credits
+from apps.block0_worker.pipeline import Artifact, PipelineContext
+from apps.block0_worker.stages import OCR_ERROR_WARNING, build_pipeline
+from shared.pipeline.deadline import Deadline, deadline_for
+from shared.pipeline.versions import LEGACY_VERSION, STAGE_VERSIONS
+from shared.pipeline.fingerprint import (
+    compute_fingerprint, dedupe_credit_price, dedupe_enabled, find_reusable_version,
+)
+from apps.block0_worker.lease import JobLease, LeaseLost, hold_lease, lease_deadline
+from apps.block0_worker.memory import JobMemory, max_rss_bytes, over_ceiling, rss_bytes
+from apps.block0_worker.profiler import StackSampler, should_profile
+from shared.tracing.spans import span
+from apps.block0_worker.warmup import process_uptime, warm_up, warmup_enabled
+
 
 log = get_logger()
 
+# Simple log throttle to avoid spamming identical errors
+_log_throttle: dict[str, float] = {}
+
+
+def _should_log(key: str, window_sec: float = 60.0) -> bool:
+    now = time.monotonic()
+    last = _log_throttle.get(key)
+    if last is None or (now - last) >= window_sec:
+        _log_throttle[key] = now
+        return True
+    return False
+
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", os.getenv("REDIS_URL", "redis://redis:6379/0"))
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "redis://redis:6379/1")
 
 celery_app = Celery("block0")
 celery_app.conf.broker_url = CELERY_BROKER_URL
 celery_app.conf.result_backend = CELERY_RESULT_BACKEND
+# Priority lanes x cost classes: this process consumes the lanes listed in
+# WORKER_LANES (weighted via WeightedLaneCycle) for the classes in
+# WORKER_COST_CLASSES; all of them by default.
+celery_app.conf.task_default_queue = DEFAULT_LANE
+celery_app.conf.task_queues = [Queue(name) for name in worker_queues()]
+celery_app.conf.broker_transport_options = {
+    "queue_order_strategy": "shared.queueing.lanes:WeightedLaneCycle",
+}
+# Recycle prefork children by memory rather than task count (see memory.py)
+if max_rss_bytes():
+    celery_app.conf.worker_max_memory_per_child = max_rss_bytes() // 1024
 
 # Optional Prometheus metrics server (disabled unless METRICS_PORT is set)
 def _start_metrics_and_health_http(port: int):
-    """Start a lightweight HTTP server exposing /metrics and /health on given port."""
-    metrics_app = make_wsgi_app()
+    """Start a lightweight HTTP server exposing /metrics and /health on given port.
+
+    Runs in the parent process; with PROMETHEUS_MULTIPROC_DIR set, /metrics
+    merges the samples of every prefork child.
+    """
+    metrics_app = multiproc.metrics_app()
 
     def app(environ, start_response):
         path = environ.get('PATH_INFO') or '/'
@@ -124,12 +108,15 @@ def _start_metrics_and_health_http(port: int):
     th = Thread(target=_serve, daemon=True)
     th.start()
 
-try:
-    _metrics_port = os.getenv("METRICS_PORT") or (str(_settings.metrics_port) if _settings and _settings.metrics_port else None)
-    if _metrics_port:
-        _start_metrics_and_health_http(int(_metrics_port))
-except Exception:
-    log.exception("worker_metrics_server_failed")
+
+def _start_metrics_server_from_env() -> None:
+    try:
+        port = os.getenv("METRICS_PORT") or (str(_settings.metrics_port) if _settings and _settings.metrics_port else None)
+        if port:
+            _start_metrics_and_health_http(int(port))
+    except Exception:
+        log.exception("worker_metrics_server_failed")
+
 
 # Worker metrics
 OCR_DURATION_SECONDS = Histogram(
@@ -147,227 +134,424 @@ PAGES_PROCESSED_TOTAL = Counter(
     "Pages processed (approx; images count as 1)",
     labelnames=["mime"],
 )
+DEDUPE_HITS_TOTAL = Counter(
+    "worker_dedupe_hits_total",
+    "Jobs completed by reusing artifacts of an identical fingerprint",
+    labelnames=["tenant_id"],
+)
+DEADLINE_MISSED_TOTAL = Counter(
+    "worker_deadline_missed_total",
+    "Jobs that finished after their deadline despite degrading",
+    labelnames=["lane"],
+)
+_WAIT_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+QUEUE_WAIT_SECONDS = Histogram(
+    "worker_queue_wait_seconds",
+    "Time between enqueue and a worker picking the job up",
+    labelnames=["lane"],
+    buckets=_WAIT_BUCKETS,
+)
+JOB_WAIT_SECONDS = Histogram(
+    "worker_job_wait_seconds",
+    "Time from job creation (API) to its first start, including fair-share holding",
+    labelnames=["lane", "cost_class"],
+    buckets=_WAIT_BUCKETS,
+)
+JOBS_IN_FLIGHT = Gauge(
+    "worker_jobs_in_flight",
+    "Jobs currently being processed",
+    labelnames=["lane"],
+    multiprocess_mode="livesum",
+)
+WORKER_STARTUP_SECONDS = Gauge(
+    "worker_startup_seconds",
+    "Worker start-up time by phase: import (worker module), warmup (pre-fork preload), ready (process start to accepting tasks)",
+    labelnames=["phase"],
+    multiprocess_mode="max",
+)
+STAGE_DURATION_SECONDS = Histogram(
+    "worker_stage_duration_seconds",
+    "Pipeline stage duration (cached/reused stages measure the cache lookup)",
+    labelnames=["stage", "status"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900),
+)
+
+_MEMORY_BUCKETS = tuple(mb * 1024 * 1024 for mb in (8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096))
+JOB_PY_PEAK_BYTES = Histogram(
+    "worker_job_python_peak_bytes",
+    "Peak Python heap allocated during a job (tracemalloc)",
+    labelnames=["mime", "size_class"],
+    buckets=_MEMORY_BUCKETS,
+)
+JOB_RSS_DELTA_BYTES = Histogram(
+    "worker_job_rss_delta_bytes",
+    "Peak resident memory growth during a job (includes native allocations)",
+    labelnames=["mime", "size_class"],
+    buckets=_MEMORY_BUCKETS,
+)
+WORKER_RECYCLES_TOTAL = Counter(
+    "worker_child_recycles_total",
+    "Prefork children replaced after a task for exceeding WORKER_MAX_RSS_MB",
+)
+S3_POOL = Gauge(
+    "worker_s3_pool",
+    "MinIO connection pool of each worker process: pools, opened (ever), idle (pooled now), requests; summed over live processes",
+    labelnames=["stat"],
+    multiprocess_mode="livesum",
+)
+
+
+def _record_memory(job, mem: JobMemory, mime: str | None) -> None:
+    """Store the job's memory usage on job.metrics and export it."""
+    try:
+        usage = mem.stop()
+        job.metrics = {**(job.metrics or {}), "memory": usage}
+        labels = {"mime": (mime or "unknown").lower(), "size_class": getattr(job, "cost_class", None) or "unknown"}
+        if usage.get("py_peak_bytes") is not None:
+            JOB_PY_PEAK_BYTES.labels(**labels).observe(usage["py_peak_bytes"])
+        JOB_RSS_DELTA_BYTES.labels(**labels).observe(usage["rss_delta_bytes"])
+    except Exception:
+        log.exception("job_memory_record_failed", job_id=str(job.id))
+
+
+def _store_profile(job, profiler: StackSampler, doc=None, ver=None, storage=None) -> None:
+    """Stop the job's profiler and store its collapsed stacks next to the OCR output."""
+    try:
+        profiler.stop()
+        if doc is not None and ver is not None:
+            sha = doc.bytes_sha256
+            key = f"{doc.tenant_id}/{sha[:2]}/{sha}/v{ver.version}/profile/{job.id}.collapsed.txt"
+        else:
+            key = f"profiles/{job.id}.collapsed.txt"
+        (storage or get_storage()).put_object(key, profiler.collapsed().encode("utf-8"), content_type="text/plain; charset=utf-8")
+        job.metrics = {**(job.metrics or {}), "profile": dict(profiler.summary(), uri=key)}
+        log.info("job_profile_stored", job_id=str(job.id), key=key, samples=profiler.samples)
+    except Exception:
+        log.exception("job_profile_store_failed", job_id=str(job.id))
+
+
+@task_postrun.connect
+def _note_recycle(sender=None, task_id=None, **kwargs):
+    # Celery replaces the child right after this task (worker_max_memory_per_child)
+    if over_ceiling():
+        WORKER_RECYCLES_TOTAL.inc()
+        log.warning("worker_child_recycling", pid=os.getpid(), rss_bytes=rss_bytes(), max_rss_bytes=max_rss_bytes())
 
 
-def enqueue_process_document(job_id: str) -> None:
-    process_document.delay(job_id)
+@task_postrun.connect
+def _export_pool_stats(sender=None, **kwargs):
+    for stat, value in pool_stats().items():
+        S3_POOL.labels(stat=stat).set(value)
 
 
-@celery_app.task(name="process_document")
-def process_document(job_id: str):
+_startup: dict = {}
+
+
+@worker_init.connect
+def _on_worker_init(**kwargs):
+    """Worker parent, before the pool forks: metrics server and warm-up."""
+    _start_metrics_server_from_env()
+    WORKER_STARTUP_SECONDS.labels(phase="import").set(IMPORT_SECONDS)
+    if warmup_enabled():
+        t0 = time.perf_counter()
+        _startup["warmup_steps"] = warm_up()
+        _startup["warmup_seconds"] = round(time.perf_counter() - t0, 3)
+        WORKER_STARTUP_SECONDS.labels(phase="warmup").set(_startup["warmup_seconds"])
+
+
+@worker_ready.connect
+def _on_worker_ready(**kwargs):
+    ready = process_uptime()
+    if ready is not None:
+        WORKER_STARTUP_SECONDS.labels(phase="ready").set(ready)
+    log.info("worker_ready", import_seconds=round(IMPORT_SECONDS, 3), ready_seconds=ready, **_startup)
+
+
+@worker_process_shutdown.connect
+def _forget_child_metrics(pid=None, **kwargs):
+    try:
+        multiproc.mark_process_dead(pid or os.getpid())
+    except Exception:
+        log.exception("worker_metrics_cleanup_failed")
+
+
+def _seed_legacy_ocr(db, ctx, ver) -> None:
+    """Reuse the previous version's OCR text when it predates stage artifacts.
+
+    Versions processed before the stage graph have no manifests, so the cache
+    cannot find their OCR output. Their OCR was what is now the `ocr` stage at
+    LEGACY_VERSION; if that is still current and the run was clean, carry the
+    text over instead of running OCR again.
+    """
+    if "ocr" in ctx.force or STAGE_VERSIONS["ocr"] != LEGACY_VERSION:
+        return
+    prev = (
+        db.query(models.DocumentVersion)
+        .filter(models.DocumentVersion.document_id == ver.document_id, models.DocumentVersion.version < ver.version)
+        .order_by(models.DocumentVersion.version.desc())
+        .first()
+    )
+    if prev is None or prev.stages or not prev.ocr_text_uri:
+        return
+    if any(str(w).startswith("OCR error") for w in (prev.warnings or [])):
+        return
+    ctx.preset["ocr"] = {"ocr_text": Artifact(kind="text", digest=f"legacy:{prev.ocr_text_uri}", uri=prev.ocr_text_uri)}
+
+
+def _publish_preview(storage, ctx, job, doc, ver) -> None:
+    """Expose the preview stage's first-page text on the job while OCR continues."""
+    try:
+        info = ctx.value("preview_info") or {}
+        if not info.get("pages"):
+            return
+        art = ctx.values["preview_text"]
+        if art.uri is None:
+            # Not cached: keep a per-version copy so the API can serve it
+            sha = doc.bytes_sha256
+            art.uri = f"{doc.tenant_id}/{sha[:2]}/{sha}/v{ver.version}/ocr/partial.txt"
+            storage.put_object(art.uri, (art.value(storage) or "").encode("utf-8"), content_type="text/plain; charset=utf-8")
+        job.pages_completed = int(info["pages"])
+        job.partial_text_uri = art.uri
+        log.info("job_preview_published", job_id=str(job.id), pages=info["pages"], total_pages=info.get("total_pages"))
+    except Exception:
+        # Progress reporting must never fail the job
+        log.exception("job_preview_publish_failed", job_id=str(job.id))
+
+
+@celery_app.task(name=PROCESS_DOCUMENT_TASK)
+def process_document(
+    job_id: str,
+    enqueued_at: float | None = None,
+    fair_share_tenant: str | None = None,
+    traceparent: str | None = None,
+    request_id: str | None = None,
+):
+    with span("process_document", traceparent, job_id=job_id) as sp:
+        bind_contextvars(trace_id=sp.trace_id, **({"request_id": request_id} if request_id else {}))
+        _process_document(job_id, enqueued_at, fair_share_tenant)
+
+
+def _process_document(job_id: str, enqueued_at: float | None, fair_share_tenant: str | None):
     db = SessionLocal()
+    lease = None
+    mem = None
+    mime = None
+    in_flight = None
+    profiler = None
+    doc = ver = storage = None
     try:
         job = db.get(models.ProcessingJob, uuid.UUID(job_id))
         if job is None:
             log.error("job_not_found", job_id=job_id)
             return
-        bind_contextvars(job_id=str(job.id))
+        if job.status in (ProcessingStatus.succeeded, ProcessingStatus.failed):
+            # Duplicate delivery, e.g. reaped while the original run was merely slow
+            log.warning("job_already_finished", job_id=job_id, status=str(job.status))
+            return
+        lane = getattr(job, "lane", None) or DEFAULT_LANE
+        bind_contextvars(job_id=str(job.id), lane=lane)
+        if enqueued_at:
+            QUEUE_WAIT_SECONDS.labels(lane=lane).observe(max(0.0, time.time() - float(enqueued_at)))
         job.status = ProcessingStatus.running
         job.started_at = datetime.utcnow()
-        job.steps = ["normalize", "ocr", "quality", "finalize"]
+        job.attempts = (job.attempts or 0) + 1
+        if job.attempts == 1 and job.created_at:
+            JOB_WAIT_SECONDS.labels(lane=lane, cost_class=job.cost_class or "unknown").observe(
+                max(0.0, (job.started_at - job.created_at).total_seconds())
+            )
+        in_flight = JOBS_IN_FLIGHT.labels(lane=lane)
+        in_flight.inc()
+        job.heartbeat_at = job.started_at
+        job.lease_expires_at = lease_deadline(job.started_at)
+        # The budget covers processing, not time spent queued
+        job.deadline_at = deadline_for(job.quality_mode, job.cost_class, now=job.started_at)
         db.commit()
+        lease = JobLease(SessionLocal, job.id, job.attempts).start()
+        mem = JobMemory().start()
+        if should_profile(job.options):
+            profiler = StackSampler().start()
 
         # Load document/version
-        ver = (
-            db.query(models.DocumentVersion)
-            .filter(models.DocumentVersion.document_id == job.document_id)
-            .order_by(models.DocumentVersion.version.desc())
-            .first()
-        )
+        doc = db.get(models.Document, job.document_id)
+        ver = latest_version(db, doc) if doc is not None else None
         if not ver:
             raise RuntimeError("document_version_missing")
 
-        # Minimal OCR implementation: images only (ENG). PDFs get a placeholder warning.
-        doc = db.get(models.Document, job.document_id)
         if doc:
             bind_contextvars(document_id=str(doc.id), tenant_id=str(doc.tenant_id))
-        storage = Storage()
-        ocr_text = ""
-        metrics = {}
-        warnings = []
+            mime = doc.mime
+        quality_mode = (job.quality_mode or os.getenv("QUALITY_MODE", "recommended") or "recommended").strip().lower()
+        storage = get_storage()
+        # The original is identified by its sha256 and only downloaded if a stage has to run
+        ctx = PipelineContext(
+            storage=storage,
+            tenant_id=str(doc.tenant_id),
+            mime=doc.mime or "",
+            quality_mode=quality_mode,
+            values={"original": Artifact(kind="bytes", digest=doc.bytes_sha256, uri=ver.storage_uri)},
+            deadline=Deadline(job.deadline_at),
+        )
 
-        try:
-            original_bytes = storage.get_object_bytes(ver.storage_uri)
-            t0 = time.perf_counter()
-            # Determine provider and languages
-            provider = (os.getenv("OCR_PROVIDER", "tesseract") or "tesseract").strip().lower()
-            lang_cfg = getattr(_settings, "ocr_lang", None) or os.getenv("OCR_LANG", "eng")
-            # Accept comma or plus separated lists
-            languages = [p.strip() for p in lang_cfg.replace("+", ",").split(",") if p.strip()]
-
-            quality_mode = (os.getenv("QUALITY_MODE", "recommended") or "recommended").strip().lower()
-            if provider == "stub":
-                warnings = (warnings or []) + ["OCR disabled (stub provider)"]
-                ocr_text = ""
-            else:
-                if doc.mime and doc.mime.lower().startswith("image/"):
-                    # Deskew for recommended mode only
-                    if quality_mode != "budget":
-                        rotated_bytes, applied_deg = deskew_image_bytes(original_bytes)
-                        if abs(applied_deg) > 0.0:
-                            warnings.append(f"Auto-deskew applied (~{applied_deg:.1f}°)")
-                            original_bytes = rotated_bytes
-                    # Budget mode: restrict to first language for speed
-                    if quality_mode == "budget" and languages:
-                        languages = [languages[0]]
-                    # Optional speed knobs via settings/env
-                    oem_env = os.getenv("OCR_OEM")
-                    psm_env = os.getenv("OCR_PSM")
-                    oem = int(oem_env) if oem_env and oem_env.isdigit() else getattr(_settings, "ocr_oem", None)
-                    psm = int(psm_env) if psm_env and psm_env.isdigit() else getattr(_settings, "ocr_psm", None)
-                    extra = os.getenv("OCR_TESSERACT_EXTRA") or getattr(_settings, "ocr_tesseract_extra", None)
-                    # If budget mode and no explicit values, choose lighter defaults
-                    if quality_mode == "budget":
-                        oem = oem if oem is not None else 1  # LSTM only
-                        psm = psm if psm is not None else 6  # Assume a single uniform block of text
-                    t = TesseractAdapter(oem=oem, psm=psm, extra_config=extra)
-                    res: OCRResult = t.process(original_bytes, doc.mime or "image/unknown", languages=languages)
-                    ocr_text = res.combined_text
-                    # Confidence metric if available will be recomputed by metrics module as well
-                elif (doc.mime or "").lower() == "application/pdf":
-                    # Budget mode: restrict to first language and shorter timeout
-                    if quality_mode == "budget" and languages:
-                        languages = [languages[0]]
-                    # Optional extra flags for ocrmypdf
-                    extra_pdf: list[str] = []
-                    # Always consider OCR_OCRMYPDF_EXTRA
-                    extra_env = os.getenv("OCR_OCRMYPDF_EXTRA") or getattr(_settings, "ocr_ocrmypdf_extra", None)
-                    if extra_env:
-                        try:
-                            extra_pdf += [p for p in extra_env.split(' ') if p]
-                        except Exception:
-                            pass
-                    # Add recommended-only extras if not in budget mode
-                    if quality_mode != "budget":
-                        extra_reco = os.getenv("OCR_OCRMYPDF_RECOMMENDED") or getattr(_settings, "ocr_ocrmypdf_recommended", None)
-                        if extra_reco:
-                            try:
-                                extra_pdf += [p for p in extra_reco.split(' ') if p]
-                            except Exception:
-                                pass
-                    p = OCRmyPDFAdapter(
-                        timeout_seconds=(90 if quality_mode == "budget" else 180),
-                        fast_mode=(quality_mode == "budget"),
-                        tesseract_timeout=(60 if quality_mode == "budget" else None),
-                        extra_args=extra_pdf,
-                    )
-                    res: OCRResult = p.process(original_bytes, "application/pdf", languages=languages)
-                    ocr_text = res.combined_text
-                else:
-                    warnings = (warnings or []) + [f"Unsupported MIME for OCR at this stage: {doc.mime}"]
-                    ocr_text = ""
-            # Observe duration
-            OCR_DURATION_SECONDS.labels(mime=(doc.mime or "unknown").lower()).observe(time.perf_counter() - t0)
-        except Exception as e:
-            warnings = (warnings or []) + [f"OCR error: {e}"]
-            if _should_log("ocr_failed"):
-                log.exception("ocr_failed", job_id=job_id)
-
-        # Store OCR text as object for consistency
-        tenant_id = str(doc.tenant_id)
-        sha = doc.bytes_sha256
-        ocr_key = f"{tenant_id}/{sha[:2]}/{sha}/v{ver.version}/ocr/combined.txt"
-        storage.put_object(ocr_key, ocr_text.encode("utf-8"), content_type="text/plain; charset=utf-8")
-
-        # Update version
-        # For images, set page_count=1 if not present
-        if doc.mime and doc.mime.lower().startswith("image/"):
-            metrics = metrics or {}
-            metrics.setdefault("page_count", 1)
-        # Compute metrics & warnings (image blur/skew, language, density)
-        m2, w2 = compute_metrics_and_warnings(doc.mime, original_bytes, ocr_text)
-        metrics.update(m2 or {})
-        warnings = (warnings or []) + (w2 or [])
-        ver.metrics = metrics
-        ver.warnings = warnings
-        ver.ocr_text_uri = ocr_key
+        def _on_step(step):
+            mem.sample()
+            if "duration_ms" in step:
+                STAGE_DURATION_SECONDS.labels(stage=step["name"], status=step["status"]).observe(step["duration_ms"] / 1000.0)
+            job.steps = [step if s.get("name") == step["name"] else s for s in (job.steps or [])]
+            if step["name"] == "preview" and step.get("status") in ("ran", "cached", "reused"):
+                _publish_preview(storage, ctx, job, doc, ver)
+            db.commit()
+
+        pipeline = build_pipeline(on_step=_on_step)
+        fingerprint = compute_fingerprint(doc.bytes_sha256, pipeline.signature(ctx))
+        options = job.options or {}
+        ctx.force = {st.name for st in pipeline.stages} if options.get("full") else set(options.get("force_stages") or [])
+        if ver.version > 1:
+            _seed_legacy_ocr(db, ctx, ver)
+
+        # Identical bytes already processed with the same pipeline/config: link
+        # the existing artifacts instead of running OCR again.
+        source = None
+        if dedupe_enabled() and not ctx.force:
+            source = find_reusable_version(db, doc.tenant_id, fingerprint)
+        if source is not None:
+            hold_lease(db, job.id, lease.attempt)
+            ver.ocr_text_uri = source.ocr_text_uri
+            ver.metrics = source.metrics
+            ver.warnings = source.warnings
+            ver.stages = source.stages
+            ver.fingerprint = fingerprint
+            settle_estimate(db, job.id, dedupe_credit_price(), reason="dedupe")
+            job.steps = [{"name": "dedupe", "status": "ran", "source_version_id": source.id}]
+            _record_memory(job, mem, mime)
+            if profiler is not None:
+                _store_profile(job, profiler, doc, ver, storage)
+            job.status = ProcessingStatus.succeeded
+            job.finished_at = datetime.utcnow()
+            job.lease_expires_at = None
+            db.commit()
+            JOBS_PROCESSED_TOTAL.labels(status="succeeded").inc()
+            DEDUPE_HITS_TOTAL.labels(tenant_id=str(doc.tenant_id)).inc()
+            log.info("job_succeeded_dedupe", job_id=job_id, source_version_id=source.id)
+            return
+
+        job.steps = pipeline.graph() + [{"name": "finalize", "status": "pending"}]
         db.commit()
+        pipeline.run(ctx)
+        for step in ctx.steps:
+            if step["name"] == "ocr" and step.get("status") == "ran":
+                OCR_DURATION_SECONDS.labels(mime=(doc.mime or "unknown").lower()).observe(step["duration_ms"] / 1000.0)
+        if not ctx.clean and _should_log("ocr_failed"):
+            log.error("ocr_failed", job_id=job_id, warnings=ctx.warnings)
 
-        # Finalize credits: compensate estimate and record actual
-        estimate_credit = (
-            db.query(models.Credit)
-            .filter(models.Credit.job_id == job.id, models.Credit.is_estimate == True)
-            .first()
-        )
-        if estimate_credit:
+        with span("finalize", job_id=job_id):
+            text_art = ctx.values["ocr_text"]
+            if text_art.uri is None:
+                # Uncached (degraded) result: keep a per-version copy for the record
+                sha = doc.bytes_sha256
+                text_art.uri = f"{doc.tenant_id}/{sha[:2]}/{sha}/v{ver.version}/ocr/combined.txt"
+                storage.put_object(text_art.uri, (text_art.value(storage) or "").encode("utf-8"), content_type="text/plain; charset=utf-8")
+            metrics = ctx.value("metrics") or {}
+            pc = metrics.get("page_count") if isinstance(metrics, dict) else None
+            # Results, credits and status in one transaction, only while this
+            # run still owns the job (see hold_lease); job.attempts is reloaded
+            # on every commit, the lease keeps this run's attempt
+            hold_lease(db, job.id, lease.attempt)
+            ver.metrics = metrics
+            ver.warnings = ctx.warnings
+            ver.ocr_text_uri = text_art.uri
+            ver.stages = {
+                st["name"]: {"version": st["version"], "status": st["status"], "key": st.get("key")}
+                for st in ctx.steps
+            }
+            # Only clean runs are reusable; an OCR error must not be cached
+            ver.fingerprint = fingerprint if ctx.clean else None
+
+            # Finalize credits: compensate estimate and record actual
             try:
                 # Compute a simple actual cost for now (same heuristic as estimate)
                 # Inputs available: mime, bytes length (from storage), metrics (page_count, density)
-                actual = estimate_actual_credits(doc.mime or "application/octet-stream", len(original_bytes or b""), metrics)
-
-                # 1) Reverse the earlier estimate (credit back)
-                reversal = models.Credit(
-                    tenant_id=estimate_credit.tenant_id,
-                    user_id=estimate_credit.user_id,
-                    delta=+abs(estimate_credit.delta),
-                    reason="estimate_reversal",
-                    job_id=job.id,
-                    is_estimate=False,
-                )
-                db.add(reversal)
-
-                # 2) Charge actual
-                actual_row = models.Credit(
-                    tenant_id=estimate_credit.tenant_id,
-                    user_id=estimate_credit.user_id,
-                    delta=-abs(int(actual)),
-                    reason="actual",
-                    job_id=job.id,
-                    is_estimate=False,
-                )
-                db.add(actual_row)
-
-                # Mark the original estimate row closed
-                estimate_credit.is_estimate = False
-                db.commit()
+                # Size only matters without a page count; avoid downloading the original otherwise
+                size = 0 if isinstance(pc, int) and pc > 0 else len(ctx.value("original") or b"")
+                actual = estimate_actual_credits(doc.mime or "application/octet-stream", size, metrics)
+                if any(w.startswith(OCR_ERROR_WARNING) for w in ctx.warnings):
+                    # No text was produced: refund the estimate, charge nothing
+                    actual = 0
+                # Savepoint: a failed settlement must not undo the results
+                with db.begin_nested():
+                    settle_estimate(db, job.id, actual)
             except Exception:
                 log.exception("credit_finalization_failed", job_id=job_id)
 
-        job.status = ProcessingStatus.succeeded
-        job.finished_at = datetime.utcnow()
-        db.commit()
+            job.steps = [dict(s, status="ran") if s.get("name") == "finalize" else s for s in (job.steps or [])]
+            job.pages_completed = pc if isinstance(pc, int) else job.pages_completed
+            _record_memory(job, mem, mime)
+            if profiler is not None:
+                _store_profile(job, profiler, doc, ver, storage)
+            job.status = ProcessingStatus.succeeded
+            job.finished_at = datetime.utcnow()
+            job.lease_expires_at = None
+            db.commit()
+        if job.deadline_at and job.finished_at > job.deadline_at:
+            DEADLINE_MISSED_TOTAL.labels(lane=lane).inc()
         # Metrics: jobs + pages
         JOBS_PROCESSED_TOTAL.labels(status="succeeded").inc()
-        page_count = metrics.get("page_count") if isinstance(metrics, dict) else None
-        if isinstance(page_count, int) and page_count > 0:
-            PAGES_PROCESSED_TOTAL.labels(mime=(doc.mime or "unknown").lower()).inc(page_count)
+        if isinstance(pc, int) and pc > 0:
+            PAGES_PROCESSED_TOTAL.labels(mime=(doc.mime or "unknown").lower()).inc(pc)
         log.info("job_succeeded", job_id=job_id)
+    except LeaseLost:
+        # Reaped while stalled: the retry owns the job, its status and its credits
+        log.warning("job_lease_lost_before_finalize", job_id=job_id)
+        JOBS_PROCESSED_TOTAL.labels(status="lease_lost").inc()
     except Exception as e:
         if _should_log("job_failed"):
             log.exception("job_failed", job_id=job_id)
+        db.rollback()
         job = db.get(models.ProcessingJob, uuid.UUID(job_id)) if 'job' in locals() else None
+        if job and lease is not None:
+            # Fail it only while this run still owns it
+            try:
+                hold_lease(db, job.id, lease.attempt)
+            except LeaseLost:
+                log.warning("job_lease_lost_before_fail", job_id=job_id)
+                job = None
         if job:
+            if mem is not None:
+                _record_memory(job, mem, mime)
+            if profiler is not None:
+                _store_profile(job, profiler, doc, ver, storage)
             job.status = ProcessingStatus.failed
             job.error = str(e)
             job.finished_at = datetime.utcnow()
+            job.lease_expires_at = None
             db.commit()
         JOBS_PROCESSED_TOTAL.labels(status="failed").inc()
         # Compensate estimated credits on failure (refund)
         try:
-            if job:
-                estimate_credit = (
-                    db.query(models.Credit)
-                    .filter(models.Credit.job_id == job.id, models.Credit.is_estimate == True)
-                    .first()
-                )
-                if estimate_credit:
-                    refund = models.Credit(
-                        tenant_id=estimate_credit.tenant_id,
-                        user_id=estimate_credit.user_id,
-                        delta=+abs(estimate_credit.delta),
-                        reason="refund_failure",
-                        job_id=job.id,
-                        is_estimate=False,
-                    )
-                    db.add(refund)
-                    estimate_credit.is_estimate = False
-                    db.commit()
+            if job and refund_estimate(db, job.id, "refund_failure"):
+                db.commit()
         except Exception:
             if _should_log("credit_refund_failed"):
                 log.exception("credit_refund_failed", job_id=job_id)
     finally:
+        if in_flight is not None:
+            in_flight.dec()
+        if lease is not None:
+            lease.stop()
+        if mem is not None:
+            mem.stop()  # no-op once recorded; ends tracemalloc tracing otherwise
+        if profiler is not None:
+            profiler.stop()
+        if fair_share_tenant:
+            # Free the tenant's concurrency slot taken by the dispatcher
+            try:
+                _fairshare().release(fair_share_tenant, job_id)
+            except Exception:
+                log.exception("fairshare_release_failed", job_id=job_id)
         try:
             clear_contextvars()
         except Exception:
             pass
         db.close()
+
+
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
@@ -1,23 +1,35 @@
 import argparse
+import hashlib
 import os
+from concurrent.futures import ThreadPoolExecutor
 import pathlib
 import mimetypes
 import requests
 
 
-def upload_file_legacy(api_base: str, tenant_id: str, user_id: int, path: pathlib.Path):
+def upload_file_legacy(api_base: str, tenant_id: str, user_id: int, path: pathlib.Path, lane: str = "bulk"):
     url = f"{api_base.rstrip('/')}/v0/documents/upload"
     with open(path, "rb") as f:
         files = {"files": (path.name, f)}
-        data = {"tenant_id": tenant_id, "user_id": str(user_id)}
+        data = {"tenant_id": tenant_id, "user_id": str(user_id), "lane": lane}
         resp = requests.post(url, files=files, data=data, timeout=300)
         resp.raise_for_status()
         return resp.json()["documents"][0]
 
 
-def upload_file_presigned(api_base: str, tenant_id: str, user_id: int, path: pathlib.Path):
+def file_sha256(path: pathlib.Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def upload_file_presigned(api_base: str, tenant_id: str, user_id: int, path: pathlib.Path, lane: str = "bulk"):
     mime, _ = mimetypes.guess_type(path.name)
     mime = mime or "application/octet-stream"
+    # Hash first: content the tenant already has is not uploaded again
+    sha256 = file_sha256(path)
     presign = requests.post(
         f"{api_base.rstrip('/')}/v0/uploads/presign",
         json={
@@ -25,9 +37,14 @@ def upload_file_presigned(api_base: str, tenant_id: str, user_id: int, path: pat
             "user_id": user_id,
             "filename": path.name,
             "mime": mime,
+            "sha256": sha256,
+            "size": path.stat().st_size,
         },
         timeout=60,
     ).json()
+    if presign.get("already_present"):
+        job = presign.get("job") or {}
+        return {"document_id": presign["document_id"], "job_id": job.get("id"), "credit_estimate": 0, "already_present": True}
     put_url = presign["url"]
     key = presign["object_key"]
     with open(path, "rb") as f:
@@ -42,6 +59,8 @@ def upload_file_presigned(api_base: str, tenant_id: str, user_id: int, path: pat
             "key": key,
             "filename": path.name,
             "mime": mime,
+            "lane": lane,
+            "sha256": sha256,
         },
         timeout=120,
     )
@@ -50,6 +69,74 @@ def upload_file_presigned(api_base: str, tenant_id: str, user_id: int, path: pat
     return {"document_id": data["document_id"], "job_id": data["job_id"], "credit_estimate": data.get("credit_estimate")}
 
 
+def upload_batch(api_base: str, tenant_id: str, user_id: int, paths: list, lane: str = "bulk", parallel: int = 8):
+    """Presign, PUT and finalize a group of files with two API calls
+    (presign:batch, finalize:batch); PUTs run in parallel. Yields (path, result)."""
+    api = api_base.rstrip("/")
+    metas = []
+    for path in paths:
+        mime, _ = mimetypes.guess_type(path.name)
+        metas.append({"path": path, "mime": mime or "application/octet-stream", "sha256": file_sha256(path)})
+    presign = requests.post(
+        f"{api}/v0/uploads/presign:batch",
+        json={
+            "tenant_id": tenant_id,
+            "user_id": user_id,
+            "items": [
+                {"filename": m["path"].name, "mime": m["mime"], "sha256": m["sha256"], "size": m["path"].stat().st_size}
+                for m in metas
+            ],
+        },
+        timeout=120,
+    )
+    presign.raise_for_status()
+    todo = []
+    for m, item in zip(metas, presign.json()["items"]):
+        if item.get("already_present"):
+            job = item.get("job") or {}
+            yield m["path"], {"document_id": item["document_id"], "job_id": job.get("id"), "already_present": True}
+        else:
+            todo.append((m, item))
+    if not todo:
+        return
+
+    def put(entry):
+        m, item = entry
+        try:
+            with open(m["path"], "rb") as f:
+                r = requests.put(item["url"], data=f, headers={"Content-Type": m["mime"]}, timeout=600)
+            return None if r.status_code in (200, 201, 204) else f"PUT failed: {r.status_code} {r.text}"
+        except Exception as e:
+            return str(e)
+
+    with ThreadPoolExecutor(max_workers=max(1, parallel)) as pool:
+        put_errors = list(pool.map(put, todo))
+    uploaded = []
+    for (m, item), err in zip(todo, put_errors):
+        if err:
+            yield m["path"], {"error": err}
+        else:
+            uploaded.append((m, item))
+    if not uploaded:
+        return
+    finalize = requests.post(
+        f"{api}/v0/uploads/finalize:batch",
+        json={
+            "tenant_id": tenant_id,
+            "user_id": user_id,
+            "lane": lane,
+            "items": [
+                {"key": item["object_key"], "filename": m["path"].name, "mime": m["mime"], "sha256": m["sha256"]}
+                for m, item in uploaded
+            ],
+        },
+        timeout=600,
+    )
+    finalize.raise_for_status()
+    for (m, _), res in zip(uploaded, finalize.json()["items"]):
+        yield m["path"], res
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("root", nargs="?", default="test_documents", help="Folder to scan for PDFs/images")
@@ -57,6 +144,9 @@ def main():
     parser.add_argument("--tenant", default="11111111-1111-1111-1111-111111111111")
     parser.add_argument("--user", type=int, default=1)
     parser.add_argument("--legacy", action="store_true", help="Use legacy multipart upload path instead of presigned finalize")
+    parser.add_argument("--lane", default="bulk", choices=["interactive", "bulk", "reprocess"], help="Priority lane for the enqueued jobs")
+    parser.add_argument("--batch", type=int, default=100, help="Files per presign:batch/finalize:batch call (0 = one call per file)")
+    parser.add_argument("--parallel", type=int, default=8, help="Concurrent PUTs in batch mode")
     args = parser.parse_args()
 
     root = pathlib.Path(args.root)
@@ -65,14 +155,32 @@ def main():
     if not paths:
         print("No documents found.")
         return
-    print(f"Uploading {len(paths)} documents to {args.api} using {'legacy' if args.legacy else 'presigned'} path...")
+    mode = "legacy" if args.legacy else ("batched presigned" if args.batch > 0 else "presigned")
+    print(f"Uploading {len(paths)} documents to {args.api} using {mode} path...")
+    if not args.legacy and args.batch > 0:
+        for i in range(0, len(paths), args.batch):
+            group = paths[i:i + args.batch]
+            try:
+                for p, res in upload_batch(args.api, args.tenant, args.user, group, lane=args.lane, parallel=args.parallel):
+                    if res.get("already_present"):
+                        print(f"SKIP {p} → already present doc={res['document_id']} job={res['job_id']}")
+                    elif res.get("error"):
+                        print(f"FAIL {p}: {res['error']}")
+                    else:
+                        print(f"OK {p} → doc={res['document_id']} job={res['job_id']} est={res['credit_estimate']}")
+            except Exception as e:
+                print(f"FAIL batch of {len(group)} starting at {group[0]}: {e}")
+        return
     for p in paths:
         try:
             if args.legacy:
-                res = upload_file_legacy(args.api, args.tenant, args.user, p)
+                res = upload_file_legacy(args.api, args.tenant, args.user, p, lane=args.lane)
+            else:
+                res = upload_file_presigned(args.api, args.tenant, args.user, p, lane=args.lane)
+            if res.get("already_present"):
+                print(f"SKIP {p} → already present doc={res['document_id']} job={res['job_id']}")
             else:
-                res = upload_file_presigned(args.api, args.tenant, args.user, p)
-            print(f"OK {p} → doc={res['document_id']} job={res['job_id']} est={res['credit_estimate']}")
+                print(f"OK {p} → doc={res['document_id']} job={res['job_id']} est={res['credit_estimate']}")
         except Exception as e:
             print(f"FAIL {p}: {e}")
 
@@ -0,0 +1,130 @@
+"""
+Cost of resolving the latest version for a page of documents.
+
+Seeds --docs documents (one or two versions each) for a throwaway tenant in
+DATABASE_URL, then lists the newest --page of them two ways: the old
+per-document `ORDER BY version DESC LIMIT 1` lookup (N+1 queries) and the
+documents.latest_version_id join used by /v0/documents. Prints statements and
+wall time for each. Run against a migrated dev database; --keep leaves the
+seeded rows in place for repeated runs (pass the printed --tenant).
+
+Usage:
+  DATABASE_URL=postgresql+psycopg://... PYTHONPATH=. python scripts/bench_latest_version.py [--docs 100000] [--page 200]
+"""
+
+import argparse
+import statistics
+import time
+import uuid
+
+from sqlalchemy import event, select
+
+from shared.db import models
+from shared.db.latest import with_latest_version
+from shared.db.session import SessionLocal, engine
+
+
+def seed(db, n: int) -> uuid.UUID:
+    tenant = models.Tenant(id=uuid.uuid4(), name=f"bench-{uuid.uuid4().hex[:8]}")
+    db.add(tenant)
+    db.flush()
+    user = models.User(tenant_id=tenant.id, username=f"bench-{tenant.id.hex[:8]}")
+    db.add(user)
+    db.flush()
+    for start in range(0, n, 5000):
+        for i in range(start, min(n, start + 5000)):
+            doc = models.Document(
+                id=uuid.uuid4(), tenant_id=tenant.id, user_id=user.id,
+                orig_filename=f"bench-{i}.pdf", mime="application/pdf", bytes_sha256=f"{i:064x}",
+            )
+            db.add(doc)
+            for v in range(1, 2 + (i % 2)):
+                db.add(models.DocumentVersion(document_id=doc.id, version=v, storage_uri=f"bench/{i}/v{v}"))
+        db.commit()
+        print(f"seeded {min(n, start + 5000)}/{n}")
+    return tenant.id
+
+
+def n_plus_one(db, tenant_id, page: int) -> list:
+    docs = (
+        db.query(models.Document)
+        .filter(models.Document.tenant_id == tenant_id)
+        .order_by(models.Document.created_at.desc())
+        .limit(page)
+        .all()
+    )
+    return [
+        db.query(models.DocumentVersion)
+        .filter(models.DocumentVersion.document_id == d.id)
+        .order_by(models.DocumentVersion.version.desc())
+        .first()
+        for d in docs
+    ]
+
+
+def joined(db, tenant_id, page: int) -> list:
+    rows = (
+        with_latest_version(db.query(models.Document))
+        .filter(models.Document.tenant_id == tenant_id)
+        .order_by(models.Document.created_at.desc())
+        .limit(page)
+        .all()
+    )
+    return [ver for _, ver in rows]
+
+
+def measure(label: str, fn, tenant_id, page: int, repeats: int) -> None:
+    counts, times = [], []
+    for _ in range(repeats):
+        statements = []
+
+        def count(*a):
+            statements.append(1)
+
+        event.listen(engine, "before_cursor_execute", count)
+        db = SessionLocal()
+        try:
+            t0 = time.perf_counter()
+            versions = fn(db, tenant_id, page)
+            times.append(time.perf_counter() - t0)
+        finally:
+            db.close()
+            event.remove(engine, "before_cursor_execute", count)
+        counts.append(len(statements))
+    print(
+        f"{label}: rows={len(versions)} statements={counts[-1]} "
+        f"median={statistics.median(times) * 1000:.1f}ms max={max(times) * 1000:.1f}ms"
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=100_000)
+    ap.add_argument("--page", type=int, default=200)
+    ap.add_argument("--repeats", type=int, default=5)
+    ap.add_argument("--tenant", help="Reuse a tenant seeded by an earlier --keep run")
+    ap.add_argument("--keep", action="store_true", help="Leave the seeded rows in place")
+    args = ap.parse_args()
+
+    db = SessionLocal()
+    tenant_id = uuid.UUID(args.tenant) if args.tenant else seed(db, args.docs)
+    print(f"tenant {tenant_id}")
+    try:
+        measure("n+1 lookups", n_plus_one, tenant_id, args.page, args.repeats)
+        measure("latest_version_id join", joined, tenant_id, args.page, args.repeats)
+    finally:
+        if not args.keep and not args.tenant:
+            ids = select(models.Document.id).where(models.Document.tenant_id == tenant_id)
+            db.query(models.Document).filter(models.Document.tenant_id == tenant_id).update(
+                {models.Document.latest_version_id: None}, synchronize_session=False,
+            )
+            db.query(models.DocumentVersion).filter(models.DocumentVersion.document_id.in_(ids)).delete(synchronize_session=False)
+            db.query(models.Document).filter(models.Document.tenant_id == tenant_id).delete(synchronize_session=False)
+            db.query(models.User).filter(models.User.tenant_id == tenant_id).delete(synchronize_session=False)
+            db.query(models.Tenant).filter(models.Tenant.id == tenant_id).delete(synchronize_session=False)
+            db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Latency of a cheap endpoint while large multipart uploads are in flight.
+
+Probes GET /v0/version at a fixed rate, first alone (baseline) and then while
+--uploads concurrent clients each POST --files files of --mb MB to
+/v0/documents/upload. With blocking I/O off the event loop the probe's p99
+should stay close to the baseline.
+
+Usage:
+  API_BASE=http://localhost:8000 python scripts/bench_upload_latency.py [--mb 50] [--files 3] [--uploads 2] [--seconds 10]
+"""
+
+import argparse
+import os
+import statistics
+import threading
+import time
+
+import requests
+
+
+def probe(api: str, stop: threading.Event, interval: float) -> list:
+    samples = []
+    with requests.Session() as s:
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            try:
+                s.get(f"{api}/v0/version", timeout=30)
+            except Exception:
+                pass
+            samples.append(time.perf_counter() - t0)
+            time.sleep(interval)
+    return samples
+
+
+def pct(samples: list, p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))] * 1000
+
+
+def report(label: str, samples: list) -> None:
+    if not samples:
+        print(f"{label}: no samples")
+        return
+    print(
+        f"{label}: n={len(samples)} p50={pct(samples, 50):.1f}ms p95={pct(samples, 95):.1f}ms "
+        f"p99={pct(samples, 99):.1f}ms max={max(samples) * 1000:.1f}ms mean={statistics.mean(samples) * 1000:.1f}ms"
+    )
+
+
+def run_probe(api: str, seconds: float, interval: float, during=None) -> list:
+    stop = threading.Event()
+    out: list = []
+    t = threading.Thread(target=lambda: out.extend(probe(api, stop, interval)))
+    t.start()
+    if during:
+        during()
+    else:
+        time.sleep(seconds)
+    stop.set()
+    t.join()
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--api", default=os.getenv("API_BASE", "http://localhost:8000"))
+    ap.add_argument("--tenant", default="11111111-1111-1111-1111-111111111111")
+    ap.add_argument("--user", type=int, default=1)
+    ap.add_argument("--mb", type=int, default=50, help="Size of each uploaded file")
+    ap.add_argument("--files", type=int, default=3, help="Files per upload request")
+    ap.add_argument("--uploads", type=int, default=2, help="Concurrent upload requests")
+    ap.add_argument("--seconds", type=float, default=10.0, help="Baseline probe duration")
+    ap.add_argument("--interval", type=float, default=0.02, help="Pause between probes")
+    args = ap.parse_args()
+    api = args.api.rstrip("/")
+
+    report("baseline", run_probe(api, args.seconds, args.interval))
+
+    def uploads():
+        def one(i: int):
+            # Distinct bytes per file so nothing is deduplicated
+            files = [
+                ("files", (f"bench-{i}-{j}.txt", os.urandom(args.mb * 1024 * 1024), "text/plain"))
+                for j in range(args.files)
+            ]
+            t0 = time.perf_counter()
+            r = requests.post(
+                f"{api}/v0/documents/upload",
+                data={"tenant_id": args.tenant, "user_id": str(args.user), "lane": "bulk"},
+                files=files,
+                timeout=600,
+            )
+            print(f"upload {i}: HTTP {r.status_code} in {time.perf_counter() - t0:.1f}s")
+
+        threads = [threading.Thread(target=one, args=(i,)) for i in range(args.uploads)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    report("during uploads", run_probe(api, args.seconds, args.interval, during=uploads))
+
+
+if __name__ == "__main__":
+    main()
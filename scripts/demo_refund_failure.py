@@ -19,8 +19,8 @@ from dataclasses import dataclass
 from shared.db.session import SessionLocal
 from shared.db import models
 from shared.db.models import ProcessingStatus
-from shared.quality.metrics import estimate_credits
-from apps.block0_worker.worker import enqueue_process_document
+from shared.quality.estimates import estimate_credits
+from shared.queueing.client import enqueue_process_document
 
 
 def env_or(name: str, default: str) -> str:
@@ -1,6 +1,8 @@
 import argparse
+import sys
+import time
 import requests
-from typing import List
+from typing import Iterator, List
 
 
 def list_documents(api: str, tenant: str, limit: int) -> List[str]:
@@ -11,6 +13,32 @@ def list_documents(api: str, tenant: str, limit: int) -> List[str]:
     return [d["id"] for d in data.get("documents", [])]
 
 
+def iter_documents(api: str, tenant: str, page_size: int = 200, verbose: bool = False) -> Iterator[str]:
+    """Every document ID of the tenant, newest first, following `next_cursor`
+    (keyset pages: each costs the same however deep the walk is)."""
+    url = f"{api.rstrip('/')}/v0/documents"
+    cursor = None
+    page = 0
+    with requests.Session() as s:
+        while True:
+            params = {"tenant_id": tenant, "limit": page_size}
+            if cursor:
+                params["cursor"] = cursor
+            t0 = time.perf_counter()
+            r = s.get(url, params=params, timeout=60)
+            r.raise_for_status()
+            data = r.json()
+            page += 1
+            if verbose:
+                docs = data.get("documents", [])
+                print(f"page {page}: {len(docs)} docs in {(time.perf_counter() - t0) * 1000:.1f}ms", file=sys.stderr)
+            for d in data.get("documents", []):
+                yield d["id"]
+            cursor = data.get("next_cursor")
+            if not cursor:
+                return
+
+
 def fetch_processed(api: str, doc_id: str) -> dict:
     url = f"{api.rstrip('/')}/v0/documents/{doc_id}/processed.json"
     r = requests.get(url, timeout=60)
@@ -24,10 +52,15 @@ def main():
     p.add_argument("--tenant", default="11111111-1111-1111-1111-111111111111")
     p.add_argument("--limit", type=int, default=20)
     p.add_argument("--ids", default="", help="Comma-separated document IDs; overrides --limit list")
+    p.add_argument("--all", action="store_true", help="Walk every document of the tenant page by page; overrides --limit")
+    p.add_argument("--page-size", type=int, default=200, help="Documents per page with --all")
+    p.add_argument("--verbose", action="store_true", help="With --all, print per-page latency to stderr")
     args = p.parse_args()
 
     if args.ids:
         ids = [s.strip() for s in args.ids.split(",") if s.strip()]
+    elif args.all:
+        ids = iter_documents(args.api, args.tenant, args.page_size, args.verbose)
     else:
         ids = list_documents(args.api, args.tenant, args.limit)
 
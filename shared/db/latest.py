@@ -0,0 +1,72 @@
+"""
+Latest-version pointer on documents.
+
+`documents.latest_version_id` points at the highest `document_versions.version`
+of each document. An `after_flush` hook (installed on SessionLocal by
+shared.db.session) advances it in the same transaction whenever a version is
+inserted, so list endpoints join it instead of running one
+`ORDER BY version DESC LIMIT 1` query per document.
+"""
+
+from typing import Optional
+
+from sqlalchemy import event, or_, select
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+
+from shared.db import models
+
+
+def _advance(ver):
+    """UPDATE moving the document's pointer to `ver` unless it already points
+    at a higher version."""
+    docs = models.Document.__table__
+    versions = models.DocumentVersion.__table__
+    lower = select(versions.c.id).where(versions.c.document_id == ver.document_id, versions.c.version < ver.version)
+    return (
+        docs.update()
+        .where(docs.c.id == ver.document_id, or_(docs.c.latest_version_id.is_(None), docs.c.latest_version_id.in_(lower)))
+        .values(latest_version_id=ver.id)
+    )
+
+
+def _after_flush(session, flush_context) -> None:
+    new_versions = [o for o in session.new if isinstance(o, models.DocumentVersion) and o.id is not None]
+    if not new_versions:
+        return
+    connection = session.connection()
+    for ver in sorted(new_versions, key=lambda v: v.version):
+        res = connection.execute(_advance(ver))
+        doc = session.identity_map.get(identity_key(models.Document, ver.document_id))
+        if res.rowcount and doc is not None:
+            # Loaded copies see the new pointer without a refresh
+            set_committed_value(doc, "latest_version_id", ver.id)
+
+
+def track_latest_versions(session_factory) -> None:
+    """Maintain documents.latest_version_id for sessions made by `session_factory`."""
+    if not event.contains(session_factory, "after_flush", _after_flush):
+        event.listen(session_factory, "after_flush", _after_flush)
+
+
+def latest_version(db, doc) -> Optional["models.DocumentVersion"]:
+    """The document's latest version: a primary-key lookup through the
+    pointer, or the ordered query for rows the pointer does not cover yet."""
+    version_id = getattr(doc, "latest_version_id", None)
+    if version_id is not None:
+        ver = db.get(models.DocumentVersion, version_id)
+        if ver is not None:
+            return ver
+    return (
+        db.query(models.DocumentVersion)
+        .filter(models.DocumentVersion.document_id == doc.id)
+        .order_by(models.DocumentVersion.version.desc())
+        .first()
+    )
+
+
+def with_latest_version(query):
+    """Add the latest version to a Document query: rows become (doc, version or None)."""
+    return query.add_entity(models.DocumentVersion).outerjoin(
+        models.DocumentVersion, models.DocumentVersion.id == models.Document.latest_version_id,
+    )
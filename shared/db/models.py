@@ -4,8 +4,8 @@ from typing import Optional, List, Dict, Any
 from enum import Enum
 
 from sqlalchemy import (
-    Column, String, Integer, DateTime, ForeignKey, Boolean, Enum as SAEnum,
-    JSON, LargeBinary, Text
+    Column, String, Integer, BigInteger, DateTime, ForeignKey, Boolean, Enum as SAEnum,
+    JSON, LargeBinary, Text, Index
 )
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import declarative_base, relationship
@@ -46,10 +46,20 @@ class Document(Base):
     mime = Column(String, nullable=False)
     bytes_sha256 = Column(String, nullable=False, index=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Highest version, maintained on insert (shared.db.latest)
+    latest_version_id = Column(
+        Integer,
+        ForeignKey("document_versions.id", use_alter=True, name="fk_documents_latest_version"),
+        nullable=True,
+    )
+
+    # Keyset pages (shared.db.pagination) walk (created_at, id) within a tenant
+    __table_args__ = (Index("ix_documents_tenant_created_id", "tenant_id", "created_at", "id"),)
 
 
 class DocumentVersion(Base):
     __tablename__ = "document_versions"
+    __table_args__ = (Index("ix_document_versions_document_version", "document_id", "version"),)
     id = Column(Integer, primary_key=True, autoincrement=True)
     document_id = Column(UUID(as_uuid=True), ForeignKey("documents.id"), nullable=False)
     version = Column(Integer, nullable=False)
@@ -57,6 +67,10 @@ class DocumentVersion(Base):
     ocr_text_uri = Column(String, nullable=True)
     metrics = Column(JSON, nullable=True)
     warnings = Column(JSON, nullable=True)
+    # Pipeline fingerprint of the run that produced the artifacts (shared.pipeline.fingerprint)
+    fingerprint = Column(String, nullable=True, index=True)
+    # Per-stage record of the run: {stage: {version, status, key}} (see shared.pipeline.versions)
+    stages = Column(JSON, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
 
@@ -65,7 +79,25 @@ class ProcessingJob(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=_uuid.uuid4)
     document_id = Column(UUID(as_uuid=True), ForeignKey("documents.id"), nullable=False)
     status = Column(SAEnum(ProcessingStatus), default=ProcessingStatus.queued, nullable=False)
+    lane = Column(String, nullable=True)  # priority lane / Celery queue (see shared.queueing.lanes)
+    # Enqueue-time routing classification (see shared.queueing.routing)
+    quality_mode = Column(String, nullable=True)
+    est_pages = Column(Integer, nullable=True)
+    cost_units = Column(Integer, nullable=True)
+    cost_class = Column(String, nullable=True)
+    deadline_at = Column(DateTime, nullable=True)  # end-to-end budget (shared.pipeline.deadline)
+    # Enqueue-time duration features for ETAs (shared.queueing.eta)
+    features = Column(JSON, nullable=True)
+    # Progressive results: first pages published before the full run finishes
+    pages_completed = Column(Integer, nullable=True)
+    partial_text_uri = Column(String, nullable=True)
+    # Worker lease: renewed by heartbeat while running; expired leases are reaped
+    attempts = Column(Integer, default=0, nullable=False)
+    heartbeat_at = Column(DateTime, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
     steps = Column(JSON, nullable=True)
+    metrics = Column(JSON, nullable=True)  # run resource usage, e.g. {"memory": {...}}
+    options = Column(JSON, nullable=True)  # e.g. reprocess {"force_stages": [...]}
     error = Column(Text, nullable=True)
     started_at = Column(DateTime, nullable=True)
     finished_at = Column(DateTime, nullable=True)
@@ -83,3 +115,20 @@ class Credit(Base):
     is_estimate = Column(Boolean, default=False, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
+    __table_args__ = (Index("ix_credits_tenant_created_id", "tenant_id", "created_at", "id"),)
+
+
+class CreditBalance(Base):
+    """Running ledger totals per tenant, user and reason, kept in the same
+    transaction as the credits rows (shared.quality.balances)."""
+    __tablename__ = "credit_balances"
+    tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    reason = Column(String, primary_key=True)
+    delta_sum = Column(BigInteger, default=0, nullable=False)
+    entries = Column(Integer, default=0, nullable=False)
+    # Rows still flagged is_estimate (open estimates) and their sum
+    open_estimates = Column(Integer, default=0, nullable=False)
+    open_estimate_sum = Column(BigInteger, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
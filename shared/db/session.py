@@ -11,6 +11,14 @@ DATABASE_URL = os.getenv(
 engine = create_engine(DATABASE_URL, pool_pre_ping=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Keep credit_balances and documents.latest_version_id in step with every
+# credits / document_versions insert (same transaction)
+from shared.db.latest import track_latest_versions  # noqa: E402
+from shared.quality.balances import track_balances  # noqa: E402
+
+track_balances(SessionLocal)
+track_latest_versions(SessionLocal)
+
 def get_db() -> Generator:
     db = SessionLocal()
     try:
@@ -2,17 +2,25 @@ from typing import List, Optional
 from .base import OCRAdapter, OCRResult, PageText
 import tempfile
 import subprocess
-from pypdf import PdfReader
 import io
 import time
 
 
 class OCRmyPDFAdapter(OCRAdapter):
-    def __init__(self, timeout_seconds: int = 180, fast_mode: bool = False, tesseract_timeout: int | None = None, extra_args: list[str] | None = None):
+    def __init__(
+        self,
+        timeout_seconds: int = 180,
+        fast_mode: bool = False,
+        tesseract_timeout: int | None = None,
+        extra_args: list[str] | None = None,
+        max_total_seconds: float | None = None,
+    ):
         self.timeout_seconds = timeout_seconds
         self.fast_mode = fast_mode
         self.tesseract_timeout = tesseract_timeout
         self.extra_args = extra_args or []
+        # Bound on all attempts plus backoff together (None = per-attempt timeouts only)
+        self.max_total_seconds = max_total_seconds
 
     def process(self, content: bytes, mime: str, languages: Optional[List[str]] = None) -> OCRResult:
         """OCR for PDFs using ocrmypdf with a sidecar text file.
@@ -45,16 +53,23 @@ class OCRmyPDFAdapter(OCRAdapter):
             if self.extra_args:
                 cmd += list(self.extra_args)
             cmd += [in_pdf, out_pdf]
-            # Retry logic with exponential backoff (3 attempts total)
+            # Retry logic with exponential backoff (3 attempts total), all within max_total_seconds
+            end = time.monotonic() + self.max_total_seconds if self.max_total_seconds is not None else None
             for attempt in range(3):
+                timeout = self.timeout_seconds
+                if end is not None:
+                    timeout = min(timeout, end - time.monotonic())
                 try:
-                    subprocess.run(cmd, check=True, capture_output=True, timeout=self.timeout_seconds)
+                    if timeout < 1:
+                        raise subprocess.TimeoutExpired(cmd, timeout)
+                    subprocess.run(cmd, check=True, capture_output=True, timeout=timeout)
                     break  # Success
                 except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
-                    if attempt == 2:
+                    backoff = 0.5 * (2 ** attempt)
+                    if attempt == 2 or (end is not None and end - time.monotonic() < backoff + 1):
                         page = PageText(index=0, text="", confidence=0.0, language=lang)
                         return OCRResult(pages=[page], combined_text="")
-                    time.sleep(0.5 * (2 ** attempt))
+                    time.sleep(backoff)
 
             text = ""
             try:
@@ -66,6 +81,8 @@ class OCRmyPDFAdapter(OCRAdapter):
             # Build minimal pages info (one combined page). If we can count pages, include that many empty pages.
             pages = []
             try:
+                from pypdf import PdfReader
+
                 reader = PdfReader(io.BytesIO(content))
                 for i in range(len(reader.pages)):
                     pages.append(PageText(index=i, text="", confidence=0.0, language=lang))
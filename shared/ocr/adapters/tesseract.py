@@ -1,16 +1,15 @@
 from typing import List, Optional
 from .base import OCRAdapter, OCRResult, PageText
-from PIL import Image
 import io
-import pytesseract
-from pytesseract import Output
 
 
 class TesseractAdapter(OCRAdapter):
-    def __init__(self, oem: int | None = None, psm: int | None = None, extra_config: str | None = None):
+    def __init__(self, oem: int | None = None, psm: int | None = None, extra_config: str | None = None, timeout: float | None = None):
         self.oem = oem
         self.psm = psm
         self.extra_config = extra_config
+        # Per-call limit in seconds (0/None = unlimited); pytesseract raises RuntimeError on expiry
+        self.timeout = timeout
 
     def process(self, content: bytes, mime: str, languages: Optional[List[str]] = None) -> OCRResult:
         """OCR for image/* using pytesseract. Returns combined text and a single PageText.
@@ -19,6 +18,11 @@ class TesseractAdapter(OCRAdapter):
         if not (mime or "").lower().startswith("image/"):
             return OCRResult(pages=[PageText(index=0, text="", confidence=0.0)], combined_text="")
 
+        # Imported on use: PIL/pytesseract are only needed by image jobs
+        from PIL import Image
+        import pytesseract
+        from pytesseract import Output
+
         pil_img = Image.open(io.BytesIO(content))
         lang = None
         if languages:
@@ -32,14 +36,15 @@ class TesseractAdapter(OCRAdapter):
         if self.extra_config:
             cfg_parts.append(self.extra_config)
         config = " ".join(cfg_parts) if cfg_parts else None
+        timeout = self.timeout or 0
         if config:
-            text = pytesseract.image_to_string(pil_img, lang=lang, config=config) or ""
+            text = pytesseract.image_to_string(pil_img, lang=lang, config=config, timeout=timeout) or ""
         else:
-            text = pytesseract.image_to_string(pil_img, lang=lang) or ""
+            text = pytesseract.image_to_string(pil_img, lang=lang, timeout=timeout) or ""
 
         confidence = 0.0
         try:
-            data = pytesseract.image_to_data(pil_img, lang=lang, output_type=Output.DICT, config=config or None)
+            data = pytesseract.image_to_data(pil_img, lang=lang, output_type=Output.DICT, config=config or None, timeout=timeout)
             confs = [int(c) for c in data.get("conf", []) if c not in ("-1", "-")]
             vals = [c for c in confs if c >= 0]
             if vals:
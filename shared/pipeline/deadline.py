@@ -0,0 +1,77 @@
+"""
+Per-job deadline budgets.
+
+The worker stamps `processing_jobs.deadline_at` when it starts a job, from
+the quality mode and cost class (see shared.queueing.routing), so time spent
+queued (e.g. behind a bulk backlog) does not count against it. Worker stages
+read the remaining budget and adapt: optional work is skipped, OCR timeouts
+shrink and fall back to budget settings (never below a minimum), and a
+"deadline_degraded" warning is recorded rather than overrunning.
+
+JOB_DEADLINE_BUDGETS overrides the defaults, e.g.
+`budget.light:120,recommended.heavy:3600`; `0` disables deadlines for that
+combination.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+import os
+
+
+DEGRADED_WARNING = "deadline_degraded"
+
+_DEFAULT_BUDGETS: Dict[Tuple[str, str], int] = {
+    ("budget", "light"): 120,
+    ("budget", "heavy"): 900,
+    ("recommended", "light"): 300,
+    ("recommended", "heavy"): 1800,
+}
+
+
+def _budgets() -> Dict[Tuple[str, str], int]:
+    out = dict(_DEFAULT_BUDGETS)
+    for part in (os.getenv("JOB_DEADLINE_BUDGETS") or "").split(","):
+        name, _, secs = part.strip().partition(":")
+        mode, _, cls = name.strip().lower().partition(".")
+        if not mode or not cls:
+            continue
+        try:
+            out[(mode, cls)] = max(0, int(secs))
+        except ValueError:
+            continue
+    return out
+
+
+def budget_seconds(quality_mode: Optional[str], cost_class: Optional[str]) -> int:
+    """End-to-end budget for a job; 0 means no deadline."""
+    key = ((quality_mode or "recommended").lower(), (cost_class or "light").lower())
+    return _budgets().get(key, 0)
+
+
+def deadline_for(quality_mode: Optional[str], cost_class: Optional[str], now: Optional[datetime] = None) -> Optional[datetime]:
+    secs = budget_seconds(quality_mode, cost_class)
+    if secs <= 0:
+        return None
+    return (now or datetime.utcnow()) + timedelta(seconds=secs)
+
+
+class Deadline:
+    """Remaining-time view of a job's deadline (UTC, naive like the DB columns).
+
+    `Deadline(None)` never expires, so stages can call it unconditionally.
+    """
+
+    def __init__(self, at: Optional[datetime]):
+        self.at = at
+
+    def remaining(self, now: Optional[datetime] = None) -> float:
+        if self.at is None:
+            return float("inf")
+        return (self.at - (now or datetime.utcnow())).total_seconds()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def clamp(self, seconds: float, reserve: float = 0.0) -> float:
+        """`seconds`, cut down to what is left after keeping `reserve` for later stages."""
+        return max(0.0, min(float(seconds), self.remaining() - reserve))
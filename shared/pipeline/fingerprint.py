@@ -0,0 +1,62 @@
+"""
+Pipeline fingerprints: identify "these bytes through this pipeline and config".
+
+fingerprint = sha256(bytes sha256 + PIPELINE_VERSION + canonical config JSON)
+
+A succeeded DocumentVersion records the fingerprint of the run that produced
+its artifacts. A later job with the same fingerprint (same tenant) reuses those
+artifacts instead of running OCR again.
+
+Bump PIPELINE_VERSION when processing output changes in code; operators can set
+PIPELINE_CONFIG_VERSION to invalidate all previous results without a release.
+"""
+
+from typing import Any, Dict, Optional
+import hashlib
+import json
+import os
+
+from shared.db import models
+
+
+PIPELINE_VERSION = "block0-2025.09"
+
+
+def compute_fingerprint(bytes_sha256: str, config: Dict[str, Any]) -> str:
+    payload = {
+        "sha256": bytes_sha256,
+        "pipeline": PIPELINE_VERSION,
+        "config_version": os.getenv("PIPELINE_CONFIG_VERSION", ""),
+        "config": config,
+    }
+    blob = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def dedupe_enabled() -> bool:
+    return os.getenv("DEDUPE_ENABLED", "true").lower() in {"1", "true", "yes", "on"}
+
+
+def dedupe_credit_price() -> int:
+    try:
+        return max(0, int(os.getenv("DEDUPE_CREDIT_PRICE", "1")))
+    except ValueError:
+        return 1
+
+
+def find_reusable_version(db, tenant_id, fingerprint: str) -> Optional[models.DocumentVersion]:
+    """Latest version of this tenant that finished with `fingerprint`, if any.
+
+    Scoped to the tenant: artifacts are never shared across tenants.
+    """
+    return (
+        db.query(models.DocumentVersion)
+        .join(models.Document, models.Document.id == models.DocumentVersion.document_id)
+        .filter(
+            models.Document.tenant_id == tenant_id,
+            models.DocumentVersion.fingerprint == fingerprint,
+            models.DocumentVersion.ocr_text_uri != None,  # noqa: E711
+        )
+        .order_by(models.DocumentVersion.id.desc())
+        .first()
+    )
@@ -0,0 +1,29 @@
+"""
+Current version of each worker pipeline stage.
+
+Kept here, free of heavy imports, so the API can tell which stages a reprocess
+will re-run by comparing against the versions recorded on a DocumentVersion.
+Bump a stage when its code changes what it produces.
+"""
+
+STAGE_VERSIONS = {
+    "normalize": "1",
+    "preview": "1",
+    "ocr": "1",
+    "quality": "1",
+}
+
+
+# Versions processed before stage records existed ran what is now version "1"
+# of every stage.
+LEGACY_VERSION = "1"
+
+
+def changed_stages(recorded) -> list:
+    """Stages whose current version differs from `recorded` ({name: {"version": ...}})."""
+    if not recorded:
+        recorded = {name: {"version": LEGACY_VERSION} for name in STAGE_VERSIONS}
+    return [
+        name for name, version in STAGE_VERSIONS.items()
+        if str((recorded.get(name) or {}).get("version")) != version
+    ]
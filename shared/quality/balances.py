@@ -0,0 +1,204 @@
+"""
+Materialized credit balances.
+
+`credit_balances` keeps running totals of the `credits` ledger per
+(tenant, user, reason): sum, entry count, and open estimates. A `before_flush`
+hook (installed on SessionLocal by shared.db.session) folds every new Credit
+row, and every estimate closed by flipping `is_estimate`, into those totals
+inside the same transaction, so balance reads touch a handful of rows instead
+of the tenant's whole history.
+
+`reconcile()` recomputes the totals from the ledger and repairs drift (e.g.
+rows written outside the ORM); the reaper runs it every
+CREDIT_RECONCILE_SECONDS.
+"""
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, func, inspect as sa_inspect
+from sqlalchemy import case
+from structlog import get_logger
+
+from shared.db import models
+
+log = get_logger()
+
+Key = Tuple[Any, int, str]
+# delta_sum, entries, open_estimates, open_estimate_sum
+FIELDS = ("delta_sum", "entries", "open_estimates", "open_estimate_sum")
+
+
+def _key(credit) -> Key:
+    return (credit.tenant_id, int(credit.user_id), str(credit.reason))
+
+
+def pending_changes(session) -> Dict[Key, List[int]]:
+    """Balance increments implied by the session's unflushed Credit changes."""
+    changes: Dict[Key, List[int]] = defaultdict(lambda: [0, 0, 0, 0])
+    for obj in session.new:
+        if isinstance(obj, models.Credit):
+            c = changes[_key(obj)]
+            delta = int(obj.delta or 0)
+            c[0] += delta
+            c[1] += 1
+            if obj.is_estimate:
+                c[2] += 1
+                c[3] += delta
+    for obj in session.dirty:
+        if not isinstance(obj, models.Credit):
+            continue
+        hist = sa_inspect(obj).attrs.is_estimate.history
+        if not hist.has_changes():
+            continue
+        was = bool(hist.deleted[0]) if hist.deleted else False
+        now = bool(obj.is_estimate)
+        if was != now:
+            c = changes[_key(obj)]
+            sign = 1 if now else -1
+            c[2] += sign
+            c[3] += sign * int(obj.delta or 0)
+    for obj in session.deleted:
+        if isinstance(obj, models.Credit):
+            c = changes[_key(obj)]
+            delta = int(obj.delta or 0)
+            c[0] -= delta
+            c[1] -= 1
+            if obj.is_estimate:
+                c[2] -= 1
+                c[3] -= delta
+    return {k: v for k, v in changes.items() if any(v)}
+
+
+def _upsert(connection, key: Key, inc: List[int]) -> None:
+    table = models.CreditBalance.__table__
+    values = dict(zip(("tenant_id", "user_id", "reason"), key))
+    values.update(dict(zip(FIELDS, inc)), updated_at=datetime.utcnow())
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["tenant_id", "user_id", "reason"],
+            set_={**{f: table.c[f] + stmt.excluded[f] for f in FIELDS}, "updated_at": stmt.excluded.updated_at},
+        )
+        connection.execute(stmt)
+        return
+    where = (table.c.tenant_id == key[0]) & (table.c.user_id == key[1]) & (table.c.reason == key[2])
+    res = connection.execute(
+        table.update().where(where).values(
+            **{f: table.c[f] + v for f, v in zip(FIELDS, inc)}, updated_at=values["updated_at"],
+        )
+    )
+    if not res.rowcount:
+        connection.execute(table.insert().values(**values))
+
+
+def _before_flush(session, flush_context, instances) -> None:
+    changes = pending_changes(session)
+    if not changes:
+        return
+    connection = session.connection()
+    # Fixed order so concurrent writers lock balance rows consistently
+    for key in sorted(changes, key=lambda k: (str(k[0]), k[1], k[2])):
+        _upsert(connection, key, changes[key])
+
+
+def track_balances(session_factory) -> None:
+    """Maintain credit_balances for sessions made by `session_factory`."""
+    if not event.contains(session_factory, "before_flush", _before_flush):
+        event.listen(session_factory, "before_flush", _before_flush)
+
+
+def balance(db, tenant_id, user_id: Optional[int] = None) -> Tuple[int, int]:
+    """(balance, ledger entries) of a tenant, or of one of its users."""
+    B = models.CreditBalance
+    q = db.query(func.coalesce(func.sum(B.delta_sum), 0), func.coalesce(func.sum(B.entries), 0)).filter(B.tenant_id == tenant_id)
+    if user_id is not None:
+        q = q.filter(B.user_id == user_id)
+    total, entries = q.one()
+    return int(total or 0), int(entries or 0)
+
+
+def summary(db, tenant_id) -> Dict[str, Any]:
+    """Total, per-reason totals and open estimates of a tenant."""
+    B = models.CreditBalance
+    rows = (
+        db.query(B.reason, func.sum(B.delta_sum), func.sum(B.open_estimates), func.sum(B.open_estimate_sum))
+        .filter(B.tenant_id == tenant_id)
+        .group_by(B.reason)
+        .all()
+    )
+    by_reason = {r: int(v or 0) for r, v, _, _ in rows}
+    return {
+        "total": sum(by_reason.values()),
+        "by_reason": by_reason,
+        "pending_estimates": {
+            "count": sum(int(n or 0) for _, _, n, _ in rows),
+            "sum": sum(int(s or 0) for _, _, _, s in rows),
+        },
+    }
+
+
+def _ledger_totals(db, key: Optional[Key] = None) -> Dict[Key, List[int]]:
+    C = models.Credit
+    q = db.query(
+        C.tenant_id, C.user_id, C.reason,
+        func.coalesce(func.sum(C.delta), 0),
+        func.count(C.id),
+        func.coalesce(func.sum(case((C.is_estimate == True, 1), else_=0)), 0),  # noqa: E712
+        func.coalesce(func.sum(case((C.is_estimate == True, C.delta), else_=0)), 0),  # noqa: E712
+    )
+    if key is not None:
+        q = q.filter(C.tenant_id == key[0], C.user_id == key[1], C.reason == key[2])
+    return {
+        (t, int(u), str(r)): [int(s), int(n), int(on), int(os_)]
+        for t, u, r, s, n, on, os_ in q.group_by(C.tenant_id, C.user_id, C.reason).all()
+    }
+
+
+def _stored(db, key: Optional[Key] = None, lock: bool = False) -> Dict[Key, Any]:
+    B = models.CreditBalance
+    q = db.query(B)
+    if key is not None:
+        q = q.filter(B.tenant_id == key[0], B.user_id == key[1], B.reason == key[2])
+    if lock:
+        q = q.with_for_update()
+    return {(b.tenant_id, int(b.user_id), str(b.reason)): b for b in q.all()}
+
+
+def reconcile(db, fix: bool = True) -> List[Dict[str, Any]]:
+    """Compare credit_balances with the ledger; returns the drifted keys and,
+    with `fix`, rewrites them from the ledger and commits.
+
+    A candidate is re-checked under a row lock on its balance row: writers
+    update that row before inserting their credits, so the ledger total read
+    while holding it is consistent."""
+    ledger = _ledger_totals(db)
+    stored = {k: [getattr(b, f) for f in FIELDS] for k, b in _stored(db).items()}
+    candidates = [k for k in set(ledger) | set(stored) if ledger.get(k, [0, 0, 0, 0]) != stored.get(k, [0, 0, 0, 0])]
+    drift: List[Dict[str, Any]] = []
+    for key in candidates:
+        row = _stored(db, key, lock=True).get(key)
+        want = _ledger_totals(db, key).get(key, [0, 0, 0, 0])
+        have = [getattr(row, f) for f in FIELDS] if row is not None else [0, 0, 0, 0]
+        if want == have:
+            db.rollback()
+            continue
+        drift.append({"tenant_id": str(key[0]), "user_id": key[1], "reason": key[2], "ledger": want, "balance": have})
+        log.warning("credit_balance_drift", tenant_id=str(key[0]), user_id=key[1], reason=key[2], ledger=want, balance=have)
+        if not fix:
+            db.rollback()
+            continue
+        if row is None:
+            row = models.CreditBalance(tenant_id=key[0], user_id=key[1], reason=key[2])
+            db.add(row)
+        for f, v in zip(FIELDS, want):
+            setattr(row, f, v)
+        row.updated_at = datetime.utcnow()
+        db.commit()
+    return drift
@@ -0,0 +1,65 @@
+"""
+Credit ledger helpers shared by the worker and maintenance jobs.
+"""
+
+from shared.db import models
+
+
+def refund_estimate(db, job_id, reason: str) -> bool:
+    """Credit back the open estimate row of a job and close it.
+
+    Adds the refund row and flips `is_estimate` but does not commit. Returns
+    False when the job has no open estimate (already finalized or refunded).
+    """
+    estimate_credit = (
+        db.query(models.Credit)
+        .filter(models.Credit.job_id == job_id, models.Credit.is_estimate == True)  # noqa: E712
+        .first()
+    )
+    if not estimate_credit:
+        return False
+    db.add(models.Credit(
+        tenant_id=estimate_credit.tenant_id,
+        user_id=estimate_credit.user_id,
+        delta=+abs(estimate_credit.delta),
+        reason=reason,
+        job_id=job_id,
+        is_estimate=False,
+    ))
+    estimate_credit.is_estimate = False
+    return True
+
+
+def settle_estimate(db, job_id, actual: int, reason: str = "actual") -> bool:
+    """Replace a job's open estimate with the actual charge.
+
+    Adds an `estimate_reversal` row and, when `actual` > 0, a charge row with
+    `reason`; closes the estimate. Does not commit. Returns False when there
+    is no open estimate.
+    """
+    estimate_credit = (
+        db.query(models.Credit)
+        .filter(models.Credit.job_id == job_id, models.Credit.is_estimate == True)  # noqa: E712
+        .first()
+    )
+    if not estimate_credit:
+        return False
+    db.add(models.Credit(
+        tenant_id=estimate_credit.tenant_id,
+        user_id=estimate_credit.user_id,
+        delta=+abs(estimate_credit.delta),
+        reason="estimate_reversal",
+        job_id=job_id,
+        is_estimate=False,
+    ))
+    if int(actual) > 0:
+        db.add(models.Credit(
+            tenant_id=estimate_credit.tenant_id,
+            user_id=estimate_credit.user_id,
+            delta=-abs(int(actual)),
+            reason=reason,
+            job_id=job_id,
+            is_estimate=False,
+        ))
+    estimate_credit.is_estimate = False
+    return True
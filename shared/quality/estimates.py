@@ -0,0 +1,35 @@
+"""
+Credit estimates for jobs.
+
+Plain arithmetic on mime, size and page count with no imports, so the API
+can price uploads without loading the image/PDF analysis stack in
+shared.quality.metrics.
+"""
+
+
+def estimate_credits(mime: str, size_bytes: int) -> int:
+    """Size-based rough estimate used pre-processing."""
+    mb = max(1, int((size_bytes + 1_000_000 - 1) / 1_000_000))
+    base = 10 * mb
+    if (mime or "").lower().startswith("image/"):
+        base += 5
+    return max(1, int(base))
+
+
+def estimate_actual_credits(mime: str, size_bytes: int, metrics: dict | None) -> int:
+    """
+    Minimal actualization heuristic for Block 0:
+    - Prefer page_count if present: 8 credits/page for PDFs; 10/page for images.
+    - Fallback to size-based estimate_credits.
+    """
+    try:
+        if isinstance(metrics, dict):
+            pc = metrics.get("page_count")
+            if isinstance(pc, int) and pc > 0:
+                if (mime or "").lower() == "application/pdf":
+                    return max(1, int(8 * pc))
+                if (mime or "").lower().startswith("image/"):
+                    return max(1, int(10 * pc))
+    except Exception:
+        pass
+    return estimate_credits(mime or "application/octet-stream", size_bytes)
@@ -5,6 +5,9 @@ from langdetect import detect_langs
 from pypdf import PdfReader
 import io
 
+# Credit estimates moved to a dependency-free module; re-exported for callers
+from shared.quality.estimates import estimate_actual_credits, estimate_credits  # noqa: F401
+
 
 def _variance_of_laplacian(gray: np.ndarray) -> float:
     return float(cv2.Laplacian(gray, cv2.CV_64F).var())
@@ -98,31 +101,3 @@ def compute_metrics_and_warnings(mime: str, original_bytes: Optional[bytes], ocr
     metrics["ocr_ok"] = bool(text_len >= 20)
 
     return metrics, warnings
-
-
-def estimate_credits(mime: str, size_bytes: int) -> int:
-    """Size-based rough estimate used pre-processing."""
-    mb = max(1, int((size_bytes + 1_000_000 - 1) / 1_000_000))
-    base = 10 * mb
-    if (mime or "").lower().startswith("image/"):
-        base += 5
-    return max(1, int(base))
-
-
-def estimate_actual_credits(mime: str, size_bytes: int, metrics: dict | None) -> int:
-    """
-    Minimal actualization heuristic for Block 0:
-    - Prefer page_count if present: 8 credits/page for PDFs; 10/page for images.
-    - Fallback to size-based estimate_credits.
-    """
-    try:
-        if isinstance(metrics, dict):
-            pc = metrics.get("page_count")
-            if isinstance(pc, int) and pc > 0:
-                if (mime or "").lower() == "application/pdf":
-                    return max(1, int(8 * pc))
-                if (mime or "").lower().startswith("image/"):
-                    return max(1, int(10 * pc))
-    except Exception:
-        pass
-    return estimate_credits(mime or "application/octet-stream", size_bytes)
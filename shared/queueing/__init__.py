@@ -0,0 +1 @@
+# queueing package
@@ -0,0 +1,91 @@
+"""
+Thin enqueue client for processing jobs.
+
+Publishes the `process_document` task by name (`send_task`) on a bare Celery
+app, so the API and scripts never import the worker module, its task
+definitions or its OCR dependencies. The worker, reaper and dispatcher use the
+same functions.
+"""
+
+from typing import Any, Dict, Iterable, Optional
+import os
+import time
+
+from shared.queueing.fairshare import fairshare_enabled, scheduler_from_env
+from shared.queueing.lanes import DEFAULT_LANE, LANES, queue_name
+from shared.tracing.spans import span, trace_context
+
+
+PROCESS_DOCUMENT_TASK = "process_document"
+
+_celery_client = None
+_fairshare_scheduler = None
+
+
+def celery_client():
+    """Producer-only Celery app on the worker's broker (no task registry, no results)."""
+    global _celery_client
+    if _celery_client is None:
+        from celery import Celery
+
+        _celery_client = Celery("block0-client")
+        _celery_client.conf.broker_url = os.getenv("CELERY_BROKER_URL", os.getenv("REDIS_URL", "redis://redis:6379/0"))
+        _celery_client.conf.task_ignore_result = True
+    return _celery_client
+
+
+def fairshare():
+    global _fairshare_scheduler
+    if _fairshare_scheduler is None:
+        _fairshare_scheduler = scheduler_from_env()
+    return _fairshare_scheduler
+
+
+def publish_process_document(
+    job_id: str, lane: Optional[str] = None, cost_class: Optional[str] = None, producer=None, **kwargs,
+) -> None:
+    """Publish straight to the lane/cost-class Celery queue (bypasses fair-share).
+    `producer` reuses an acquired broker connection (see enqueue_many)."""
+    celery_client().send_task(
+        PROCESS_DOCUMENT_TASK,
+        args=[job_id],
+        kwargs={"enqueued_at": time.time(), **kwargs},
+        queue=queue_name(lane, cost_class),
+        producer=producer,
+    )
+
+
+def enqueue_process_document(
+    job_id: str,
+    lane: Optional[str] = None,
+    tenant_id: Optional[str] = None,
+    cost_class: Optional[str] = None,
+) -> None:
+    """Enqueue a job. With FAIRSHARE_ENABLED the job goes to the tenant's
+    sub-queue and the dispatcher publishes it; otherwise straight to Celery."""
+    lane = lane if lane in LANES else DEFAULT_LANE
+    # The task continues the caller's trace (and request id), see shared.tracing.spans
+    with span("enqueue", job_id=job_id, lane=lane, cost_class=cost_class):
+        if tenant_id and fairshare_enabled():
+            fairshare().submit(str(tenant_id), job_id, lane, cost_class=cost_class, trace=trace_context())
+            return
+        publish_process_document(job_id, lane, cost_class, **trace_context())
+
+
+def enqueue_many(jobs: Iterable[Dict[str, Any]]) -> None:
+    """Enqueue several jobs, each {job_id, lane, tenant_id, cost_class}, like
+    enqueue_process_document; direct publishes share one broker connection."""
+    jobs = list(jobs)
+    with span("enqueue_many", jobs=len(jobs)):
+        trace = trace_context()
+        direct = []
+        for j in jobs:
+            lane = j.get("lane") if j.get("lane") in LANES else DEFAULT_LANE
+            if j.get("tenant_id") and fairshare_enabled():
+                fairshare().submit(str(j["tenant_id"]), j["job_id"], lane, cost_class=j.get("cost_class"), trace=trace)
+            else:
+                direct.append((j["job_id"], lane, j.get("cost_class")))
+        if direct:
+            with celery_client().producer_or_acquire() as producer:
+                for job_id, lane, cost_class in direct:
+                    publish_process_document(job_id, lane, cost_class, producer=producer, **trace)
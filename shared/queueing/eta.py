@@ -0,0 +1,378 @@
+"""
+Job duration prediction and ETAs.
+
+A small linear model predicts a job's run time (started_at -> finished_at)
+from the features known at enqueue, recorded on `ProcessingJob.features`:
+mime, size, page estimate, quality mode and OCR language set. It is fitted by
+ridge least squares on recent succeeded jobs (`refit`, run periodically by the
+reaper every ETA_REFIT_SECONDS) and stored as JSON in Redis, so the API and
+every process share one model. Until a model is fitted DEFAULT_MODEL is used.
+
+ETAs combine the prediction with the lane backlog: queued work ahead of a job
+(predicted durations summed in SQL per mime and quality mode) divided by the lane's observed concurrency (busy
+worker-seconds over the last ETA_THROUGHPUT_WINDOW_SECONDS, or ETA_WORKER_SLOTS
+when nothing finished recently). The reaper publishes per-lane backlogs to
+Redis every ETA_BACKLOG_SECONDS, and the API's /metrics reads them from
+there, so scrapes never query the database.
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import json
+import math
+import os
+import time
+
+from shared.queueing.lanes import LANES
+
+
+MODEL_KEY = "eta:model"
+BACKLOG_KEY = "eta:backlog"
+
+FEATURE_NAMES = (
+    "intercept",
+    "pages",
+    "recommended_pages",
+    "log_size_mb",
+    "is_pdf",
+    "is_image",
+    "extra_languages",
+)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def ocr_languages() -> List[str]:
+    """OCR language set as configured for the worker (OCR_LANG, comma or plus separated)."""
+    cfg = os.getenv("OCR_LANG", "eng") or "eng"
+    return [p.strip() for p in cfg.replace("+", ",").split(",") if p.strip()]
+
+
+def job_features(
+    mime: Optional[str],
+    size_bytes: int,
+    pages: Optional[int],
+    quality_mode: Optional[str],
+    languages: Optional[Sequence[str]] = None,
+) -> Dict[str, Any]:
+    """Enqueue-time features stored on the job (JSON-serializable)."""
+    return {
+        "mime": (mime or "").lower(),
+        "size_bytes": max(0, int(size_bytes or 0)),
+        "pages": max(1, int(pages or 1)),
+        "quality_mode": (quality_mode or "recommended").lower(),
+        "languages": list(languages if languages is not None else ocr_languages()),
+    }
+
+
+def vectorize(features: Dict[str, Any]) -> List[float]:
+    mime = str(features.get("mime") or "").lower()
+    pages = float(max(1, int(features.get("pages") or 1)))
+    size_mb = max(0, int(features.get("size_bytes") or 0)) / 1_000_000
+    recommended = (features.get("quality_mode") or "recommended") != "budget"
+    langs = features.get("languages") or []
+    return [
+        1.0,
+        pages,
+        pages if recommended else 0.0,
+        math.log1p(size_mb),
+        1.0 if mime == "application/pdf" else 0.0,
+        1.0 if mime.startswith("image/") else 0.0,
+        float(max(0, len(langs) - 1)),
+    ]
+
+
+@dataclass
+class DurationModel:
+    coef: List[float]
+    samples: int = 0
+    rmse: Optional[float] = None
+    fitted_at: Optional[str] = None
+    names: Tuple[str, ...] = field(default=FEATURE_NAMES)
+
+    def predict(self, features: Dict[str, Any]) -> float:
+        x = vectorize(features)
+        y = sum(c * v for c, v in zip(self.coef, x))
+        return max(_env_float("ETA_MIN_SECONDS", 1.0), y)
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {"names": list(self.names), "coef": self.coef, "samples": self.samples, "rmse": self.rmse, "fitted_at": self.fitted_at}
+        )
+
+    @classmethod
+    def from_json(cls, data) -> Optional["DurationModel"]:
+        try:
+            d = json.loads(data)
+        except Exception:
+            return None
+        # A model fitted for another feature set is unusable
+        if tuple(d.get("names") or ()) != FEATURE_NAMES or len(d.get("coef") or []) != len(FEATURE_NAMES):
+            return None
+        return cls(coef=[float(c) for c in d["coef"]], samples=int(d.get("samples") or 0), rmse=d.get("rmse"), fitted_at=d.get("fitted_at"))
+
+
+# Rough hand-set prior: ~5s overhead plus ~3s per page, doubled for recommended mode
+DEFAULT_MODEL = DurationModel(coef=[5.0, 3.0, 3.0, 1.0, 0.0, 2.0, 1.0])
+
+
+def _solve(a: List[List[float]], b: List[float]) -> List[float]:
+    """Solve a x = b by Gaussian elimination with partial pivoting."""
+    n = len(b)
+    m = [row[:] + [b[i]] for i, row in enumerate(a)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(m[r][col]))
+        if abs(m[pivot][col]) < 1e-12:
+            raise ValueError("singular system")
+        m[col], m[pivot] = m[pivot], m[col]
+        for r in range(n):
+            if r != col:
+                f = m[r][col] / m[col][col]
+                if f:
+                    for c in range(col, n + 1):
+                        m[r][c] -= f * m[col][c]
+    return [m[i][n] / m[i][i] for i in range(n)]
+
+
+def fit(samples: Iterable[Tuple[Dict[str, Any], float]], ridge: Optional[float] = None) -> Optional[DurationModel]:
+    """Ridge least-squares fit over (features, duration_seconds) pairs.
+
+    The penalty (ETA_RIDGE, default 1.0) keeps the system solvable when a
+    feature never varies (e.g. a single language set); the intercept is not
+    penalized. Returns None with fewer than ETA_MIN_SAMPLES (default 20) rows.
+    """
+    ridge = _env_float("ETA_RIDGE", 1.0) if ridge is None else ridge
+    rows = [(vectorize(f), float(y)) for f, y in samples if y is not None and y >= 0]
+    if len(rows) < max(1, int(_env_float("ETA_MIN_SAMPLES", 20))):
+        return None
+    k = len(FEATURE_NAMES)
+    xtx = [[0.0] * k for _ in range(k)]
+    xty = [0.0] * k
+    for x, y in rows:
+        for i in range(k):
+            xty[i] += x[i] * y
+            for j in range(k):
+                xtx[i][j] += x[i] * x[j]
+    for i in range(1, k):
+        xtx[i][i] += ridge
+    try:
+        coef = _solve(xtx, xty)
+    except ValueError:
+        return None
+    model = DurationModel(coef=coef, samples=len(rows))
+    err = sum((sum(c * v for c, v in zip(coef, x)) - y) ** 2 for x, y in rows)
+    model.rmse = math.sqrt(err / len(rows))
+    model.fitted_at = datetime.utcnow().isoformat()
+    return model
+
+
+def features_of(job) -> Dict[str, Any]:
+    """Stored features, or what the routing columns tell us for older jobs."""
+    feats = getattr(job, "features", None)
+    if isinstance(feats, dict) and feats:
+        return feats
+    return job_features(None, 0, getattr(job, "est_pages", None), getattr(job, "quality_mode", None))
+
+
+def training_samples(db, limit: Optional[int] = None) -> List[Tuple[Dict[str, Any], float]]:
+    """Most recent succeeded jobs as (features, run seconds)."""
+    from shared.db import models
+    from shared.db.models import ProcessingStatus
+
+    limit = limit or int(_env_float("ETA_TRAIN_LIMIT", 5000))
+    J = models.ProcessingJob
+    rows = (
+        db.query(J)
+        .filter(J.status == ProcessingStatus.succeeded, J.started_at.isnot(None), J.finished_at.isnot(None))
+        .order_by(J.finished_at.desc())
+        .limit(limit)
+        .all()
+    )
+    return [(features_of(j), (j.finished_at - j.started_at).total_seconds()) for j in rows]
+
+
+def save_model(client, model: DurationModel) -> None:
+    client.set(MODEL_KEY, model.to_json())
+
+
+def load_model(client) -> Optional[DurationModel]:
+    raw = client.get(MODEL_KEY)
+    return DurationModel.from_json(raw) if raw else None
+
+
+def refit(db, client) -> Optional[DurationModel]:
+    """Fit on recent history and publish; keeps the previous model when there is too little data."""
+    model = fit(training_samples(db))
+    if model is not None:
+        save_model(client, model)
+    return model
+
+
+def redis_client():
+    import redis as redis_lib
+
+    return redis_lib.from_url(os.getenv("REDIS_URL", "redis://redis:6379/0"))
+
+
+_cached: Tuple[float, DurationModel] = (0.0, DEFAULT_MODEL)
+
+
+def current_model(client=None) -> DurationModel:
+    """Published model, cached per process for ETA_MODEL_CACHE_SECONDS (60); DEFAULT_MODEL on errors."""
+    global _cached
+    loaded_at, model = _cached
+    if time.monotonic() - loaded_at < _env_float("ETA_MODEL_CACHE_SECONDS", 60) and loaded_at:
+        return model
+    try:
+        model = load_model(client or redis_client()) or DEFAULT_MODEL
+    except Exception:
+        model = DEFAULT_MODEL
+    _cached = (time.monotonic(), model)
+    return model
+
+
+def concurrency(busy_seconds: float, window_seconds: float) -> float:
+    """Average number of busy workers over the window (ETA_WORKER_SLOTS when idle)."""
+    if busy_seconds > 0 and window_seconds > 0:
+        return max(1.0, busy_seconds / window_seconds)
+    return max(1.0, _env_float("ETA_WORKER_SLOTS", 1))
+
+
+def remaining_seconds(model: DurationModel, job, work_ahead: float, slots: float, now: Optional[datetime] = None) -> Optional[float]:
+    """Seconds until `job` is expected to finish; None once it has finished."""
+    status = getattr(getattr(job, "status", None), "value", getattr(job, "status", None))
+    if status not in {"queued", "running"}:
+        return None
+    now = now or datetime.utcnow()
+    duration = model.predict(features_of(job))
+    if status == "running" and getattr(job, "started_at", None):
+        # Overdue jobs are "any moment now", not negative
+        return max(0.0, (job.started_at - now).total_seconds() + duration)
+    return work_ahead / max(1.0, slots) + duration
+
+
+def group_work(model: DurationModel, count: int, mime: Optional[str], quality_mode: Optional[str], pages: float, size_bytes: float) -> float:
+    """Predicted work-seconds of `count` jobs sharing mime and quality mode,
+    from their summed pages and sizes.
+
+    The model is linear in every feature except the size, which enters as
+    log1p(MB); it is taken at the group's mean size. Languages are the
+    configured OCR set (what enqueue records). The ETA_MIN_SECONDS floor
+    applies per group rather than per job."""
+    if count <= 0:
+        return 0.0
+    mime = (mime or "").lower()
+    recommended = (quality_mode or "recommended").lower() != "budget"
+    x = [
+        float(count),
+        float(pages),
+        float(pages) if recommended else 0.0,
+        count * math.log1p(max(0.0, float(size_bytes)) / count / 1_000_000),
+        float(count) if mime == "application/pdf" else 0.0,
+        float(count) if mime.startswith("image/") else 0.0,
+        count * float(max(0, len(ocr_languages()) - 1)),
+    ]
+    y = sum(c * v for c, v in zip(model.coef, x))
+    return max(count * _env_float("ETA_MIN_SECONDS", 1.0), y)
+
+
+def _busy_seconds(db, J, since: datetime, now: datetime):
+    """SQL expression for a job's run time inside [since, now], in seconds."""
+    from sqlalchemy import DateTime, func, literal
+
+    since, now = literal(since, DateTime()), literal(now, DateTime())
+    if db.get_bind().dialect.name == "postgresql":
+        return func.extract("epoch", func.least(J.finished_at, now) - func.greatest(J.started_at, since))
+    # SQLite: scalar min/max and julian days
+    return (func.julianday(func.min(J.finished_at, now)) - func.julianday(func.max(J.started_at, since))) * 86400.0
+
+
+def lane_load(db, lane: Optional[str], model: DurationModel, before: Optional[datetime] = None, now: Optional[datetime] = None) -> Tuple[float, float]:
+    """(predicted work-seconds queued in the lane, observed concurrency).
+
+    `before` limits the backlog to jobs created earlier (a job's place in line).
+    Queued jobs are summed in SQL, grouped by mime and quality mode
+    (`group_work`), so the cost does not grow with the backlog. Running jobs,
+    at most one per worker slot, count with their expected remaining time.
+    Busy time over the throughput window is a single SUM.
+    """
+    from sqlalchemy import func
+    from shared.db import models
+    from shared.db.models import ProcessingStatus
+
+    now = now or datetime.utcnow()
+    J = models.ProcessingJob
+    F = J.features
+    mime = func.lower(func.coalesce(F["mime"].as_string(), ""))
+    mode = func.lower(func.coalesce(F["quality_mode"].as_string(), J.quality_mode, "recommended"))
+    pages = func.coalesce(F["pages"].as_integer(), J.est_pages, 1)
+    size = func.coalesce(F["size_bytes"].as_integer(), 0)
+    q = (
+        db.query(mime, mode, func.count(J.id), func.sum(pages), func.sum(size))
+        .filter(J.status == ProcessingStatus.queued, J.lane == lane)
+    )
+    if before is not None:
+        q = q.filter(J.created_at < before)
+    work = 0.0
+    for g_mime, g_mode, count, pages_sum, size_sum in q.group_by(mime, mode).all():
+        work += group_work(model, int(count or 0), g_mime, g_mode, float(pages_sum or 0), float(size_sum or 0))
+    running = db.query(J).filter(J.status == ProcessingStatus.running, J.lane == lane)
+    if before is not None:
+        running = running.filter(J.created_at < before)
+    for j in running.limit(int(_env_float("ETA_RUNNING_SCAN_LIMIT", 1000))).all():
+        work += remaining_seconds(model, j, 0.0, 1.0, now=now) or 0.0
+
+    window = _env_float("ETA_THROUGHPUT_WINDOW_SECONDS", 600)
+    since = now - timedelta(seconds=window)
+    busy = (
+        db.query(func.coalesce(func.sum(_busy_seconds(db, J, since, now)), 0))
+        .filter(J.lane == lane, J.finished_at >= since, J.started_at.isnot(None), J.started_at <= J.finished_at)
+        .scalar()
+    )
+    return work, concurrency(max(0.0, float(busy or 0)), window)
+
+
+def job_eta(db, job, model: Optional[DurationModel] = None, now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+    """ETA block for GET /v0/jobs/{id}: {eta_seconds, eta_at, predicted_seconds}."""
+    model = model or current_model()
+    now = now or datetime.utcnow()
+    status = getattr(job.status, "value", job.status)
+    if status not in {"queued", "running"}:
+        return None
+    work, slots = (0.0, 1.0)
+    if status == "queued":
+        work, slots = lane_load(db, getattr(job, "lane", None), model, before=job.created_at, now=now)
+    secs = remaining_seconds(model, job, work, slots, now=now)
+    return {
+        "eta_seconds": int(round(secs)),
+        "eta_at": (now + timedelta(seconds=secs)).isoformat(),
+        "predicted_seconds": int(round(model.predict(features_of(job)))),
+    }
+
+
+def lane_backlogs(db, model: DurationModel) -> Dict[str, float]:
+    """Seconds of queued work per lane at observed concurrency (queue_backlog_seconds)."""
+    out: Dict[str, float] = {}
+    for lane in LANES:
+        work, slots = lane_load(db, lane, model)
+        out[lane] = work / slots
+    return out
+
+
+def publish_backlogs(db, client, ttl: float) -> Dict[str, float]:
+    """Compute lane backlogs and store them in Redis for the API's /metrics.
+    They expire after `ttl` seconds, so a stopped reaper leaves no stale values."""
+    backlogs = lane_backlogs(db, current_model(client))
+    client.set(BACKLOG_KEY, json.dumps(backlogs), ex=max(1, int(ttl)))
+    return backlogs
+
+
+def load_backlogs(client) -> Dict[str, float]:
+    raw = client.get(BACKLOG_KEY)
+    return {lane: float(v) for lane, v in json.loads(raw).items()} if raw else {}
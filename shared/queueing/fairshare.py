@@ -0,0 +1,345 @@
+"""
+Tenant fair-share scheduling in front of process_document.
+
+Instead of publishing straight to Celery (strict FIFO across tenants), the API
+submits jobs into per-tenant sub-queues, one per broker queue (lane and cost
+class), so a tenant's interactive upload never waits behind its own bulk
+backlog. A single dispatcher process (apps/block0_worker/dispatcher.py) tops
+each broker queue up separately and drains the sub-queues feeding it with
+deficit round-robin (DRR): each visit credits a tenant `quantum * weight`, and
+the tenant may dispatch jobs while its deficit covers their cost. With unit
+cost this is weighted round-robin; one tenant's 10k-file backlog no longer
+starves everyone else.
+
+Optional per-tenant concurrency caps bound how many of a tenant's jobs are in
+flight (dispatched but not finished). Each in-flight job holds a slot keyed by
+its job id; the worker releases it when the job ends (releasing twice is
+harmless). Slots of jobs that never start (lost or purged broker messages)
+would otherwise be held forever, so the reaper calls `reconcile()`, which
+drops slots whose job has finished, is gone, or is still queued after
+FAIRSHARE_SLOT_TTL_SECONDS.
+
+Two stores share one interface: `RedisFairShareStore` for deployments and
+`InMemoryFairShareStore` for tests and local experiments.
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+import json
+import os
+import time
+
+from shared.queueing.lanes import BULK, COST_CLASSES, INTERACTIVE, REPROCESS, queue_name
+
+
+# Broker queues in the order the dispatcher fills them: lanes by priority,
+# light before heavy. Tenant caps are shared across queues, so a capped
+# tenant's next slot goes to its interactive work before its bulk backlog.
+DISPATCH_ORDER = [queue_name(lane, c) for lane in (INTERACTIVE, REPROCESS, BULK) for c in COST_CLASSES]
+
+
+def parse_int_map(spec: Optional[str]) -> Dict[str, int]:
+    """Parse `name:int,...` (FAIRSHARE_TENANT_WEIGHTS, FAIRSHARE_TARGET_DEPTHS)."""
+    out: Dict[str, int] = {}
+    for part in (spec or "").split(","):
+        tenant, _, val = part.strip().rpartition(":")
+        if not tenant:
+            continue
+        try:
+            out[tenant.strip()] = max(0, int(val))
+        except ValueError:
+            continue
+    return out
+
+
+def fairshare_enabled() -> bool:
+    return os.getenv("FAIRSHARE_ENABLED", "0").lower() in {"1", "true", "yes", "on"}
+
+
+class InMemoryFairShareStore:
+    def __init__(self):
+        self.queues: Dict[Tuple[str, str], List[dict]] = {}
+        self.rings: Dict[str, List[str]] = {}
+        self.deficits: Dict[Tuple[str, str], int] = {}
+        self.inflights: Dict[str, Dict[str, float]] = {}
+
+    def enqueue(self, queue: str, tenant: str, item: dict) -> None:
+        self.queues.setdefault((queue, tenant), []).append(item)
+        ring = self.rings.setdefault(queue, [])
+        if tenant not in ring:
+            ring.append(tenant)
+
+    def dequeue(self, queue: str, tenant: str) -> Optional[dict]:
+        q = self.queues.get((queue, tenant)) or []
+        return q.pop(0) if q else None
+
+    def peek(self, queue: str, tenant: str) -> Optional[dict]:
+        q = self.queues.get((queue, tenant)) or []
+        return q[0] if q else None
+
+    def backlog(self, queue: str, tenant: str) -> int:
+        return len(self.queues.get((queue, tenant)) or [])
+
+    def tenants(self, queue: str) -> List[str]:
+        return list(self.rings.get(queue) or [])
+
+    def rotate(self, queue: str) -> None:
+        ring = self.rings.get(queue)
+        if ring:
+            ring.append(ring.pop(0))
+
+    def deactivate(self, queue: str, tenant: str) -> None:
+        ring = self.rings.get(queue) or []
+        if tenant in ring and not self.backlog(queue, tenant):
+            ring.remove(tenant)
+
+    def get_deficit(self, queue: str, tenant: str) -> int:
+        return self.deficits.get((queue, tenant), 0)
+
+    def set_deficit(self, queue: str, tenant: str, value: int) -> None:
+        self.deficits[(queue, tenant)] = value
+
+    def inflight(self, tenant: str) -> int:
+        return len(self.inflights.get(tenant) or {})
+
+    def add_slot(self, tenant: str, job_id: str, at: float) -> None:
+        self.inflights.setdefault(tenant, {})[job_id] = at
+
+    def remove_slot(self, tenant: str, job_id: Optional[str] = None) -> None:
+        slots = self.inflights.get(tenant) or {}
+        if job_id is None and slots:
+            job_id = min(slots, key=slots.get)
+        slots.pop(job_id, None)
+
+    def slots(self, tenant: str) -> Dict[str, float]:
+        return dict(self.inflights.get(tenant) or {})
+
+    def slotted_tenants(self) -> List[str]:
+        return [t for t, slots in self.inflights.items() if slots]
+
+
+class RedisFairShareStore:
+    """Redis layout (prefix `fs:`), per broker queue `<queue>` (e.g.
+    `bulk.heavy`): `q:<queue>:<tenant>` list of JSON items, `active:<queue>`
+    set + `ring:<queue>` list of tenants with backlog, `deficit:<queue>`
+    hash; per tenant `slots:<tenant>` sorted set of in-flight job ids scored
+    by dispatch time (`slotted` set of tenants holding any). Needs Redis >=
+    6.2 (LMOVE).
+
+    Assumes a single dispatcher pops; API processes only push.
+    """
+
+    def __init__(self, client, prefix: str = "fs:"):
+        self.r = client
+        self.p = prefix
+
+    def _q(self, queue: str, tenant: str) -> str:
+        return f"{self.p}q:{queue}:{tenant}"
+
+    def _activate(self, queue: str, tenant: str) -> None:
+        if self.r.sadd(f"{self.p}active:{queue}", tenant):
+            self.r.rpush(f"{self.p}ring:{queue}", tenant)
+
+    def enqueue(self, queue: str, tenant: str, item: dict) -> None:
+        # Push before activating so a concurrent deactivate() re-check sees the item
+        self.r.rpush(self._q(queue, tenant), json.dumps(item))
+        self._activate(queue, tenant)
+
+    def dequeue(self, queue: str, tenant: str) -> Optional[dict]:
+        raw = self.r.lpop(self._q(queue, tenant))
+        return json.loads(raw) if raw else None
+
+    def peek(self, queue: str, tenant: str) -> Optional[dict]:
+        raw = self.r.lindex(self._q(queue, tenant), 0)
+        return json.loads(raw) if raw else None
+
+    def backlog(self, queue: str, tenant: str) -> int:
+        return int(self.r.llen(self._q(queue, tenant)) or 0)
+
+    def tenants(self, queue: str) -> List[str]:
+        return [t.decode() if isinstance(t, bytes) else t for t in self.r.lrange(f"{self.p}ring:{queue}", 0, -1)]
+
+    def rotate(self, queue: str) -> None:
+        self.r.lmove(f"{self.p}ring:{queue}", f"{self.p}ring:{queue}", "LEFT", "RIGHT")
+
+    def deactivate(self, queue: str, tenant: str) -> None:
+        self.r.srem(f"{self.p}active:{queue}", tenant)
+        self.r.lrem(f"{self.p}ring:{queue}", 0, tenant)
+        if self.backlog(queue, tenant):
+            self._activate(queue, tenant)
+
+    def get_deficit(self, queue: str, tenant: str) -> int:
+        return int(self.r.hget(f"{self.p}deficit:{queue}", tenant) or 0)
+
+    def set_deficit(self, queue: str, tenant: str, value: int) -> None:
+        self.r.hset(f"{self.p}deficit:{queue}", tenant, int(value))
+
+    def _slots(self, tenant: str) -> str:
+        return f"{self.p}slots:{tenant}"
+
+    def inflight(self, tenant: str) -> int:
+        return int(self.r.zcard(self._slots(tenant)) or 0)
+
+    def add_slot(self, tenant: str, job_id: str, at: float) -> None:
+        self.r.zadd(self._slots(tenant), {job_id: at})
+        self.r.sadd(f"{self.p}slotted", tenant)
+
+    def remove_slot(self, tenant: str, job_id: Optional[str] = None) -> None:
+        if job_id is None:
+            self.r.zpopmin(self._slots(tenant))
+        else:
+            self.r.zrem(self._slots(tenant), job_id)
+
+    def slots(self, tenant: str) -> Dict[str, float]:
+        return {
+            (j.decode() if isinstance(j, bytes) else j): float(at)
+            for j, at in self.r.zrange(self._slots(tenant), 0, -1, withscores=True)
+        }
+
+    def slotted_tenants(self) -> List[str]:
+        out = []
+        for t in self.r.smembers(f"{self.p}slotted"):
+            t = t.decode() if isinstance(t, bytes) else t
+            if self.inflight(t):
+                out.append(t)
+            else:
+                self.r.srem(f"{self.p}slotted", t)
+        return out
+
+
+class FairShareScheduler:
+    def __init__(
+        self,
+        store,
+        weights: Optional[Dict[str, int]] = None,
+        caps: Optional[Dict[str, int]] = None,
+        default_cap: int = 0,
+        quantum: int = 1,
+    ):
+        self.store = store
+        self.weights = weights or {}
+        self.caps = caps or {}
+        self.default_cap = max(0, int(default_cap))
+        self.quantum = max(1, int(quantum))
+
+    @classmethod
+    def from_env(cls, store) -> "FairShareScheduler":
+        return cls(
+            store,
+            weights=parse_int_map(os.getenv("FAIRSHARE_TENANT_WEIGHTS")),
+            caps=parse_int_map(os.getenv("FAIRSHARE_TENANT_CAPS")),
+            default_cap=int(os.getenv("FAIRSHARE_DEFAULT_CAP", "0") or 0),
+            quantum=int(os.getenv("FAIRSHARE_QUANTUM", "1") or 1),
+        )
+
+    def _cap(self, tenant: str) -> int:
+        return self.caps.get(tenant, self.default_cap)
+
+    def _capped(self, tenant: str) -> bool:
+        cap = self._cap(tenant)
+        return cap > 0 and self.store.inflight(tenant) >= cap
+
+    def submit(
+        self,
+        tenant_id: str,
+        job_id: str,
+        lane: str,
+        cost: int = 1,
+        cost_class: Optional[str] = None,
+        trace: Optional[Dict[str, str]] = None,
+    ) -> None:
+        self.store.enqueue(queue_name(lane, cost_class), str(tenant_id), {
+            "job_id": job_id,
+            "lane": lane,
+            "cost_class": cost_class,
+            "tenant_id": str(tenant_id),
+            "cost": max(1, int(cost)),
+            "submitted_at": time.time(),
+            # Trace context handed to the task when the dispatcher publishes it
+            "trace": dict(trace or {}),
+        })
+
+    def release(self, tenant_id: str, job_id: Optional[str] = None) -> None:
+        """Free the slot held by `job_id` (idempotent); without a job id, the
+        tenant's oldest slot."""
+        self.store.remove_slot(str(tenant_id), str(job_id) if job_id is not None else None)
+
+    def reconcile(self, job_states: Callable[[List[str]], Dict[str, Optional[str]]], now: Optional[float] = None, ttl: Optional[float] = None) -> int:
+        """Drop slots that no job holds any more; returns how many.
+
+        `job_states(job_ids)` maps job ids to their status ("queued",
+        "running", ...; missing or None when the job does not exist). A slot
+        is kept while its job runs, or is queued and was dispatched less than
+        `ttl` (FAIRSHARE_SLOT_TTL_SECONDS, default 3600) ago; a message that
+        never reached a worker stops counting against the cap after that."""
+        now = time.time() if now is None else now
+        ttl = float(os.getenv("FAIRSHARE_SLOT_TTL_SECONDS", "3600")) if ttl is None else ttl
+        released = 0
+        for tenant in self.store.slotted_tenants():
+            slots = self.store.slots(tenant)
+            states = job_states(list(slots))
+            for job_id, at in slots.items():
+                state = states.get(job_id)
+                if state == "running" or (state == "queued" and now - at < ttl):
+                    continue
+                self.store.remove_slot(tenant, job_id)
+                released += 1
+        return released
+
+    def requeue(self, item: dict) -> None:
+        """Put a dispatched item back at the tail of its sub-queue."""
+        self.store.enqueue(queue_name(item.get("lane"), item.get("cost_class")), str(item.get("tenant_id")), item)
+
+    def next_batch(self, limit: int, capacities: Optional[Dict[str, int]] = None) -> List[dict]:
+        """Pick up to `limit` items, visiting broker queues in DISPATCH_ORDER
+        and each by deficit round-robin across tenants. `capacities` bounds
+        each broker queue separately (queues missing from it get nothing), so
+        a full `bulk.heavy` does not hold back `interactive`."""
+        out: List[dict] = []
+        for queue in DISPATCH_ORDER:
+            room = limit - len(out)
+            if capacities is not None:
+                room = min(room, capacities.get(queue, 0))
+            if room > 0:
+                out.extend(self._drain(queue, room))
+        return out
+
+    def _drain(self, queue: str, limit: int) -> List[dict]:
+        out: List[dict] = []
+        capped_visits = 0  # consecutive visits to capped tenants; a full ring of them means stop
+        while len(out) < limit:
+            tenants = self.store.tenants(queue)
+            if not tenants or capped_visits >= len(tenants):
+                break
+            tenant = tenants[0]
+            if self._capped(tenant):
+                # No credit while capped; keep its place in the ring
+                capped_visits += 1
+            else:
+                capped_visits = 0
+                deficit = self.store.get_deficit(queue, tenant) + self.quantum * max(1, self.weights.get(tenant, 1))
+                while len(out) < limit and not self._capped(tenant):
+                    head = self.store.peek(queue, tenant)
+                    if head is None or int(head.get("cost", 1)) > deficit:
+                        break
+                    item = self.store.dequeue(queue, tenant)
+                    if item is None:
+                        break
+                    deficit -= int(item.get("cost", 1))
+                    self.store.add_slot(tenant, str(item["job_id"]), time.time())
+                    out.append(item)
+                if self.store.backlog(queue, tenant) == 0:
+                    # Classic DRR: an emptied queue forfeits its remaining deficit
+                    self.store.set_deficit(queue, tenant, 0)
+                    self.store.deactivate(queue, tenant)
+                    continue
+                self.store.set_deficit(queue, tenant, deficit)
+            self.store.rotate(queue)
+        return out
+
+
+def scheduler_from_env() -> FairShareScheduler:
+    """Redis-backed scheduler on the Celery broker (or FAIRSHARE_REDIS_URL)."""
+    import redis as redis_lib
+
+    url = os.getenv("FAIRSHARE_REDIS_URL") or os.getenv("CELERY_BROKER_URL") or os.getenv("REDIS_URL", "redis://redis:6379/0")
+    return FairShareScheduler.from_env(RedisFairShareStore(redis_lib.from_url(url)))
@@ -0,0 +1,159 @@
+"""
+Priority lanes: named Celery queues that keep interactive uploads from queueing
+behind bulk ingestion or mass reprocessing.
+
+- `interactive`: a person is waiting on the result (UI upload, single finalize)
+- `bulk`: batch ingestion (scripts/batch_upload.py, large multipart requests)
+- `reprocess`: re-runs of existing documents
+
+The API picks a lane per request (explicit parameter wins, otherwise a simple
+heuristic). Workers subscribe to lanes via `WORKER_LANES`, optionally with
+weights (e.g. `interactive:4,reprocess:2,bulk:1`); weights are applied by
+`WeightedLaneCycle`, which kombu's Redis transport uses to order its BRPOP.
+
+Each lane is split by cost class (see shared.queueing.routing): light jobs use
+the plain lane queue, heavy jobs `<lane>.heavy`, so differently sized pools can
+serve them (`WORKER_COST_CLASSES`).
+
+This module must stay free of Celery/worker imports so the API can use it.
+"""
+
+from typing import Dict, List, Optional, Tuple
+import os
+
+from kombu.utils.scheduling import round_robin_cycle
+
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+REPROCESS = "reprocess"
+LANES = (INTERACTIVE, BULK, REPROCESS)
+DEFAULT_LANE = INTERACTIVE
+
+LIGHT = "light"
+HEAVY = "heavy"
+COST_CLASSES = (LIGHT, HEAVY)
+
+
+def _bulk_min_files() -> int:
+    try:
+        return max(1, int(os.getenv("LANE_BULK_MIN_FILES", "5")))
+    except ValueError:
+        return 5
+
+
+def is_valid_lane(lane: Optional[str]) -> bool:
+    return lane is None or lane in LANES
+
+
+def choose_lane(explicit: Optional[str] = None, *, reprocess: bool = False, file_count: int = 1) -> str:
+    """Return the lane for a request.
+
+    An explicit lane always wins. Reprocess requests go to `reprocess`; multipart
+    uploads with at least LANE_BULK_MIN_FILES files go to `bulk`; everything
+    else is `interactive`.
+    """
+    if explicit:
+        return explicit
+    if reprocess:
+        return REPROCESS
+    if file_count >= _bulk_min_files():
+        return BULK
+    return DEFAULT_LANE
+
+
+def parse_lane_weights(spec: Optional[str]) -> List[Tuple[str, int]]:
+    """Parse `name[:weight],...` into [(lane, weight)]. Unknown lanes are dropped;
+    an empty spec subscribes to every lane with weight 1.
+    """
+    out: List[Tuple[str, int]] = []
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, w = part.partition(":")
+        name = name.strip().lower()
+        if name not in LANES or any(n == name for n, _ in out):
+            continue
+        try:
+            weight = max(1, int(w)) if w.strip() else 1
+        except ValueError:
+            weight = 1
+        out.append((name, weight))
+    return out or [(lane, 1) for lane in LANES]
+
+
+def worker_lanes() -> List[Tuple[str, int]]:
+    """Lanes (and weights) this worker process subscribes to, from WORKER_LANES."""
+    return parse_lane_weights(os.getenv("WORKER_LANES"))
+
+
+def queue_name(lane: Optional[str], cost_class: Optional[str] = None) -> str:
+    """Celery queue for a lane and cost class: `bulk`, `bulk.heavy`, ..."""
+    lane = lane if lane in LANES else DEFAULT_LANE
+    return f"{lane}.{HEAVY}" if cost_class == HEAVY else lane
+
+
+def worker_cost_classes() -> List[str]:
+    """Cost classes this worker serves, from WORKER_COST_CLASSES (default: all)."""
+    names = [p.strip().lower() for p in (os.getenv("WORKER_COST_CLASSES") or "").split(",") if p.strip()]
+    return [c for c in COST_CLASSES if c in names] or list(COST_CLASSES)
+
+
+def worker_queues() -> List[str]:
+    return [queue_name(lane, c) for lane, _ in worker_lanes() for c in worker_cost_classes()]
+
+
+class WeightedLaneCycle(round_robin_cycle):
+    """kombu queue-order strategy implementing smooth weighted round-robin.
+
+    kombu's Redis transport issues BRPOP over `consume(n)` and calls
+    `rotate(queue)` after each delivery. We keep a running credit per queue so
+    that, with every lane backlogged, deliveries follow the configured weights
+    (e.g. 4:2:1) instead of strict alternation. Queues without a configured
+    weight get 1.
+    """
+
+    def __init__(self, it=None):
+        super().__init__(it)
+        self.weights: Dict[str, int] = dict(worker_lanes())
+        self.credit: Dict[str, int] = {}
+
+    def _weight(self, name) -> int:
+        # `bulk.heavy` shares the weight of `bulk`
+        return self.weights.get(str(name).split(".", 1)[0], 1)
+
+    def update(self, it):
+        super().update(it)
+        self.credit = {q: self.credit.get(q, 0) for q in self.items}
+        self._reorder()
+
+    def rotate(self, last_used):
+        if last_used in self.credit:
+            total = sum(self._weight(q) for q in self.items)
+            self.credit[last_used] -= total
+            for q in self.items:
+                self.credit[q] += self._weight(q)
+            self._reorder()
+        return last_used
+
+    def _reorder(self):
+        self.items.sort(key=lambda q: (-self.credit.get(q, 0), -self._weight(q)))
+
+
+def queue_depths(redis_client) -> Dict[Tuple[str, str], int]:
+    """Return pending message count per (lane, cost class). kombu's Redis
+    transport keeps each queue as a list named after the queue."""
+    return {
+        (lane, c): int(redis_client.llen(queue_name(lane, c)) or 0)
+        for lane in LANES
+        for c in COST_CLASSES
+    }
+
+
+def lane_depths(redis_client) -> Dict[str, int]:
+    """Return pending message count per lane, across cost classes."""
+    out = {lane: 0 for lane in LANES}
+    for (lane, _), n in queue_depths(redis_client).items():
+        out[lane] += n
+    return out
@@ -0,0 +1,88 @@
+"""
+Enqueue-time cost classification.
+
+The API already knows mime and size when it creates a job, and can cheaply
+count PDF page objects while it hashes the bytes. We turn that into cost units
+(estimated pages x quality-mode factor) and a cost class, so a 2 KB PNG does
+not queue behind a 900-page PDF: heavy jobs go to `<lane>.heavy` queues served
+by a separate pool.
+
+Page counting here is a byte scan for `/Type /Page` objects, not a PDF parse:
+it is approximate (compressed object streams hide page objects) and falls back
+to a size heuristic. The worker records the real page_count in metrics.
+
+Kept dependency-free so the API process can use it.
+"""
+
+from typing import Optional, Tuple
+import math
+import os
+import re
+
+from shared.queueing.lanes import HEAVY, LIGHT
+
+
+_PAGE_OBJ_RE = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+_MODE_FACTORS = {"budget": 1, "recommended": 2}
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+class PdfPageCounter:
+    """Incrementally count `/Type /Page` objects over streamed chunks."""
+
+    _OVERLAP = 32  # longest match we could split across chunks
+
+    def __init__(self):
+        self.count = 0
+        self._tail = b""
+
+    def feed(self, chunk: bytes) -> None:
+        buf = self._tail + chunk
+        # Only count matches that start before the carried-over tail of this buffer
+        cut = max(0, len(buf) - self._OVERLAP)
+        self.count += sum(1 for m in _PAGE_OBJ_RE.finditer(buf) if m.start() < cut)
+        self._tail = buf[cut:]
+
+    def finish(self) -> int:
+        self.count += len(_PAGE_OBJ_RE.findall(self._tail))
+        self._tail = b""
+        return self.count
+
+
+def count_pdf_pages(data: Optional[bytes]) -> int:
+    if not data:
+        return 0
+    return len(_PAGE_OBJ_RE.findall(data))
+
+
+def estimate_pages(mime: Optional[str], size_bytes: int, counted_pages: Optional[int] = None) -> int:
+    """Best-effort page estimate for routing. Images are one page; PDFs use the
+    counted page objects when available, else ROUTING_PDF_BYTES_PER_PAGE."""
+    m = (mime or "").lower()
+    if m.startswith("image/"):
+        return 1
+    if counted_pages and counted_pages > 0:
+        return int(counted_pages)
+    per_page = max(1, _env_int("ROUTING_PDF_BYTES_PER_PAGE", 100_000))
+    return max(1, math.ceil(max(0, int(size_bytes or 0)) / per_page))
+
+
+def classify(mime: Optional[str], size_bytes: int, pages: int, quality_mode: Optional[str]) -> Tuple[str, int]:
+    """Return (cost_class, cost_units) for a job.
+
+    Units are estimated pages x mode factor (budget 1, recommended 2). A job is
+    heavy at ROUTING_HEAVY_MIN_UNITS units (default 40) or ROUTING_HEAVY_MIN_BYTES
+    bytes (default 25 MB).
+    """
+    units = max(1, int(pages)) * _MODE_FACTORS.get((quality_mode or "recommended").lower(), 2)
+    heavy = (
+        units >= _env_int("ROUTING_HEAVY_MIN_UNITS", 40)
+        or int(size_bytes or 0) >= _env_int("ROUTING_HEAVY_MIN_BYTES", 25_000_000)
+    )
+    return (HEAVY if heavy else LIGHT), units
@@ -1,10 +1,16 @@
+import base64
+import functools
 import hashlib
 import hmac
 import os
 from datetime import datetime, timedelta
 from urllib.parse import urlparse, quote, urlencode
+import socket
+import threading
+from typing import Any, Dict, Optional, Tuple
 from minio import Minio
 from urllib.parse import urlparse, urlunparse
+import urllib3
 
 try:
     # Optional centralized settings
@@ -13,8 +19,83 @@ except Exception:  # pragma: no cover - settings optional at import time
     _settings = None
 
 
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def http_client() -> urllib3.PoolManager:
+    """urllib3 pool for the MinIO client, tuned from the environment.
+
+    S3_POOL_MAXSIZE: connections kept per host (default 16; MinIO's own default is 10)
+    S3_POOL_BLOCK: wait for a free connection instead of opening a throwaway one (default false)
+    S3_CONNECT_TIMEOUT / S3_READ_TIMEOUT: seconds (default 5 / 300)
+    S3_TCP_KEEPALIVE: TCP keep-alive on pooled sockets so idle connections survive NAT/LB timeouts (default true)
+    """
+    socket_options = list(urllib3.connection.HTTPConnection.default_socket_options)
+    if os.getenv("S3_TCP_KEEPALIVE", "true").lower() in {"1", "true", "yes", "on"}:
+        socket_options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+        for opt, value in (("TCP_KEEPIDLE", 60), ("TCP_KEEPINTVL", 15), ("TCP_KEEPCNT", 4)):
+            if hasattr(socket, opt):
+                socket_options.append((socket.IPPROTO_TCP, getattr(socket, opt), value))
+    return urllib3.PoolManager(
+        num_pools=4,
+        maxsize=max(1, _env_int("S3_POOL_MAXSIZE", 16)),
+        block=os.getenv("S3_POOL_BLOCK", "false").lower() in {"1", "true", "yes", "on"},
+        timeout=urllib3.Timeout(connect=_env_float("S3_CONNECT_TIMEOUT", 5.0), read=_env_float("S3_READ_TIMEOUT", 300.0)),
+        retries=urllib3.Retry(total=5, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504]),
+        socket_options=socket_options,
+    )
+
+
+@functools.lru_cache(maxsize=8)
+def _signing_key(secret_key: str, date_stamp: str, region: str) -> bytes:
+    """SigV4 signing key; it only changes with the date, so batches of
+    presigned URLs reuse it instead of chaining four HMACs per URL."""
+    def _hmac(key: bytes, msg: str) -> bytes:
+        return hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
+
+    k_date = _hmac(("AWS4" + secret_key).encode("utf-8"), date_stamp)
+    k_region = _hmac(k_date, region)
+    k_service = _hmac(k_region, "s3")
+    return _hmac(k_service, "aws4_request")
+
+
+class HashingReader:
+    """File-like wrapper that sha256-hashes (and counts) bytes as they are read,
+    so an upload can be streamed to storage and fingerprinted in one pass.
+    `on_chunk` sees every chunk too (e.g. a PDF page counter)."""
+
+    def __init__(self, fileobj, on_chunk=None):
+        self._f = fileobj
+        self._on_chunk = on_chunk
+        self._hasher = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._f.read(size)
+        if chunk:
+            self.size += len(chunk)
+            self._hasher.update(chunk)
+            if self._on_chunk is not None:
+                self._on_chunk(chunk)
+        return chunk
+
+    def hexdigest(self) -> str:
+        return self._hasher.hexdigest()
+
+
 class Storage:
-    def __init__(self):
+    def __init__(self, http_client: Optional[urllib3.PoolManager] = None):
         endpoint_env = os.getenv("S3_ENDPOINT_URL", "http://localhost:9000")
         endpoint = endpoint_env.replace("http://", "").replace("https://", "")
         secure = os.getenv("S3_SECURE", "false").lower() in {"1", "true", "yes", "on"}
@@ -31,7 +112,9 @@ class Storage:
             access_key=(getattr(_settings, "s3_access_key", None) or os.getenv("S3_ACCESS_KEY", "minioadmin")),
             secret_key=(getattr(_settings, "s3_secret_key", None) or os.getenv("S3_SECRET_KEY", "minioadmin")),
             secure=secure,
+            http_client=http_client,
         )
+        self.http = http_client
 
     def ensure_bucket(self):
         found = self.client.bucket_exists(self.bucket)
@@ -46,6 +129,12 @@ class Storage:
         """Stream an object from a file-like to the bucket without loading into memory."""
         self.client.put_object(self.bucket, key, fileobj, length=length, content_type=content_type)
 
+    def put_stream(self, key: str, fileobj, length: int = -1, content_type: str = "application/octet-stream"):
+        """Stream an object of possibly unknown length (length=-1) as an S3
+        multipart upload in S3_PART_SIZE_MB parts (default 16, minimum 5)."""
+        part_size = max(5, _env_int("S3_PART_SIZE_MB", 16)) * 1024 * 1024
+        self.client.put_object(self.bucket, key, fileobj, length=length, part_size=part_size, content_type=content_type)
+
     def object_key(self, tenant_id: str, sha256: str, version: int, filename: str) -> str:
         prefix = f"{tenant_id}/{sha256[:2]}/{sha256}/v{version}"
         return f"{prefix}/{filename}"
@@ -62,6 +151,36 @@ class Storage:
             resp.close()
             resp.release_conn()
 
+    def stat(self, key: str) -> Dict[str, Any]:
+        """Size, ETag and, when the object was uploaded with an SHA-256
+        checksum, its hex digest (None otherwise) without downloading it."""
+        obj = self.client.stat_object(self.bucket, key, extra_headers={"x-amz-checksum-mode": "ENABLED"})
+        checksum = None
+        try:
+            b64 = (obj.metadata or {}).get("x-amz-checksum-sha256")
+            if b64:
+                checksum = base64.b64decode(b64).hex()
+        except Exception:
+            checksum = None
+        return {"size": obj.size, "etag": obj.etag, "sha256": checksum}
+
+    def hash_object(self, key: str, chunk_size: int = 1024 * 1024, on_chunk=None) -> Tuple[str, int]:
+        """sha256 hex digest and size of an object, streamed in bounded chunks
+        (memory does not grow with the object). `on_chunk` sees every chunk."""
+        hasher = hashlib.sha256()
+        size = 0
+        resp = self.client.get_object(self.bucket, key)
+        try:
+            for chunk in resp.stream(chunk_size):
+                size += len(chunk)
+                hasher.update(chunk)
+                if on_chunk is not None:
+                    on_chunk(chunk)
+        finally:
+            resp.close()
+            resp.release_conn()
+        return hasher.hexdigest(), size
+
     # Presign helpers
     def presign_put_url(self, key: str, expiry: int = 3600) -> str:
         """Return presigned PUT URL. If S3_PUBLIC_ENDPOINT_URL is set, prefer
@@ -159,14 +278,8 @@ class Storage:
             cr_hash,
         ])
 
-        # Signing key
-        def _hmac(key: bytes, msg: str) -> bytes:
-            return hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
-
-        k_date = _hmac(("AWS4" + secret_key).encode("utf-8"), date_stamp)
-        k_region = _hmac(k_date, region)
-        k_service = _hmac(k_region, "s3")
-        k_signing = _hmac(k_service, "aws4_request")
+        # Signing key (derived once per day/region, see _signing_key)
+        k_signing = _signing_key(secret_key, date_stamp, region)
         signature = hmac.new(k_signing, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
 
         # Final URL
@@ -209,3 +322,57 @@ class Storage:
                 print(f"Failed to delete {err.object_name}: {err.message}")
             except Exception:
                 pass
+
+
+# --- Process-wide instance ---
+# One Storage (and one connection pool) per process; the API and worker use
+# get_storage() instead of constructing Storage() per request/job. A forked
+# child (Celery prefork) must not share the parent's sockets, so the instance
+# is dropped after fork and rebuilt lazily in the child.
+_storage: Optional[Storage] = None
+_storage_pid: Optional[int] = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> Storage:
+    global _storage, _storage_pid
+    pid = os.getpid()
+    if _storage is None or _storage_pid != pid:
+        with _storage_lock:
+            if _storage is None or _storage_pid != pid:
+                _storage = Storage(http_client=http_client())
+                _storage_pid = pid
+    return _storage
+
+
+def reset_storage() -> None:
+    """Forget the process-wide Storage (the next get_storage() opens a new pool)."""
+    global _storage, _storage_pid, _storage_lock
+    _storage = None
+    _storage_pid = None
+    _storage_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_storage)
+
+
+def pool_stats() -> Dict[str, int]:
+    """Connection counts of the process-wide pool: opened (ever), idle (pooled now), requests."""
+    stats = {"pools": 0, "opened": 0, "idle": 0, "requests": 0}
+    storage = _storage
+    if storage is None or storage.http is None or _storage_pid != os.getpid():
+        return stats
+    pools = storage.http.pools
+    for key in list(pools.keys()):
+        pool = pools.get(key)
+        if pool is None:
+            continue
+        stats["pools"] += 1
+        stats["opened"] += getattr(pool, "num_connections", 0)
+        stats["requests"] += getattr(pool, "num_requests", 0)
+        try:
+            stats["idle"] += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+        except Exception:
+            pass
+    return stats
@@ -0,0 +1,172 @@
+"""
+Minimal tracing: spans with W3C `traceparent` propagation.
+
+The API starts a span per request (continuing an incoming `traceparent`
+header), enqueueing passes the current context to the Celery task as task
+kwargs (`trace_context()`), and the worker continues the trace with a span for
+the task, each pipeline stage, storage downloads and the DB finalize. Span and
+trace IDs follow the W3C format, so they can be joined with other tools.
+
+Finished spans go to the exporter chosen by TRACE_EXPORTER:
+- `none` (default): IDs are still propagated and bound to logs, nothing is written
+- `file`: one JSON object per line appended to TRACE_FILE (default /tmp/block0-traces.jsonl)
+- `memory`: kept in `exporter().spans` (tests)
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import json
+import os
+import re
+import secrets
+import time
+
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start: float = field(default_factory=time.time)
+    end: Optional[float] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    status: str = "ok"
+
+    def set(self, **attrs) -> None:
+        self.attributes.update(attrs)
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return None if self.end is None else round((self.end - self.start) * 1000, 3)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "end": self.end,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class NullExporter:
+    def export(self, span: Span) -> None:
+        return None
+
+
+class InMemoryExporter:
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+    def clear(self) -> None:
+        self.spans.clear()
+
+
+class FileExporter:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+_exporter = None
+
+
+def exporter():
+    global _exporter
+    if _exporter is None:
+        kind = (os.getenv("TRACE_EXPORTER", "none") or "none").strip().lower()
+        if kind == "file":
+            _exporter = FileExporter(os.getenv("TRACE_FILE", "/tmp/block0-traces.jsonl"))
+        elif kind == "memory":
+            _exporter = InMemoryExporter()
+        else:
+            _exporter = NullExporter()
+    return _exporter
+
+
+def set_exporter(exp) -> None:
+    """Override the exporter (None re-reads TRACE_EXPORTER on next use)."""
+    global _exporter
+    _exporter = exp
+
+
+_current: ContextVar[Optional[Span]] = ContextVar("trace_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str]]:
+    """(trace_id, parent span_id) from a W3C traceparent header, else None."""
+    m = _TRACEPARENT.match((value or "").strip().lower())
+    if not m or set(m.group(1)) == {"0"} or set(m.group(2)) == {"0"}:
+        return None
+    return m.group(1), m.group(2)
+
+
+@contextmanager
+def span(name: str, traceparent: Optional[str] = None, **attrs) -> Iterator[Span]:
+    """Run the block in a span: a child of `traceparent` when given, else of the
+    current span, else the root of a new trace. Exceptions mark it `error`."""
+    parent = parse_traceparent(traceparent) if traceparent else None
+    if parent is None and _current.get() is not None:
+        cur = _current.get()
+        parent = (cur.trace_id, cur.span_id)
+    trace_id, parent_id = parent if parent else (secrets.token_hex(16), None)
+    sp = Span(name=name, trace_id=trace_id, span_id=secrets.token_hex(8), parent_id=parent_id, attributes=dict(attrs))
+    token = _current.set(sp)
+    try:
+        yield sp
+    except BaseException as e:
+        sp.status = "error"
+        sp.attributes["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        sp.end = time.time()
+        _current.reset(token)
+        try:
+            exporter().export(sp)
+        except Exception:
+            # Tracing must never fail the traced work
+            pass
+
+
+def trace_context() -> Dict[str, str]:
+    """Task kwargs carrying the current trace (and request id) to a worker."""
+    out: Dict[str, str] = {}
+    sp = _current.get()
+    if sp is not None:
+        out["traceparent"] = sp.traceparent
+    try:
+        from structlog.contextvars import get_contextvars
+
+        rid = get_contextvars().get("request_id")
+        if rid:
+            out["request_id"] = str(rid)
+    except Exception:
+        pass
+    return out
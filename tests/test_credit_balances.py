@@ -0,0 +1,61 @@
+import uuid
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from shared.db import models
+from shared.quality import balances
+from shared.quality.credits import settle_estimate
+
+
+def _session():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, autoflush=False)
+    balances.track_balances(factory)
+    db = factory()
+    tenant = models.Tenant(id=uuid.uuid4(), name="t")
+    db.add(tenant)
+    db.flush()
+    db.add_all([models.User(id=1, tenant_id=tenant.id, username="a"), models.User(id=2, tenant_id=tenant.id, username="b")])
+    db.commit()
+    return db, tenant.id
+
+
+def test_balances_follow_the_ledger_in_the_same_transaction():
+    db, tid = _session()
+    job = uuid.uuid4()
+    db.add(models.Credit(tenant_id=tid, user_id=1, delta=-40, reason="estimate", job_id=job, is_estimate=True))
+    db.add(models.Credit(tenant_id=tid, user_id=2, delta=100, reason="topup"))
+    db.commit()
+    assert balances.balance(db, tid) == (60, 2)
+    assert balances.balance(db, tid, user_id=1) == (-40, 1)
+
+    # Settling closes the estimate and adds reversal + actual rows
+    assert settle_estimate(db, job, actual=25)
+    db.commit()
+    s = balances.summary(db, tid)
+    assert s["total"] == 100 - 25 and s["by_reason"] == {"estimate": -40, "estimate_reversal": 40, "actual": -25, "topup": 100}
+    assert s["pending_estimates"] == {"count": 0, "sum": 0}
+
+    # Rolled-back writes leave no trace
+    db.add(models.Credit(tenant_id=tid, user_id=1, delta=-5, reason="estimate", is_estimate=True))
+    db.flush()
+    db.rollback()
+    assert balances.balance(db, tid) == (75, 4)
+    assert balances.reconcile(db) == []
+
+
+def test_reconcile_repairs_writes_that_bypassed_the_hook():
+    db, tid = _session()
+    db.add(models.Credit(tenant_id=tid, user_id=1, delta=-10, reason="estimate", is_estimate=True))
+    db.commit()
+    db.execute(text(
+        "INSERT INTO credits (tenant_id, user_id, delta, reason, is_estimate, created_at) "
+        "VALUES (:t, 1, -7, 'estimate', 1, CURRENT_TIMESTAMP)"
+    ), {"t": tid.hex})
+    db.commit()
+    drift = balances.reconcile(db)
+    assert [(d["reason"], d["ledger"], d["balance"]) for d in drift] == [("estimate", [-17, 2, 2, -17], [-10, 1, 1, -10])]
+    assert balances.balance(db, tid) == (-17, 2) and balances.reconcile(db) == []
@@ -33,41 +33,18 @@ def test_credits_ledger_tenant_not_found(monkeypatch):
 
 def test_credits_balance_ok(monkeypatch):
     import apps.block0_api.main as api
-    from types import SimpleNamespace
-    import uuid
-
-    tid = uuid.uuid4()
-
-    class DummyTenant:
-        id = tid
-
-    class DummyCredit:
-        def __init__(self, delta):
-            self.delta = delta
-
-    class Q:
-        def __init__(self, items):
-            self._items = items
-
-        def filter(self, *args, **kwargs):
-            return self
-
-        def all(self):
-            return self._items
-
-    class DummyDB:
-        def get(self, model, key):
-            # Return a tenant for the provided UUID
-            return DummyTenant() if isinstance(key, uuid.UUID) else None
-
-        def query(self, model):
-            # Return three credit entries summing to -10
-            return Q([DummyCredit(-20), DummyCredit(+5), DummyCredit(+5)])
-
-    def _override_db():
-        return DummyDB()
-
-    api.app.dependency_overrides[api.get_db] = _override_db
+    from shared.db import models
+    from tests.test_credit_balances import _session
+
+    db, tid = _session()
+    db.add_all([
+        models.Credit(tenant_id=tid, user_id=1, delta=-20, reason="actual"),
+        models.Credit(tenant_id=tid, user_id=1, delta=5, reason="refund"),
+        models.Credit(tenant_id=tid, user_id=2, delta=5, reason="refund"),
+    ])
+    db.commit()
+
+    api.app.dependency_overrides[api.get_db] = lambda: db
     try:
         with TestClient(api.app) as client:
             r = client.get("/v0/credits/balance", params={"tenant_id": str(tid)})
@@ -76,6 +53,7 @@ def test_credits_balance_ok(monkeypatch):
             assert j["tenant_id"] == str(tid)
             assert j["balance"] == -10
             assert j["count"] == 3
+            j = client.get("/v0/credits/balance", params={"tenant_id": str(tid), "user_id": 1}).json()
+            assert (j["balance"], j["count"]) == (-15, 2)
     finally:
         api.app.dependency_overrides.clear()
-
@@ -0,0 +1,55 @@
+import uuid
+
+from shared.pipeline.fingerprint import compute_fingerprint
+from shared.quality.credits import settle_estimate
+
+
+def test_fingerprint_tracks_bytes_config_and_version(monkeypatch):
+    cfg = {"provider": "tesseract", "lang": "eng", "quality_mode": "budget"}
+    fp = compute_fingerprint("a" * 64, cfg)
+    # Stable regardless of dict ordering
+    assert fp == compute_fingerprint("a" * 64, dict(reversed(list(cfg.items()))))
+    assert fp != compute_fingerprint("b" * 64, cfg)
+    assert fp != compute_fingerprint("a" * 64, {**cfg, "lang": "eng+hin"})
+    monkeypatch.setenv("PIPELINE_CONFIG_VERSION", "2")
+    assert fp != compute_fingerprint("a" * 64, cfg)
+
+
+class _Row:
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+class _DB:
+    def __init__(self, estimate):
+        self.estimate = estimate
+        self.added = []
+
+    def query(self, model):
+        db = self
+
+        class Q:
+            def filter(self, *a, **k):
+                return self
+
+            def first(self):
+                return db.estimate if db.estimate.is_estimate else None
+
+        return Q()
+
+    def add(self, obj):
+        self.added.append(obj)
+
+
+def test_settle_estimate_charges_dedupe_price_once():
+    est = _Row(tenant_id=uuid.uuid4(), user_id=1, delta=-30, is_estimate=True)
+    db = _DB(est)
+    job_id = uuid.uuid4()
+    assert settle_estimate(db, job_id, 1, reason="dedupe") is True
+    assert [(c.reason, c.delta) for c in db.added] == [("estimate_reversal", 30), ("dedupe", -1)]
+    # Estimate is closed; a second settlement is a no-op
+    assert settle_estimate(db, job_id, 1, reason="dedupe") is False
+    # Free dedupe (price 0) only reverses the estimate
+    db = _DB(_Row(tenant_id=uuid.uuid4(), user_id=1, delta=-30, is_estimate=True))
+    settle_estimate(db, job_id, 0, reason="dedupe")
+    assert [c.reason for c in db.added] == ["estimate_reversal"]
@@ -0,0 +1,87 @@
+import hashlib
+
+from fastapi.testclient import TestClient
+
+from tests.test_upload_nonblocking import DB, TENANT
+
+
+BODY = b"%PDF-1.4 staged upload"
+SHA = hashlib.sha256(BODY).hexdigest()
+
+
+class StatStorage:
+    def __init__(self, checksum=None):
+        self.checksum = checksum
+        self.hashed = 0
+        self.copies = []
+
+    def stat(self, key):
+        return {"size": len(BODY), "etag": "e", "sha256": self.checksum}
+
+    def hash_object(self, key, chunk_size=1024 * 1024, on_chunk=None):
+        self.hashed += 1
+        if on_chunk:
+            on_chunk(BODY)
+        return SHA, len(BODY)
+
+    def get_object_bytes(self, key):
+        raise AssertionError("finalize must not download the object")
+
+    def object_key(self, tenant_id, sha256, version, filename):
+        return f"{tenant_id}/{sha256[:2]}/{sha256}/v{version}/{filename}"
+
+    def object_exists(self, key):
+        return False
+
+    def copy_object(self, src_key, dst_key):
+        self.copies.append(dst_key)
+
+
+def _finalize(monkeypatch, storage, **extra):
+    import apps.block0_api.main as api
+
+    db = DB()
+    monkeypatch.setattr(api, "get_storage", lambda: storage)
+    monkeypatch.setattr(api.balances, "balance", lambda db, tenant_id, user_id=None: (0, 0))
+    monkeypatch.setattr(api, "enqueue_process_document", lambda job_id, **kw: None)
+    api.app.dependency_overrides[api.get_db] = lambda: db
+    try:
+        with TestClient(api.app) as client:
+            r = client.post("/v0/uploads/finalize", json={
+                "tenant_id": str(TENANT), "user_id": 1, "key": "staging/a.pdf.0badc0de", "mime": "application/pdf", **extra,
+            })
+    finally:
+        api.app.dependency_overrides.clear()
+    jobs = [o for o in db.added if type(o).__name__ == "ProcessingJob"]
+    return r, jobs
+
+
+def test_finalize_stream_hashes_without_download(monkeypatch):
+    storage = StatStorage()
+    r, jobs = _finalize(monkeypatch, storage)
+    assert r.status_code == 200, r.text
+    assert storage.hashed == 1 and SHA in r.json()["storage_uri"]
+    assert jobs[0].options is None and jobs[0].features["size_bytes"] == len(BODY)
+
+
+def test_client_digest_is_hashed_unless_s3_confirms_it(monkeypatch):
+    storage = StatStorage()
+    r, jobs = _finalize(monkeypatch, storage, sha256=SHA.upper())
+    assert r.status_code == 200 and storage.hashed == 1
+    assert storage.copies == [f"{TENANT}/{SHA[:2]}/{SHA}/v1/a.pdf"]
+    assert jobs[0].options is None
+
+    # S3 checksum available: confirmed without reading, or rejected up front
+    storage = StatStorage(checksum=SHA)
+    r, jobs = _finalize(monkeypatch, storage, sha256=SHA)
+    assert r.status_code == 200 and storage.hashed == 0 and jobs[0].options is None
+    r, _ = _finalize(monkeypatch, StatStorage(checksum="0" * 64), sha256=SHA)
+    assert r.status_code == 400
+
+
+def test_wrong_claimed_digest_without_s3_checksum_is_rejected(monkeypatch):
+    storage = StatStorage()
+    r, jobs = _finalize(monkeypatch, storage, sha256="0" * 64)
+    assert r.status_code == 400 and storage.hashed == 1
+    # Nothing was copied under the claimed content key and no job was created
+    assert storage.copies == [] and jobs == []
@@ -33,7 +33,7 @@ def test_healthz_ok(monkeypatch):
     # Patch dependencies used by /healthz
     monkeypatch.setattr(api, "SessionLocal", lambda: DummyDB())
     monkeypatch.setattr(api.redis_lib, "from_url", lambda url: DummyRedis())
-    monkeypatch.setattr(api, "Storage", DummyStorage)
+    monkeypatch.setattr(api, "get_storage", DummyStorage)
 
     with TestClient(api.app) as client:
         r = client.get("/healthz")
@@ -75,7 +75,7 @@ def test_healthz_degraded(monkeypatch):
 
     monkeypatch.setattr(api, "SessionLocal", lambda: DummyDB())
     monkeypatch.setattr(api.redis_lib, "from_url", lambda url: BadRedis())
-    monkeypatch.setattr(api, "Storage", BadStorage)
+    monkeypatch.setattr(api, "get_storage", BadStorage)
 
     with TestClient(api.app) as client:
         r = client.get("/healthz")
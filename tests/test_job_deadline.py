@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+from apps.block0_worker.pipeline import Artifact, PipelineContext
+from shared.pipeline.deadline import Deadline, budget_seconds, deadline_for
+
+
+def test_budgets_by_mode_and_class(monkeypatch):
+    assert budget_seconds("budget", "light") < budget_seconds("recommended", "heavy")
+    monkeypatch.setenv("JOB_DEADLINE_BUDGETS", "budget.light:45,recommended.heavy:0")
+    assert budget_seconds("budget", "light") == 45
+    now = datetime(2025, 1, 1)
+    assert deadline_for("budget", "light", now=now) == now + timedelta(seconds=45)
+    assert deadline_for("recommended", "heavy") is None
+    assert Deadline(None).clamp(180, reserve=10) == 180
+
+
+def _ocr_ctx(remaining):
+    return PipelineContext(
+        storage=None, tenant_id="t", mime="application/pdf", quality_mode="recommended",
+        values={"normalized": Artifact.from_value("bytes", b"%PDF")},
+        deadline=Deadline(datetime.utcnow() + timedelta(seconds=remaining)),
+    )
+
+
+def test_ocr_stage_degrades_to_fit_the_deadline(monkeypatch):
+    import apps.block0_worker.stages as stages
+
+    seen = {}
+
+    class FakePdf:
+        def __init__(self, **kw):
+            seen.update(kw)
+
+        def process(self, content, mime, languages=None):
+            from shared.ocr.adapters.base import OCRResult
+            return OCRResult(pages=[], combined_text="text")
+
+    monkeypatch.setattr(stages, "OCRmyPDFAdapter", FakePdf)
+    monkeypatch.setenv("OCR_PROVIDER", "ocrmypdf")
+    stage = stages.OcrStage()
+
+    ctx = _ocr_ctx(60)
+    res = stage.run(ctx, {"normalized": b"%PDF"})
+    # Budget settings with every attempt bounded by what is left
+    assert seen["fast_mode"] is True and seen["max_total_seconds"] <= 50
+    assert res.cache is False and res.warnings[0].startswith("deadline_degraded")
+
+    # Past the deadline OCR still runs, on budget settings with the minimum timeout
+    seen.clear()
+    res = stage.run(_ocr_ctx(-60), {"normalized": b"%PDF"})
+    assert res.outputs["ocr_text"] == "text" and res.cache is False
+    assert seen["fast_mode"] is True and seen["max_total_seconds"] == 30
+    assert "minimum OCR timeout" in res.warnings[-1]
+
+    seen.clear()
+    res = stage.run(_ocr_ctx(3600), {"normalized": b"%PDF"})
+    assert seen["fast_mode"] is False and res.cache is True and res.warnings == []
+
+
+def test_ocrmypdf_retries_stop_at_total_budget(monkeypatch):
+    import subprocess
+    from shared.ocr.adapters.ocrmypdf import OCRmyPDFAdapter
+
+    timeouts = []
+
+    def fake_run(cmd, check, capture_output, timeout):
+        timeouts.append(timeout)
+        raise subprocess.TimeoutExpired(cmd, timeout)
+
+    monkeypatch.setattr("subprocess.run", fake_run)
+    monkeypatch.setattr("time.sleep", lambda s: None)
+    res = OCRmyPDFAdapter(timeout_seconds=180, max_total_seconds=20).process(b"%PDF-1.4", "application/pdf")
+    assert res.combined_text == ""
+    assert timeouts and all(t <= 20 for t in timeouts)
@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from shared.db.models import ProcessingStatus
+from shared.queueing.eta import DEFAULT_MODEL, DurationModel, fit, job_features, remaining_seconds
+
+
+def test_fit_recovers_per_page_cost(monkeypatch):
+    monkeypatch.setenv("ETA_MIN_SAMPLES", "5")
+    samples = []
+    for pages in range(1, 30):
+        for mode in ("budget", "recommended"):
+            f = job_features("application/pdf", pages * 100_000, pages, mode, ["eng"])
+            samples.append((f, 4 + 2 * pages + (3 * pages if mode == "recommended" else 0)))
+    model = fit(samples, ridge=0.0001)
+    assert model is not None and model.samples == len(samples) and model.rmse < 0.5
+    big = job_features("application/pdf", 5_000_000, 50, "recommended", ["eng"])
+    assert abs(model.predict(big) - (4 + 2 * 50 + 3 * 50)) < 5
+    # Round-trips through the shared store
+    assert DurationModel.from_json(model.to_json()).coef == model.coef
+    # Too little history keeps the previous model
+    assert fit(samples[:3]) is None
+
+
+def test_remaining_seconds_for_queued_and_running():
+    now = datetime(2025, 1, 1, 12, 0, 0)
+    feats = job_features("image/png", 1000, 1, "budget", ["eng"])
+    predicted = DEFAULT_MODEL.predict(feats)
+
+    queued = SimpleNamespace(status=ProcessingStatus.queued, features=feats, started_at=None)
+    # 120s of predicted work ahead shared by two workers
+    assert remaining_seconds(DEFAULT_MODEL, queued, 120.0, 2.0, now=now) == 60 + predicted
+
+    running = SimpleNamespace(status=ProcessingStatus.running, features=feats, started_at=now - timedelta(seconds=2))
+    assert remaining_seconds(DEFAULT_MODEL, running, 0, 1, now=now) == max(0.0, predicted - 2)
+    overdue = SimpleNamespace(status=ProcessingStatus.running, features=feats, started_at=now - timedelta(hours=1))
+    assert remaining_seconds(DEFAULT_MODEL, overdue, 0, 1, now=now) == 0.0
+
+    done = SimpleNamespace(status=ProcessingStatus.succeeded, features=feats, started_at=now)
+    assert remaining_seconds(DEFAULT_MODEL, done, 0, 1, now=now) is None
+
+
+def test_lane_load_aggregates_in_sql_and_matches_per_job_sums(monkeypatch):
+    import uuid
+
+    from sqlalchemy import event
+
+    from shared.db import models
+    from shared.queueing.eta import lane_load
+    from tests.test_latest_version import _doc, _session
+
+    monkeypatch.setenv("OCR_LANG", "eng")
+    engine, db, tid = _session()
+    doc = _doc(db, tid, 1)
+    now = datetime(2025, 1, 1, 12, 0, 0)
+    queued = []
+    for i in range(40):
+        mime, mode = ("application/pdf", "recommended") if i % 3 else ("image/png", "budget")
+        feats = job_features(mime, 2_000_000, 1 + i % 5, mode, ["eng"])
+        queued.append(feats)
+        db.add(models.ProcessingJob(
+            id=uuid.uuid4(), document_id=doc.id, status=ProcessingStatus.queued, lane="bulk",
+            features=feats, created_at=now - timedelta(minutes=60 - i),
+        ))
+    # Two finished runs in the window: 300s and (clipped to the window) 600s of busy time
+    for started, finished in ((now - timedelta(seconds=400), now - timedelta(seconds=100)),
+                              (now - timedelta(hours=1), now - timedelta(seconds=10))):
+        db.add(models.ProcessingJob(
+            id=uuid.uuid4(), document_id=doc.id, status=ProcessingStatus.succeeded, lane="bulk",
+            started_at=started, finished_at=finished,
+        ))
+    db.commit()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *a: statements.append(a[2]))
+    work, slots = lane_load(db, "bulk", DEFAULT_MODEL, now=now)
+    assert abs(work - sum(DEFAULT_MODEL.predict(f) for f in queued)) < 1e-6
+    # (300 + 590) busy seconds over a 600s window
+    assert abs(slots - 890 / 600) < 1e-3
+    assert len(statements) == 3
+
+    # A job's place in line only counts the jobs created before it
+    work, _ = lane_load(db, "bulk", DEFAULT_MODEL, before=now - timedelta(minutes=50), now=now)
+    assert abs(work - sum(DEFAULT_MODEL.predict(f) for f in queued[:10])) < 1e-6
+
+
+def test_metrics_reads_backlogs_the_reaper_published(monkeypatch):
+    import uuid
+
+    from fastapi.testclient import TestClient
+
+    import apps.block0_api.main as api
+    from shared.db import models
+    from shared.queueing.eta import publish_backlogs
+    from tests.test_latest_version import _doc, _session
+
+    class Redis:
+        def __init__(self):
+            self.data = {}
+
+        def get(self, key):
+            return self.data.get(key)
+
+        def set(self, key, value, ex=None):
+            self.data[key] = value
+
+    _, db, tid = _session()
+    doc = _doc(db, tid, 1)
+    for _ in range(3):
+        db.add(models.ProcessingJob(
+            id=uuid.uuid4(), document_id=doc.id, status=ProcessingStatus.queued, lane="bulk",
+            features=job_features("application/pdf", 100_000, 2, "budget"),
+        ))
+    db.commit()
+    client = Redis()
+    backlogs = publish_backlogs(db, client, ttl=120)
+    assert backlogs["bulk"] > 0 and backlogs["interactive"] == 0
+
+    def no_db():
+        raise AssertionError("/metrics must not open a DB session")
+
+    monkeypatch.setattr(api, "SessionLocal", no_db)
+    monkeypatch.setattr(api, "eta_redis", lambda: client)
+    with TestClient(api.app) as http:
+        body = http.get("/metrics").text
+    assert f'queue_backlog_seconds{{lane="bulk"}} {backlogs["bulk"]}' in body
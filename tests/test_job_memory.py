@@ -0,0 +1,26 @@
+import tracemalloc
+
+from apps.block0_worker.memory import JobMemory, max_rss_bytes, over_ceiling
+
+
+def test_job_memory_records_python_peak_and_rss():
+    mem = JobMemory(tracemalloc_enabled=True).start()
+    blob = bytearray(8 * 1024 * 1024)
+    mem.sample()
+    del blob
+    usage = mem.stop()
+    assert usage["py_peak_bytes"] >= 8 * 1024 * 1024
+    assert usage["rss_peak_bytes"] >= usage["rss_start_bytes"] > 0
+    assert usage["rss_delta_bytes"] == usage["rss_peak_bytes"] - usage["rss_start_bytes"]
+    # Tracing started for the job ends with it; a second stop is a no-op
+    assert not tracemalloc.is_tracing()
+    assert mem.stop() is usage
+
+
+def test_rss_ceiling(monkeypatch):
+    monkeypatch.delenv("WORKER_MAX_RSS_MB", raising=False)
+    assert max_rss_bytes() is None and not over_ceiling()
+    monkeypatch.setenv("WORKER_MAX_RSS_MB", "1")
+    assert max_rss_bytes() == 1024 * 1024 and over_ceiling()
+    monkeypatch.setenv("WORKER_MAX_RSS_MB", "1000000")
+    assert not over_ceiling()
@@ -0,0 +1,64 @@
+import time
+import uuid
+
+from fastapi.testclient import TestClient
+
+from apps.block0_worker.profiler import StackSampler, should_profile
+
+
+def _busy_leaf(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_sampler_collapses_the_job_thread_stack():
+    sampler = StackSampler(interval=0.002).start()
+    _busy_leaf(0.2)
+    sampler.stop()
+    assert sampler.samples > 10
+    top = sampler.collapsed().splitlines()[0]
+    stack, count = top.rsplit(" ", 1)
+    assert int(count) > 0
+    # Root first, leaf last
+    assert "test_job_profiler.py:_busy_leaf" in stack
+    assert stack.index("test_sampler_collapses_the_job_thread_stack") < stack.index("_busy_leaf")
+
+
+def test_should_profile(monkeypatch):
+    monkeypatch.setenv("PROFILE_SAMPLE_RATE", "0")
+    assert should_profile({"profile": True})
+    assert not should_profile(None)
+    monkeypatch.setenv("PROFILE_SAMPLE_RATE", "1")
+    assert should_profile({})
+
+
+def test_get_job_profile(monkeypatch):
+    import apps.block0_api.main as api
+    from shared.db import models as m
+
+    job = m.ProcessingJob(
+        id=uuid.uuid4(), document_id=uuid.uuid4(), status=m.ProcessingStatus.succeeded,
+        metrics={"profile": {"uri": "t/ab/sha/v1/profile/x.collapsed.txt", "samples": 3}},
+    )
+    plain = m.ProcessingJob(id=uuid.uuid4(), document_id=uuid.uuid4(), status=m.ProcessingStatus.succeeded)
+
+    class DB:
+        def get(self, model, key):
+            return {job.id: job, plain.id: plain}.get(key)
+
+    class DummyStorage:
+        def get_object_bytes(self, key):
+            assert key == "t/ab/sha/v1/profile/x.collapsed.txt"
+            return b"worker.py:process_document;stages.py:run 3\n"
+
+    api.app.dependency_overrides[api.get_db] = lambda: DB()
+    monkeypatch.setattr(api, "get_storage", DummyStorage)
+    try:
+        with TestClient(api.app) as client:
+            r = client.get(f"/v0/jobs/{job.id}/profile")
+            assert r.status_code == 200
+            assert r.text.startswith("worker.py:process_document;stages.py:run 3")
+            assert client.get(f"/v0/jobs/{plain.id}/profile").status_code == 404
+    finally:
+        api.app.dependency_overrides.clear()
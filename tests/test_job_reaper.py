@@ -0,0 +1,126 @@
+import uuid
+from datetime import datetime, timedelta
+
+from shared.db import models as m
+from shared.db.models import ProcessingStatus
+
+
+class _Row:
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+class _Q:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def filter(self, *args, **kwargs):
+        return self
+
+    def order_by(self, *args, **kwargs):
+        return self
+
+    def limit(self, *args):
+        return self
+
+    def with_for_update(self, **kwargs):
+        return self
+
+    def all(self):
+        return list(self._rows)
+
+    def first(self):
+        return self._rows[0] if self._rows else None
+
+
+class _DB:
+    """Stub session: `jobs` are the expired candidates, `estimates` open estimate credits by job id."""
+
+    def __init__(self, jobs, estimates):
+        self.jobs = jobs
+        self.estimates = estimates
+        self.added = []
+        self.tenant_id = uuid.uuid4()
+
+    def query(self, model):
+        if model is m.ProcessingJob:
+            return _Q(self.jobs)
+        self._credit_q = _Q([e for e in self.estimates.values() if e.is_estimate])
+        return self._credit_q
+
+    def get(self, model, key):
+        return _Row(id=key, tenant_id=self.tenant_id)
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    def commit(self):
+        pass
+
+
+def _job(attempts):
+    return _Row(
+        id=uuid.uuid4(), document_id=uuid.uuid4(), lane="bulk", cost_class="light",
+        status=ProcessingStatus.running, attempts=attempts, error=None, finished_at=None,
+        lease_expires_at=datetime.utcnow() - timedelta(minutes=5),
+    )
+
+
+def test_reaper_requeues_then_fails_with_refund():
+    from apps.block0_worker.reaper import reap_expired
+
+    retry, exhausted = _job(1), _job(3)
+    est = _Row(tenant_id=uuid.uuid4(), user_id=1, delta=-4, is_estimate=True)
+    db = _DB([retry, exhausted], {exhausted.id: est})
+    requeued, released = [], []
+    out = reap_expired(db, lambda job, tenant: requeued.append(job.id), attempts_limit=3, release=lambda tenant, job_id: released.append(tenant))
+
+    assert out == {"requeued": 1, "failed": 1}
+    assert requeued == [retry.id]
+    assert retry.status == ProcessingStatus.queued and retry.lease_expires_at is None
+    assert exhausted.status == ProcessingStatus.failed and exhausted.finished_at is not None
+    # Estimate reversed exactly once and the fair-share slot given back
+    assert [(c.reason, c.delta) for c in db.added] == [("refund_lease_expired", 4)]
+    assert est.is_estimate is False
+    assert released == [str(db.tenant_id)]
+
+
+def test_reaper_fails_job_when_requeue_raises():
+    from apps.block0_worker.reaper import reap_expired
+
+    job = _job(1)
+    db = _DB([job], {})
+
+    def boom(job, tenant):
+        raise RuntimeError("broker down")
+
+    assert reap_expired(db, boom, attempts_limit=3) == {"requeued": 0, "failed": 1}
+    assert job.status == ProcessingStatus.failed
+
+
+def test_reaped_run_cannot_finalize_next_to_its_retry():
+    import pytest
+
+    from apps.block0_worker.lease import LeaseLost, hold_lease
+    from apps.block0_worker.reaper import reap_expired
+    from tests.test_latest_version import _doc
+    from tests.test_credit_balances import _session
+
+    db, tid = _session()
+    doc = _doc(db, tid, 1)
+    job = m.ProcessingJob(
+        id=uuid.uuid4(), document_id=doc.id, status=ProcessingStatus.running, lane="bulk", attempts=1,
+        lease_expires_at=datetime.utcnow() - timedelta(minutes=5),
+    )
+    db.add(job)
+    db.commit()
+    # Stalled past its lease: the reaper requeues it and a retry starts as attempt 2
+    assert reap_expired(db, lambda job, tenant: None)["requeued"] == 1
+    with pytest.raises(LeaseLost):
+        hold_lease(db, job.id, 1)
+    job.status, job.attempts = ProcessingStatus.running, 2
+    db.commit()
+    with pytest.raises(LeaseLost):
+        hold_lease(db, job.id, 1)
+    hold_lease(db, job.id, 2)
+    db.commit()
@@ -0,0 +1,34 @@
+from shared.queueing.lanes import queue_name, worker_queues
+from shared.queueing.routing import PdfPageCounter, classify, count_pdf_pages, estimate_pages
+
+
+def _fake_pdf(pages: int) -> bytes:
+    objs = b"".join(b"%d 0 obj << /Type /Page /Parent 1 0 R >> endobj\n" % (i + 2) for i in range(pages))
+    return b"%PDF-1.4\n1 0 obj << /Type /Pages /Count " + str(pages).encode() + b" >> endobj\n" + objs
+
+
+def test_page_counter_matches_across_chunk_boundaries():
+    data = _fake_pdf(37)
+    assert count_pdf_pages(data) == 37
+    for size in (1, 7, 50, 4096):
+        c = PdfPageCounter()
+        for i in range(0, len(data), size):
+            c.feed(data[i:i + size])
+        assert c.finish() == 37
+
+
+def test_estimate_and_classify(monkeypatch):
+    monkeypatch.setenv("ROUTING_HEAVY_MIN_UNITS", "40")
+    assert estimate_pages("image/png", 2_000) == 1
+    assert estimate_pages("application/pdf", 900_000, counted_pages=0) == 9
+    assert classify("image/png", 2_000, 1, "recommended") == ("light", 2)
+    assert classify("application/pdf", 5_000_000, 900, "budget") == ("heavy", 900)
+    assert classify("application/pdf", 30_000_000, 1, "budget")[0] == "heavy"
+
+
+def test_heavy_jobs_use_heavy_queues(monkeypatch):
+    assert queue_name("bulk", "heavy") == "bulk.heavy"
+    assert queue_name("bulk", "light") == "bulk"
+    monkeypatch.setenv("WORKER_LANES", "interactive,bulk")
+    monkeypatch.setenv("WORKER_COST_CLASSES", "heavy")
+    assert worker_queues() == ["interactive.heavy", "bulk.heavy"]
@@ -0,0 +1,70 @@
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from shared.db import models
+from shared.db.latest import latest_version, track_latest_versions
+
+
+def _session():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, autoflush=False)
+    track_latest_versions(factory)
+    db = factory()
+    tenant = models.Tenant(id=uuid.uuid4(), name="t")
+    db.add(tenant)
+    db.flush()
+    db.add(models.User(id=1, tenant_id=tenant.id, username="a"))
+    db.commit()
+    return engine, db, tenant.id
+
+
+def _doc(db, tid, n):
+    doc = models.Document(id=uuid.uuid4(), tenant_id=tid, user_id=1, orig_filename=f"{n}.pdf", mime="application/pdf", bytes_sha256=f"{n:064x}")
+    db.add(doc)
+    db.add(models.DocumentVersion(document_id=doc.id, version=1, storage_uri=f"k/{n}/v1"))
+    db.commit()
+    return doc
+
+
+def test_pointer_follows_the_highest_version():
+    _, db, tid = _session()
+    doc = _doc(db, tid, 1)
+    assert latest_version(db, doc).version == 1 and doc.latest_version_id is not None
+
+    db.add(models.DocumentVersion(document_id=doc.id, version=3, storage_uri="k/1/v3"))
+    db.commit()
+    assert latest_version(db, doc).version == 3
+
+    # A late lower version never moves the pointer back
+    db.add(models.DocumentVersion(document_id=doc.id, version=2, storage_uri="k/1/v2"))
+    db.commit()
+    db.expire_all()
+    assert latest_version(db, doc).version == 3
+
+
+def test_list_documents_is_one_query_regardless_of_page_size(monkeypatch):
+    import apps.block0_api.main as api
+
+    engine, db, tid = _session()
+    for n in range(30):
+        doc = _doc(db, tid, n)
+        if n % 3 == 0:
+            db.add(models.DocumentVersion(document_id=doc.id, version=2, storage_uri=f"k/{n}/v2"))
+            db.commit()
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *a: statements.append(a[2]))
+    api.app.dependency_overrides[api.get_db] = lambda: db
+    try:
+        with TestClient(api.app) as client:
+            docs = client.get("/v0/documents", params={"tenant_id": str(tid), "limit": 50}).json()["documents"]
+    finally:
+        api.app.dependency_overrides.clear()
+    assert len(docs) == 30
+    assert sorted(d["latest_version"] for d in docs) == [1] * 20 + [2] * 10
+    # Tenant lookup plus the joined page
+    assert len([s for s in statements if s.lstrip().upper().startswith("SELECT")]) == 2
@@ -0,0 +1,112 @@
+from apps.block0_worker.pipeline import Artifact, Pipeline, PipelineContext, Stage, StageResult
+
+
+class MemStorage:
+    def __init__(self):
+        self.objects = {}
+        self.gets = []
+
+    def put_object(self, key, data, content_type="application/octet-stream"):
+        self.objects[key] = data
+
+    def get_object_bytes(self, key):
+        self.gets.append(key)
+        return self.objects[key]
+
+    def object_exists(self, key):
+        return key in self.objects
+
+
+class Upper(Stage):
+    name = "upper"
+    inputs = ("original",)
+    outputs = {"text": "text"}
+    calls = 0
+
+    def run(self, ctx, inputs):
+        Upper.calls += 1
+        return StageResult(outputs={"text": inputs["original"].decode().upper()}, warnings=["shouted"])
+
+
+class Count(Stage):
+    name = "count"
+    inputs = ("text",)
+    outputs = {"stats": "json"}
+    calls = 0
+
+    def run(self, ctx, inputs):
+        Count.calls += 1
+        return StageResult(outputs={"stats": {"chars": len(inputs["text"])}})
+
+
+def _ctx(storage):
+    storage.objects["t/orig"] = b"hello"
+    return PipelineContext(
+        storage=storage, tenant_id="t", mime="text/plain", quality_mode="budget",
+        values={"original": Artifact(kind="bytes", digest="sha-of-hello", uri="t/orig")},
+    )
+
+
+def test_second_run_is_fully_cached_without_downloading():
+    Upper.calls = Count.calls = 0
+    storage = MemStorage()
+    first = Pipeline([Upper(), Count()]).run(_ctx(storage))
+    assert [s["status"] for s in first.steps] == ["ran", "ran"]
+    assert first.value("stats") == {"chars": 5}
+
+    storage.gets.clear()
+    second = Pipeline([Upper(), Count()]).run(_ctx(storage))
+    assert [s["status"] for s in second.steps] == ["cached", "cached"]
+    assert (Upper.calls, Count.calls) == (1, 1)
+    # Warnings replayed from the manifest; the original was never fetched
+    assert second.warnings == ["shouted"]
+    assert "t/orig" not in storage.gets
+    assert second.value("stats") == {"chars": 5}
+
+
+def test_version_bump_reruns_stage_and_reuses_unchanged_downstream():
+    Upper.calls = Count.calls = 0
+    storage = MemStorage()
+    Pipeline([Upper(), Count()]).run(_ctx(storage))
+
+    class Upper2(Upper):
+        version = "2"
+
+    ctx = Pipeline([Upper2(), Count()]).run(_ctx(storage))
+    # Same output text => same digest => count stays cached
+    assert [s["status"] for s in ctx.steps] == ["ran", "cached"]
+    assert (Upper.calls, Count.calls) == (2, 1)
+
+
+def test_uncacheable_result_is_not_stored():
+    class Flaky(Upper):
+        def run(self, ctx, inputs):
+            return StageResult(outputs={"text": ""}, warnings=["OCR error: boom"], cache=False)
+
+    storage = MemStorage()
+    ctx = Pipeline([Flaky()]).run(_ctx(storage))
+    assert ctx.clean is False
+    assert not any(k.endswith("manifest.json") for k in storage.objects)
+
+
+def test_force_reruns_and_preset_is_adopted_into_cache():
+    Upper.calls = Count.calls = 0
+    storage = MemStorage()
+    Pipeline([Upper(), Count()]).run(_ctx(storage))
+
+    ctx = _ctx(storage)
+    ctx.force = {"upper"}
+    Pipeline([Upper(), Count()]).run(ctx)
+    assert [s["status"] for s in ctx.steps] == ["ran", "cached"]
+
+    # Legacy output without a manifest: used instead of running, then cached
+    storage = MemStorage()
+    storage.objects["t/v1/ocr.txt"] = b"LEGACY"
+    ctx = _ctx(storage)
+    ctx.preset = {"upper": {"text": Artifact(kind="text", digest="legacy:t/v1/ocr.txt", uri="t/v1/ocr.txt")}}
+    Pipeline([Upper(), Count()]).run(ctx)
+    assert [s["status"] for s in ctx.steps] == ["reused", "ran"]
+    assert ctx.value("stats") == {"chars": 6}
+    again = Pipeline([Upper(), Count()]).run(_ctx(storage))
+    assert [s["status"] for s in again.steps] == ["cached", "cached"]
+    assert Upper.calls == 2
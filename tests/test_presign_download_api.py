@@ -15,7 +15,7 @@ def test_presign_download_ok(monkeypatch):
     import apps.block0_api.main as api
 
     # Patch Storage to avoid MinIO
-    monkeypatch.setattr(api, "Storage", lambda: DummyStorage())
+    monkeypatch.setattr(api, "get_storage", lambda: DummyStorage())
 
     with TestClient(api.app) as client:
         r = client.get("/v0/uploads/presign_download", params={"key": "abc/def", "expiry": 900})
@@ -0,0 +1,67 @@
+import uuid
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from shared.db.models import ProcessingStatus
+
+
+TENANT = "11111111-1111-1111-1111-111111111111"
+SHA = "ab" * 32
+
+
+class Storage:
+    def presign_put_url(self, key, expiry=3600):
+        return f"https://example.com/put/{key}"
+
+
+def _db(rows):
+    class Q:
+        def __init__(self, row):
+            self.row = row
+
+        def filter(self, *a):
+            return self
+
+        def order_by(self, *a):
+            return self
+
+        def first(self):
+            return self.row
+
+    class DB:
+        def query(self, model):
+            return Q(rows.get(model.__name__))
+
+    return lambda: DB()
+
+
+def _presign(monkeypatch, rows, **extra):
+    import apps.block0_api.main as api
+
+    monkeypatch.setattr(api, "get_storage", lambda: Storage())
+    api.app.dependency_overrides[api.get_db] = _db(rows)
+    try:
+        with TestClient(api.app) as client:
+            return client.post("/v0/uploads/presign", json={
+                "tenant_id": TENANT, "user_id": 1, "filename": "a.pdf", "mime": "application/pdf", **extra,
+            }).json()
+    finally:
+        api.app.dependency_overrides.clear()
+
+
+def test_presign_reports_content_the_tenant_already_has(monkeypatch):
+    doc = SimpleNamespace(id=uuid.uuid4())
+    rows = {
+        "Document": doc,
+        "DocumentVersion": SimpleNamespace(version=1, storage_uri="t/ab/x/v1/a.pdf"),
+        "ProcessingJob": SimpleNamespace(id=uuid.uuid4(), status=ProcessingStatus.succeeded, features={"size_bytes": 10}),
+    }
+    j = _presign(monkeypatch, rows, sha256=SHA, size=10)
+    assert j["already_present"] is True and "url" not in j
+    assert j["document_id"] == str(doc.id) and j["job"]["status"] == "succeeded"
+
+    # A different size for the same digest, or no digest at all, gets an upload URL
+    assert _presign(monkeypatch, rows, sha256=SHA, size=11)["already_present"] is False
+    assert "url" in _presign(monkeypatch, rows)
+    assert _presign(monkeypatch, {}, sha256=SHA)["already_present"] is False
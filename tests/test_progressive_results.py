@@ -0,0 +1,81 @@
+import io
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from pypdf import PdfReader, PdfWriter
+
+from apps.block0_worker.pipeline import Artifact, PipelineContext
+from shared.pipeline.deadline import Deadline
+
+
+def _blank_pdf(pages: int) -> bytes:
+    w = PdfWriter()
+    for _ in range(pages):
+        w.add_blank_page(width=200, height=200)
+    buf = io.BytesIO()
+    w.write(buf)
+    return buf.getvalue()
+
+
+def test_preview_stage_ocrs_only_the_first_pages(monkeypatch):
+    import apps.block0_worker.stages as stages
+
+    seen = {}
+
+    class FakePdf:
+        def __init__(self, **kw):
+            pass
+
+        def process(self, content, mime, languages=None):
+            from shared.ocr.adapters.base import OCRResult
+            seen["pages"] = len(PdfReader(io.BytesIO(content)).pages)
+            return OCRResult(pages=[], combined_text="first page text")
+
+    monkeypatch.setattr(stages, "OCRmyPDFAdapter", FakePdf)
+    monkeypatch.setenv("OCR_PROVIDER", "ocrmypdf")
+    monkeypatch.setenv("PROGRESSIVE_PAGES", "1")
+    ctx = PipelineContext(
+        storage=None, tenant_id="t", mime="application/pdf", quality_mode="recommended",
+        values={"normalized": Artifact.from_value("bytes", b"")},
+        deadline=Deadline(datetime.utcnow() + timedelta(hours=1)),
+    )
+    stage = stages.PreviewStage()
+    assert stage.enabled(ctx)
+    res = stage.run(ctx, {"normalized": _blank_pdf(3)})
+    assert seen["pages"] == 1
+    assert res.outputs == {"preview_text": "first page text", "preview_info": {"pages": 1, "total_pages": 3}}
+
+    # Single-page documents go straight to full OCR
+    res = stage.run(ctx, {"normalized": _blank_pdf(1)})
+    assert res.outputs["preview_info"]["pages"] == 0
+
+
+def test_get_job_exposes_partial_text(monkeypatch):
+    import apps.block0_api.main as api
+    from shared.db import models as m
+
+    job = m.ProcessingJob(
+        id=uuid.uuid4(), document_id=uuid.uuid4(), status=m.ProcessingStatus.running,
+        pages_completed=1, partial_text_uri="t/ab/sha/v1/ocr/partial.txt",
+    )
+
+    class DB:
+        def get(self, model, key):
+            return job if model is m.ProcessingJob and key == job.id else None
+
+    class DummyStorage:
+        def get_object_bytes(self, key):
+            assert key == job.partial_text_uri
+            return b"Page one of the filing"
+
+    api.app.dependency_overrides[api.get_db] = lambda: DB()
+    monkeypatch.setattr(api, "get_storage", DummyStorage)
+    try:
+        with TestClient(api.app) as client:
+            j = client.get(f"/v0/jobs/{job.id}").json()
+            assert j["status"] == "running"
+            assert j["pages_completed"] == 1
+            assert j["partial_text"] == "Page one of the filing"
+    finally:
+        api.app.dependency_overrides.clear()
@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+
+
+def test_publish_sends_task_by_name(monkeypatch):
+    import shared.queueing.client as qc
+
+    sent = []
+
+    class FakeCelery:
+        def send_task(self, name, args=None, kwargs=None, queue=None, producer=None):
+            sent.append((name, args, kwargs, queue))
+
+    monkeypatch.setattr(qc, "celery_client", lambda: FakeCelery())
+    qc.publish_process_document("job-1", "bulk", "heavy", fair_share_tenant="t1")
+    name, args, kwargs, queue = sent[0]
+    assert (name, args, queue) == ("process_document", ["job-1"], "bulk.heavy")
+    assert kwargs["fair_share_tenant"] == "t1" and kwargs["enqueued_at"] > 0
+
+
+def test_enqueue_many_shares_one_producer(monkeypatch):
+    import contextlib
+    import shared.queueing.client as qc
+
+    producers = []
+
+    class FakeCelery:
+        @contextlib.contextmanager
+        def producer_or_acquire(self):
+            producers.append(object())
+            yield producers[-1]
+
+        def send_task(self, name, args=None, kwargs=None, queue=None, producer=None):
+            sent.append((args[0], queue, producer))
+
+    sent = []
+    monkeypatch.setattr(qc, "celery_client", lambda: FakeCelery())
+    monkeypatch.setattr(qc, "fairshare_enabled", lambda: False)
+    qc.enqueue_many([
+        {"job_id": "a", "lane": "bulk", "tenant_id": "t", "cost_class": "light"},
+        {"job_id": "b", "lane": "nope", "tenant_id": "t", "cost_class": "heavy"},
+    ])
+    assert len(producers) == 1
+    assert sent == [("a", "bulk", producers[0]), ("b", "interactive.heavy", producers[0])]
+
+
+def test_api_import_skips_worker_and_analysis_stack():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = (
+        "import sys, apps.block0_api.main; "
+        "print(sorted(m for m in ('apps.block0_worker.worker', 'cv2', 'numpy', 'PIL', 'pytesseract', 'langdetect') if m in sys.modules))"
+    )
+    res = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, timeout=120)
+    assert res.returncode == 0, res.stderr
+    assert res.stdout.strip().splitlines()[-1] == "[]"
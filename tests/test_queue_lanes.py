@@ -0,0 +1,54 @@
+from collections import Counter
+
+from shared.queueing.lanes import (
+    BULK, INTERACTIVE, REPROCESS, WeightedLaneCycle, choose_lane, lane_depths, parse_lane_weights,
+)
+
+
+def test_choose_lane_explicit_and_heuristics(monkeypatch):
+    monkeypatch.setenv("LANE_BULK_MIN_FILES", "3")
+    assert choose_lane("bulk") == BULK
+    assert choose_lane(None) == INTERACTIVE
+    assert choose_lane(None, reprocess=True) == REPROCESS
+    assert choose_lane(None, file_count=3) == BULK
+    assert choose_lane(None, file_count=2) == INTERACTIVE
+
+
+def test_parse_lane_weights():
+    assert parse_lane_weights("interactive:4, bulk ,nope:9") == [(INTERACTIVE, 4), (BULK, 1)]
+    assert {n for n, _ in parse_lane_weights("")} == {INTERACTIVE, BULK, REPROCESS}
+
+
+def test_weighted_cycle_follows_weights(monkeypatch):
+    monkeypatch.setenv("WORKER_LANES", "interactive:3,bulk:1")
+    cyc = WeightedLaneCycle()
+    cyc.update([BULK, INTERACTIVE])
+    served = Counter()
+    for _ in range(40):
+        # With every lane backlogged BRPOP serves the first queue in order
+        q = cyc.consume(2)[0]
+        served[q] += 1
+        cyc.rotate(q)
+    assert served[INTERACTIVE] == 30
+    assert served[BULK] == 10
+
+
+def test_lane_depths():
+    class R:
+        def llen(self, key):
+            return {"interactive": 2, "bulk": 5000}.get(key, 0)
+
+    assert lane_depths(R()) == {INTERACTIVE: 2, BULK: 5000, REPROCESS: 0}
+
+
+def test_upload_rejects_unknown_lane():
+    from fastapi.testclient import TestClient
+    import apps.block0_api.main as api
+
+    with TestClient(api.app) as client:
+        r = client.post(
+            "/v0/documents/upload",
+            data={"tenant_id": "11111111-1111-1111-1111-111111111111", "user_id": "1", "lane": "vip"},
+            files={"files": ("a.pdf", b"%PDF-1.4", "application/pdf")},
+        )
+        assert r.status_code == 400
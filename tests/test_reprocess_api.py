@@ -2,8 +2,10 @@ from fastapi.testclient import TestClient
 import uuid
 
 
-def _db_with_doc(doc_id: uuid.UUID):
-    """Return a dependency override that yields a minimal DB stub with one document and version."""
+def _db_with_doc(doc_id: uuid.UUID, prev_jobs=(), created=None):
+    """Return a dependency override that yields a minimal DB stub with one document and version.
+
+    `prev_jobs` are the document's earlier jobs; new jobs are appended to `created`."""
     class Doc:
         def __init__(self, id):
             self.id = id
@@ -43,7 +45,7 @@ def _db_with_doc(doc_id: uuid.UUID):
         def __init__(self):
             self.doc = Doc(doc_id)
             self.vers = [Ver(document_id=doc_id, version=1, storage_uri="t/x/v1/file.pdf")]
-            self.jobs = []
+            self.jobs = list(prev_jobs)
 
         def get(self, model, key):
             from shared.db import models as m
@@ -55,6 +57,8 @@ def _db_with_doc(doc_id: uuid.UUID):
             from shared.db import models as m
             if model is m.DocumentVersion:
                 return Q(model, self.vers)
+            if model is m.ProcessingJob:
+                return Q(model, self.jobs)
             return Q(model, [])
 
         def add(self, obj):
@@ -62,6 +66,8 @@ def _db_with_doc(doc_id: uuid.UUID):
                 self.vers.append(obj)
             elif getattr(obj, "__tablename__", "") == "processing_jobs":
                 self.jobs.append(obj)
+                if created is not None:
+                    created.append(obj)
 
         def flush(self):
             return None
@@ -84,7 +90,7 @@ def test_reprocess_creates_new_version(monkeypatch):
     # Override DB and enqueue
     doc_id = uuid.uuid4()
     api.app.dependency_overrides[api.get_db] = _db_with_doc(doc_id)
-    monkeypatch.setattr(api, "enqueue_process_document", lambda job_id: None)
+    monkeypatch.setattr(api, "enqueue_process_document", lambda job_id, **kw: None)
 
     try:
         with TestClient(api.app) as client:
@@ -97,3 +103,50 @@ def test_reprocess_creates_new_version(monkeypatch):
     finally:
         api.app.dependency_overrides.clear()
 
+
+
+def test_reprocess_force_stages(monkeypatch):
+    import apps.block0_api.main as api
+
+    doc_id = uuid.uuid4()
+    api.app.dependency_overrides[api.get_db] = _db_with_doc(doc_id)
+    monkeypatch.setattr(api, "enqueue_process_document", lambda job_id, **kw: None)
+
+    try:
+        with TestClient(api.app) as client:
+            r = client.post(f"/v0/documents/{doc_id}/reprocess", params={"force_stages": "quality"})
+            assert r.status_code == 200
+            j = r.json()
+            assert j["force_stages"] == ["quality"]
+            # Legacy versions ran version 1 of every stage; nothing changed since
+            assert j["stages_changed"] == []
+
+            r = client.post(f"/v0/documents/{doc_id}/reprocess", params={"force_stages": "ocr,bogus"})
+            assert r.status_code == 400
+    finally:
+        api.app.dependency_overrides.clear()
+
+
+def test_reprocess_keeps_the_previous_quality_mode(monkeypatch):
+    import types
+    import apps.block0_api.main as api
+
+    doc_id = uuid.uuid4()
+    prev = types.SimpleNamespace(quality_mode="budget", features={"size_bytes": 1_000_000})
+    created = []
+    api.app.dependency_overrides[api.get_db] = _db_with_doc(doc_id, prev_jobs=[prev], created=created)
+    monkeypatch.setattr(api, "enqueue_process_document", lambda job_id, **kw: None)
+    monkeypatch.setenv("QUALITY_MODE", "recommended")
+
+    try:
+        with TestClient(api.app) as client:
+            assert client.post(f"/v0/documents/{doc_id}/reprocess").status_code == 200
+            assert client.post(f"/v0/documents/{doc_id}/reprocess", params={"quality_mode": "recommended"}).status_code == 200
+            assert client.post(f"/v0/documents/{doc_id}/reprocess", params={"quality_mode": "best"}).status_code == 400
+    finally:
+        api.app.dependency_overrides.clear()
+    budget, recommended = created
+    assert budget.quality_mode == "budget" and budget.features["quality_mode"] == "budget"
+    # 1 MB at the default 100 kB/page is 10 pages, x1 for budget
+    assert budget.est_pages == 10 and budget.cost_units == 10
+    assert recommended.quality_mode == "recommended" and recommended.cost_units == 20
@@ -0,0 +1,59 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import shared.storage.s3 as s3
+
+
+class _FakeMinio(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, body=b""):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_GET(self):  # bucket location lookup
+        self._reply(b'<LocationConstraint xmlns="http://s3.amazonaws.com/doc/2006-03-01/">us-east-1</LocationConstraint>')
+
+    def do_HEAD(self):  # bucket_exists
+        self._reply()
+
+    def log_message(self, *args):
+        pass
+
+
+def test_connections_are_reused_across_calls(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeMinio)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("S3_ENDPOINT_URL", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(s3, "_settings", None)
+    s3.reset_storage()
+    try:
+        assert s3.get_storage() is s3.get_storage()
+        for _ in range(5):
+            assert s3.get_storage().client.bucket_exists("bucket")
+        stats = s3.pool_stats()
+        assert stats["opened"] == 1 and stats["idle"] == 1 and stats["requests"] >= 5
+    finally:
+        s3.reset_storage()
+        server.shutdown()
+
+
+def test_forked_child_gets_its_own_pool(monkeypatch):
+    monkeypatch.setattr(s3, "_settings", None)
+    parent = s3.get_storage()
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # child
+        os.close(r)
+        fresh = s3._storage is None and s3.get_storage() is not parent
+        os.write(w, b"1" if fresh else b"0")
+        os._exit(0)
+    os.close(w)
+    assert os.read(r, 1) == b"1"
+    os.waitpid(pid, 0)
+    assert s3.get_storage() is parent
+    s3.reset_storage()
@@ -0,0 +1,75 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from shared.tracing import spans
+from shared.tracing.spans import InMemoryExporter, parse_traceparent, span, trace_context
+
+
+@pytest.fixture
+def exported():
+    exp = InMemoryExporter()
+    spans.set_exporter(exp)
+    yield exp.spans
+    spans.set_exporter(None)
+
+
+def test_nested_spans_and_errors(exported):
+    with span("outer") as outer:
+        with span("inner", k=1) as inner:
+            assert trace_context()["traceparent"] == inner.traceparent
+        with pytest.raises(ValueError):
+            with span("boom"):
+                raise ValueError("bad")
+    by_name = {s.name: s for s in exported}
+    assert by_name["inner"].parent_id == outer.span_id and by_name["inner"].trace_id == outer.trace_id
+    assert by_name["boom"].status == "error" and "bad" in by_name["boom"].attributes["error"]
+    assert by_name["outer"].parent_id is None and by_name["outer"].end >= by_name["outer"].start
+    assert parse_traceparent("00-" + "0" * 32 + "-" + "1" * 16 + "-01") is None
+    assert parse_traceparent("garbage") is None
+
+
+def test_trace_flows_from_request_to_task_and_stages(monkeypatch, exported):
+    import apps.block0_api.main as api
+    import shared.queueing.client as queue_client
+    from apps.block0_worker.pipeline import Pipeline, PipelineContext, Stage, StageResult
+
+    incoming = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+    with TestClient(api.app) as client:
+        r = client.get("/v0/version", headers={"traceparent": incoming, "X-Request-ID": "rid-1"})
+    assert r.headers["traceparent"].startswith("00-4bf92f3577b34da6a3ce929d0e0e4736-")
+    req = [s for s in exported if s.name == "http.request"][0]
+    assert req.parent_id == "00f067aa0ba902b7"
+
+    # Enqueue inside a request span hands the context to the Celery task kwargs
+    sent = {}
+    monkeypatch.setattr(queue_client, "publish_process_document", lambda job_id, lane, cost_class, **kw: sent.update(kw))
+    monkeypatch.setattr(queue_client, "fairshare_enabled", lambda: False)
+    with span("http.request") as root:
+        queue_client.enqueue_process_document("job-1", lane="interactive")
+    assert parse_traceparent(sent["traceparent"])[0] == root.trace_id
+
+    # The worker side continues that trace with one span per stage
+    class Echo(Stage):
+        name = "echo"
+        inputs = ("original",)
+        outputs = {"copy": "text"}
+
+        def run(self, ctx, inputs):
+            return StageResult(outputs={"copy": inputs["original"]})
+
+    class NoStorage:
+        def object_exists(self, key):
+            return False
+
+        def put_object(self, *a, **kw):
+            pass
+
+    from apps.block0_worker.pipeline import Artifact
+
+    ctx = PipelineContext(storage=NoStorage(), tenant_id="t", mime="text/plain", quality_mode="budget",
+                          values={"original": Artifact.from_value("text", "hi")})
+    with span("process_document", sent["traceparent"]) as task:
+        Pipeline([Echo()]).run(ctx)
+    stage = [s for s in exported if s.name == "stage.echo"][0]
+    assert stage.trace_id == root.trace_id and stage.parent_id == task.span_id
+    assert stage.attributes["status"] == "ran"
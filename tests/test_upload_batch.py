@@ -0,0 +1,195 @@
+import hashlib
+import uuid
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from shared.db.models import ProcessingStatus
+
+
+TENANT = uuid.UUID("11111111-1111-1111-1111-111111111111")
+A = b"%PDF-1.4 alpha"
+B = b"%PDF-1.4 beta"
+
+
+class Storage:
+    def __init__(self, staged):
+        self.staged = staged
+        self.copies = []
+
+    def presign_put_url(self, key, expiry=3600):
+        return f"https://example.com/put/{key}"
+
+    def stat(self, key):
+        if key not in self.staged:
+            raise KeyError(key)
+        return {"size": len(self.staged[key]), "etag": "e", "sha256": None}
+
+    def hash_object(self, key, chunk_size=1024 * 1024, on_chunk=None):
+        return hashlib.sha256(self.staged[key]).hexdigest(), len(self.staged[key])
+
+    def object_key(self, tenant_id, sha256, version, filename):
+        return f"{tenant_id}/{sha256[:2]}/{sha256}/v{version}/{filename}"
+
+    def object_exists(self, key):
+        return False
+
+    def copy_object(self, src_key, dst_key):
+        self.copies.append((src_key, dst_key))
+
+
+class DB:
+    def __init__(self, rows=None):
+        self.rows = rows or {}
+        self.added = []
+        self.commits = 0
+
+    def get(self, model, key):
+        if model.__name__ == "Tenant":
+            return SimpleNamespace(id=TENANT)
+        return SimpleNamespace(id=1, tenant_id=TENANT)
+
+    def query(self, model):
+        rows = self.rows.get(model.__name__, [])
+
+        class Q:
+            def filter(self, *a):
+                return self
+
+            def order_by(self, *a):
+                return self
+
+            def all(self):
+                return list(rows)
+
+        return Q()
+
+    def add_all(self, rows):
+        self.added.extend(rows)
+
+    def flush(self):
+        pass
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+def _post(monkeypatch, path, storage, db, body):
+    import apps.block0_api.main as api
+
+    batches = []
+    monkeypatch.setattr(api, "get_storage", lambda: storage)
+    monkeypatch.setattr(api.balances, "balance", lambda db, tenant_id, user_id=None: (0, 0))
+    monkeypatch.setattr(api, "enqueue_many", lambda jobs: batches.append(list(jobs)))
+    api.app.dependency_overrides[api.get_db] = lambda: db
+    try:
+        with TestClient(api.app) as client:
+            return client.post(path, json={"tenant_id": str(TENANT), "user_id": 1, **body}), batches
+    finally:
+        api.app.dependency_overrides.clear()
+
+
+def test_presign_batch_mixes_present_and_new(monkeypatch):
+    sha = hashlib.sha256(A).hexdigest()
+    doc = SimpleNamespace(id=uuid.uuid4(), bytes_sha256=sha)
+    db = DB({
+        "Document": [doc],
+        "DocumentVersion": [SimpleNamespace(document_id=doc.id, version=2, storage_uri="k2"),
+                            SimpleNamespace(document_id=doc.id, version=1, storage_uri="k1")],
+        "ProcessingJob": [SimpleNamespace(id=uuid.uuid4(), document_id=doc.id, status=ProcessingStatus.queued, features={})],
+    })
+    r, _ = _post(monkeypatch, "/v0/uploads/presign:batch", Storage({}), db, {"items": [
+        {"filename": "a.pdf", "sha256": sha},
+        {"filename": "b.pdf"},
+    ]})
+    items = r.json()["items"]
+    assert items[0]["already_present"] and items[0]["storage_uri"] == "k2" and "url" not in items[0]
+    assert not items[1]["already_present"] and items[1]["url"].startswith("https://")
+
+    r, _ = _post(monkeypatch, "/v0/uploads/presign:batch", Storage({}), DB(), {"items": [{"filename": "x"}] * 501})
+    assert r.status_code == 400
+
+
+def test_finalize_batch_dedupes_reports_per_item_and_enqueues_once(monkeypatch):
+    storage = Storage({"s/a1": A, "s/a2": A, "s/b": B})
+    db = DB()
+    r, batches = _post(monkeypatch, "/v0/uploads/finalize:batch", storage, db, {"items": [
+        {"key": "s/a1", "filename": "a.pdf", "mime": "application/pdf"},
+        {"key": "s/missing", "filename": "m.pdf"},
+        {"key": "s/a2", "filename": "a-copy.pdf", "mime": "application/pdf"},
+        {"key": "s/b", "filename": "b.pdf", "mime": "application/pdf"},
+    ]})
+    assert r.status_code == 200, r.text
+    items = r.json()["items"]
+    assert items[1] == {"index": 1, "status_code": 404, "error": "Object not found at key"}
+    assert items[0]["document_id"] == items[2]["document_id"] != items[3]["document_id"]
+    assert len(storage.copies) == 2 and db.commits == 1
+    kinds = [type(o).__name__ for o in db.added]
+    assert kinds.count("Document") == 2 and kinds.count("DocumentVersion") == 2
+    assert kinds.count("ProcessingJob") == 3 and kinds.count("Credit") == 3
+    assert len(batches) == 1 and [j["job_id"] for j in batches[0]] == [items[i]["job_id"] for i in (0, 2, 3)]
+
+
+def test_finalize_batch_rejects_a_wrong_claimed_digest_before_reuse(monkeypatch):
+    # The tenant already has A; an upload of B claiming A's digest must not be linked to it
+    sha_a = hashlib.sha256(A).hexdigest()
+    doc = SimpleNamespace(id=uuid.uuid4(), bytes_sha256=sha_a)
+    db = DB({
+        "Document": [doc],
+        "DocumentVersion": [SimpleNamespace(document_id=doc.id, version=1, storage_uri="k1")],
+        "ProcessingJob": [],
+    })
+    storage = Storage({"s/b": B, "s/a": A})
+    r, batches = _post(monkeypatch, "/v0/uploads/finalize:batch", storage, db, {"items": [
+        {"key": "s/b", "filename": "b.pdf", "mime": "application/pdf", "sha256": sha_a},
+        {"key": "s/a", "filename": "a.pdf", "mime": "application/pdf", "sha256": sha_a},
+    ]})
+    assert r.status_code == 200, r.text
+    items = r.json()["items"]
+    assert items[0] == {"index": 0, "status_code": 400, "error": "sha256 does not match the uploaded object"}
+    assert items[1]["document_id"] == str(doc.id) and items[1]["storage_uri"] == "k1"
+    assert storage.copies == [] and [j["job_id"] for j in batches[0]] == [items[1]["job_id"]]
+
+
+def _fk_session():
+    """SQLite session with foreign keys enforced and the app's flush hooks."""
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+
+    from shared.db import models
+    from shared.db.latest import track_latest_versions
+    from shared.quality.balances import track_balances
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    event.listen(engine, "connect", lambda conn, rec: conn.execute("PRAGMA foreign_keys=ON"))
+    models.Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, autoflush=False)
+    track_balances(factory)
+    track_latest_versions(factory)
+    db = factory()
+    tenant = models.Tenant(id=uuid.uuid4(), name="t")
+    db.add(tenant)
+    db.flush()
+    db.add(models.User(id=1, tenant_id=tenant.id, username="a"))
+    db.commit()
+    return db, tenant.id
+
+
+def test_finalize_batch_writes_jobs_before_their_credits(monkeypatch):
+    # Credits sort before processing_jobs in a single flush; the FK must still hold
+    from shared.db import models
+
+    db, tid = _fk_session()
+    storage = Storage({"s/a": A, "s/b": B})
+    r, batches = _post(monkeypatch, "/v0/uploads/finalize:batch", storage, db, {"tenant_id": str(tid), "items": [
+        {"key": "s/a", "filename": "a.pdf", "mime": "application/pdf"},
+        {"key": "s/b", "filename": "b.pdf", "mime": "application/pdf"},
+    ]})
+    assert r.status_code == 200, r.text
+    jobs = {str(j.id) for j in db.query(models.ProcessingJob).all()}
+    assert jobs == {i["job_id"] for i in r.json()["items"]} == {j["job_id"] for j in batches[0]}
+    assert {str(c.job_id) for c in db.query(models.Credit).all()} == jobs
@@ -127,7 +127,7 @@ def _override_db_ok(tenant_id: uuid.UUID):
 def test_presign_minimal(monkeypatch):
     import apps.block0_api.main as api
     # Patch Storage
-    monkeypatch.setattr(api, "Storage", lambda: DummyStorage())
+    monkeypatch.setattr(api, "get_storage", lambda: DummyStorage())
     with TestClient(api.app) as client:
         r = client.post(
             "/v0/uploads/presign",
@@ -147,7 +147,7 @@ def test_presign_minimal(monkeypatch):
 def test_finalize_missing_object(monkeypatch):
     import apps.block0_api.main as api
     tenant = uuid.UUID("11111111-1111-1111-1111-111111111111")
-    monkeypatch.setattr(api, "Storage", lambda: DummyStorage())
+    monkeypatch.setattr(api, "get_storage", lambda: DummyStorage())
     api.app.dependency_overrides[api.get_db] = _override_db_ok(tenant)
     try:
         with TestClient(api.app) as client:
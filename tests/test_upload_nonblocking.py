@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import uuid
+
+import httpx
+
+
+TENANT = uuid.UUID("11111111-1111-1111-1111-111111111111")
+
+
+class SlowStorage:
+    """put_stream blocks until released, tracking how many run at once."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.keys = []
+
+    def object_key(self, tenant_id, sha256, version, filename):
+        return f"{tenant_id}/{sha256[:2]}/{sha256}/v{version}/{filename}"
+
+    def copy_object(self, src_key, dst_key):
+        pass
+
+    def remove_object(self, key):
+        pass
+
+    def put_stream(self, key, fileobj, length=-1, content_type="application/octet-stream"):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        self.release.wait(timeout=5)
+        fileobj.read()
+        with self.lock:
+            self.active -= 1
+            self.keys.append(key)
+
+
+class Q:
+    def filter(self, *a):
+        return self
+
+    def order_by(self, *a):
+        return self
+
+    def first(self):
+        return None
+
+    def all(self):
+        return []
+
+
+class DB:
+    def __init__(self):
+        self.added = []
+
+    def get(self, model, key):
+        from shared.db import models as m
+
+        if model is m.Tenant:
+            return type("T", (), {"id": TENANT})()
+        if model is m.User:
+            return type("U", (), {"id": 1, "tenant_id": TENANT})()
+
+    def query(self, model):
+        return Q()
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    def flush(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def test_upload_stores_files_concurrently_off_the_event_loop(monkeypatch):
+    import apps.block0_api.main as api
+
+    storage = SlowStorage()
+    enqueued = []
+    monkeypatch.setattr(api, "get_storage", lambda: storage)
+    monkeypatch.setattr(api.balances, "balance", lambda db, tenant_id, user_id=None: (0, 0))
+    monkeypatch.setattr(api, "enqueue_process_document", lambda job_id, **kw: enqueued.append(job_id))
+    monkeypatch.setenv("UPLOAD_FILE_CONCURRENCY", "3")
+    api.app.dependency_overrides[api.get_db] = lambda: DB()
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api") as client:
+            files = [("files", (f"f{i}.txt", f"doc {i}".encode(), "text/plain")) for i in range(5)]
+            upload = asyncio.create_task(client.post(
+                "/v0/documents/upload", data={"tenant_id": str(TENANT), "user_id": "1"}, files=files,
+            ))
+            while storage.active < 3:
+                await asyncio.sleep(0.01)
+            # The loop still serves other requests while the stores are blocked
+            r = await client.get("/v0/version")
+            served_while_blocked = storage.active > 0
+            storage.release.set()
+            return r, served_while_blocked, await upload
+
+    try:
+        version, served_while_blocked, upload = asyncio.run(scenario())
+    finally:
+        api.app.dependency_overrides.clear()
+    assert version.status_code == 200 and served_while_blocked
+    assert upload.status_code == 200, upload.text
+    assert len(upload.json()["documents"]) == 5 and len(enqueued) == 5
+    assert storage.max_active == 3 and len(storage.keys) == 5
@@ -0,0 +1,83 @@
+import hashlib
+
+from fastapi.testclient import TestClient
+
+from tests.test_upload_nonblocking import DB, TENANT
+
+
+class MemStorage:
+    def __init__(self, fail_on=None):
+        self.objects = {}
+        self.copies = []
+        self.fail_on = fail_on
+
+    def object_key(self, tenant_id, sha256, version, filename):
+        return f"{tenant_id}/{sha256[:2]}/{sha256}/v{version}/{filename}"
+
+    def put_stream(self, key, fileobj, length=-1, content_type="application/octet-stream"):
+        data = b""
+        while True:
+            chunk = fileobj.read(4)  # small reads, like multipart parts
+            if not chunk:
+                break
+            data += chunk
+        if self.fail_on and self.fail_on in key:
+            raise IOError("s3 down")
+        self.objects[key] = data
+
+    def copy_object(self, src_key, dst_key):
+        self.copies.append(dst_key)
+        self.objects[dst_key] = self.objects[src_key]
+
+    def remove_object(self, key):
+        self.objects.pop(key, None)
+
+
+def _upload(monkeypatch, storage, files, db=None, tenant_id=TENANT):
+    import apps.block0_api.main as api
+
+    monkeypatch.setattr(api, "get_storage", lambda: storage)
+    monkeypatch.setattr(api.balances, "balance", lambda db, tenant_id, user_id=None: (0, 0))
+    monkeypatch.setattr(api, "enqueue_process_document", lambda job_id, **kw: None)
+    api.app.dependency_overrides[api.get_db] = lambda: db if db is not None else DB()
+    try:
+        with TestClient(api.app) as client:
+            return client.post("/v0/documents/upload", data={"tenant_id": str(tenant_id), "user_id": "1"}, files=files)
+    finally:
+        api.app.dependency_overrides.clear()
+
+
+def test_upload_streams_to_staging_then_copies_by_digest(monkeypatch):
+    body = b"the same bytes, twice"
+    sha = hashlib.sha256(body).hexdigest()
+    storage = MemStorage()
+    r = _upload(monkeypatch, storage, [
+        ("files", ("a.txt", body, "text/plain")),
+        ("files", ("b.txt", body, "text/plain")),
+    ])
+    assert r.status_code == 200, r.text
+    final = f"{TENANT}/{sha[:2]}/{sha}/v1/a.txt"
+    # One server-side copy per digest; staging objects are gone
+    assert storage.copies == [final]
+    assert storage.objects == {final: body}
+
+
+def test_failed_upload_leaves_no_staging_objects(monkeypatch):
+    storage = MemStorage(fail_on="bad.txt")
+    r = _upload(monkeypatch, storage, [
+        ("files", ("good.txt", b"fine", "text/plain")),
+        ("files", ("bad.txt", b"broken", "text/plain")),
+    ])
+    assert r.status_code == 500
+    assert storage.objects == {} and storage.copies == []
+
+
+def test_upload_writes_the_job_before_its_credit(monkeypatch):
+    from shared.db import models
+    from tests.test_upload_batch import _fk_session
+
+    db, tid = _fk_session()
+    r = _upload(monkeypatch, MemStorage(), [("files", ("a.txt", b"fk", "text/plain"))], db=db, tenant_id=tid)
+    assert r.status_code == 200, r.text
+    job = db.query(models.ProcessingJob).one()
+    assert [c.job_id for c in db.query(models.Credit).all()] == [job.id]
@@ -32,6 +32,10 @@ def test_worker_health_wsgi(monkeypatch):
             return self
         def inc(self, *args, **kwargs):
             return None
+        def dec(self, *args, **kwargs):
+            return None
+        def set(self, *args, **kwargs):
+            return None
         def observe(self, *args, **kwargs):
             return None
 
@@ -41,7 +45,7 @@ def test_worker_health_wsgi(monkeypatch):
             return [b'# HELP dummy\n# TYPE dummy counter\n']
         return _app
 
-    fake_prom = types.SimpleNamespace(Counter=_DummyMetric, Histogram=_DummyMetric, make_wsgi_app=_make_wsgi_app)
+    fake_prom = types.SimpleNamespace(Counter=_DummyMetric, Gauge=_DummyMetric, Histogram=_DummyMetric, make_wsgi_app=_make_wsgi_app)
 
     # Inject into sys.modules for import hook before worker import
     import sys
@@ -50,6 +54,7 @@ def test_worker_health_wsgi(monkeypatch):
 
     # Ensure METRICS_PORT is set so worker starts the HTTP server
     os.environ['METRICS_PORT'] = '0'
+    monkeypatch.setenv('WORKER_WARMUP', '0')
 
     # Import (or reload) the worker
     # Import the worker module (after patches) — avoid double import elsewhere
@@ -57,6 +62,10 @@ def test_worker_health_wsgi(monkeypatch):
         del sys.modules['apps.block0_worker.worker']
     import apps.block0_worker.worker as worker
 
+    # Importing the module has no side effects; the server starts with the worker (worker_init)
+    assert captured["app"] is None
+    worker._on_worker_init()
+
     # We should have captured a WSGI app
     app = captured["app"]
     assert app is not None
@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+
+# prometheus_client picks its value backend at import, so run in a fresh interpreter
+SCRIPT = textwrap.dedent(
+    """
+    import os
+    from apps.block0_worker import multiproc
+    multiproc.prepare_dir()
+    from prometheus_client import Counter, Gauge
+
+    jobs = Counter("t_jobs_total", "jobs")
+    busy = Gauge("t_busy", "busy", multiprocess_mode="livesum")
+
+    pid = os.fork()
+    if pid == 0:
+        jobs.inc(2)
+        busy.inc()
+        os._exit(0)
+    os.waitpid(pid, 0)
+    jobs.inc()
+    multiproc.mark_process_dead(pid)
+
+    out = {}
+    def start_response(status, headers):
+        out["status"] = status
+    body = b"".join(multiproc.metrics_app()({"REQUEST_METHOD": "GET", "PATH_INFO": "/metrics", "QUERY_STRING": ""}, start_response))
+    print(body.decode())
+    """
+)
+
+
+def test_child_samples_are_merged_and_dead_gauges_dropped(tmp_path):
+    mp = tmp_path / "prom"
+    mp.mkdir()
+    (mp / "counter_999999.db").write_bytes(b"stale")  # left by a previous run
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(mp))
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    res = subprocess.run([sys.executable, "-c", SCRIPT], cwd=root, env=env, capture_output=True, text=True, timeout=60)
+    assert res.returncode == 0, res.stderr
+    assert "t_jobs_total 3.0" in res.stdout
+    # The exited child's in-flight contribution is gone
+    assert "t_busy 0.0" in res.stdout
+    assert not (mp / "counter_999999.db").exists()
@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+
+
+HEAVY = ("cv2", "numpy", "PIL", "pytesseract", "pypdf", "langdetect")
+
+
+def _fresh(code):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, METRICS_PORT="", WORKER_WARMUP="true", OCR_PROVIDER="stub")
+    res = subprocess.run([sys.executable, "-c", code], cwd=root, env=env, capture_output=True, text=True, timeout=120)
+    assert res.returncode == 0, res.stderr
+    return res.stdout.strip().splitlines()[-1]
+
+
+def test_worker_import_defers_heavy_libraries():
+    out = _fresh(
+        "import sys, apps.block0_worker.worker as w; "
+        f"print(sorted(m for m in {HEAVY!r} if m in sys.modules), w.IMPORT_SECONDS > 0)"
+    )
+    assert out == "[] True"
+
+
+def test_warm_up_preloads_in_the_parent():
+    out = _fresh(
+        "import sys; from apps.block0_worker.warmup import warm_up; t = warm_up(); "
+        f"print(sorted(t), all(m in sys.modules for m in {HEAVY!r}))"
+    )
+    assert out == "['imports', 'langdetect', 'opencv', 'tesseract'] True"